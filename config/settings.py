@@ -20,7 +20,77 @@ LOGS_DIR = os.path.join(BASE_DIR, "logs")
 # Paths de dados
 DATA_DIR = os.path.join(BASE_DIR, "data")
 CACHE_DIR = os.path.join(DATA_DIR, "cache")
-DOWNLOADS_PATH = os.path.join(os.path.expanduser("~"), "Downloads")
+DOWNLOADS_PATH = os.getenv("DOWNLOADS_PATH", os.path.join(os.path.expanduser("~"), "Downloads"))
 
 # Arquivos de cache
 PRODUTOS_CACHE = os.path.join(CACHE_DIR, "produtos_api.xlsx")
+CALIBRATION_CACHE = os.path.join(CACHE_DIR, "calibracao_escala.json")
+# Templates que medem a escala da tela (visíveis na tela de login)
+CALIBRATION_ANCHORS = ["login/usuario.png", "login/acessar.png"]
+
+# Margem (px) em volta da última posição conhecida de um template
+HINT_MARGIN = 64
+HINTS_FLUSH_S = 5     # caixas novas vão para o disco no máximo a cada N segundos
+
+# Captura de tela: 'auto' (mss se instalado, senão pyautogui), 'mss', 'pil' ou 'pyautogui'
+CAPTURE_BACKEND = os.getenv("CAPTURE_BACKEND", "auto")
+CAPTURE_MAX_AGE_MS = 50     # frames mais novos que isso são reaproveitados
+# Monitor no mss: 0 = desktop virtual inteiro (mesma área do pyautogui), 1.. = um
+# monitor. Os cliques somam a origem (left, top) do monitor às posições no frame
+CAPTURE_MONITOR = int(os.getenv("CAPTURE_MONITOR", 0))
+
+# Template matching em tiles paralelos (cv2.matchTemplate libera o GIL)
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", os.cpu_count() or 4))
+MATCH_TILE_SIZE = int(os.getenv("MATCH_TILE_SIZE", 512))   # lado do tile no mapa de resposta (px)
+MATCH_TILED_MIN_PIXELS = 1920 * 1080                       # telas menores usam uma única chamada
+
+# Leitura em lote de XMLs de NF-e (processos paralelos)
+NFE_WORKERS = int(os.getenv("NFE_WORKERS", os.cpu_count() or 4))
+
+# Pré-análise concorrente dos itens sem código (limita chamadas simultâneas à IA/API)
+ANALISE_WORKERS = int(os.getenv("ANALISE_WORKERS", 4))
+
+# Scorer fuzzy do pré-filtro de produtos: 'fuzzywuzzy' (padrão, os limiares de
+# similaridade foram calibrados com ele), 'rapidfuzz' (lote com cdist) ou 'auto'
+# (rapidfuzz se instalado). Só troque depois de conferir a paridade no catálogo
+# (scripts/benchmark_pre_filtro.py --paridade)
+FUZZY_BACKEND = os.getenv("FUZZY_BACKEND", "fuzzywuzzy")
+FUZZY_WORKERS = int(os.getenv("FUZZY_WORKERS", -1))     # -1 = todos os núcleos
+
+# Candidatos do pré-filtro: 'indice' (padrão: tipo + palavras), 'tfidf' (n-gramas
+# de caracteres sobre o catálogo inteiro; opcional, precisa do scipy) ou 'auto'
+# (tfidf se o scipy estiver instalado)
+PREFILTRO_GERADOR = os.getenv("PREFILTRO_GERADOR", "indice")
+TFIDF_NGRAM = 3
+TFIDF_CANDIDATOS = 100      # candidatos por consulta que seguem para o scorer fuzzy
+TFIDF_LOTE = 64             # consultas por produto de matrizes (limita a memória)
+
+# Navegação em grades do ERP: intervalo entre teclas ajustado à latência medida
+GRID_MIN_INTERVAL = 0.03    # s
+GRID_MAX_INTERVAL = 0.5     # s (valor antigo fixo)
+GRID_LATENCY_FACTOR = 1.5   # margem sobre a latência medida de uma tecla
+
+# Journal de etapas por nota (retomada depois de falhas)
+JOURNAL_DB = os.path.join(DATA_DIR, "journal.sqlite3")
+MAX_FALHAS_SEGUIDAS = 3
+
+# Modo multi-worker (supervisor.py): cada worker tem display, perfil do Chrome e downloads próprios
+WORKER_ID = os.getenv("BOT_WORKER_ID", "w0")
+WORKER_INDEX = int(os.getenv("BOT_WORKER_INDEX", 0))
+# Posições dos templates são da tela de cada worker (display próprio)
+HINTS_CACHE = os.path.join(CACHE_DIR, f"location_hints_{WORKER_ID}.json")
+CHROME_USER_DATA_DIR = os.getenv("CHROME_USER_DATA_DIR")
+WORKERS_DIR = os.path.join(DATA_DIR, "workers")
+RESERVA_TTL_S = 30 * 60     # reserva de nota de um worker que sumiu expira depois disso
+
+# Linha do tempo das ações de GUI (uma linha JSON por clique/espera/tecla)
+TIMELINE_ENABLED = os.getenv("TIMELINE", "1") != "0"
+TIMELINE_DIR = LOGS_DIR
+
+# Origem das linhas da grade de vínculo de itens: 'auto' (XML quando todos os
+# vínculos são conhecidos, senão exportação XLS), 'xml' ou 'xls' (sempre exporta)
+ITENS_FONTE = os.getenv("ITENS_FONTE", "auto")
+
+# Motor de fluxos (tools/steps.py): procura o alvo do próximo passo enquanto a tela assenta
+STEP_PREFETCH = os.getenv("STEP_PREFETCH", "1") != "0"
+STEP_PREFETCH_INTERVAL = 0.05   # s entre buscas da antecipação
@@ -1,9 +1,12 @@
 from config import USUARIO, SENHA
 from pipeline import login
 from utils import get_logger
-from pipeline import exportar_xml
+from pipeline import exportar_xml, sessao_na_lista_filtrada
 from pipeline.exportar_produtos import exportar_produtos_para_excel
 from pipeline.vinculo_fornecedor_item import vinculo_fornecedor_item
+from pipeline.journal import NoteJournal
+from tools import preload_templates, template_cache_stats, location_hint_stats, capture_stats
+from config import WORKER_ID, WORKER_INDEX
 
 logger = get_logger("main")
 
@@ -11,15 +14,30 @@ def main():
     try:
         logger.info("Iniciando o processo de automação...")
 
-        logger.info("Exportando produtos da API...")
-        exportar_produtos_para_excel()
-        logger.info("Iniciando o login...")
-        login(USUARIO, SENHA)
+        if WORKER_INDEX == 0:
+            # No modo multi-worker só o primeiro exporta a planilha compartilhada
+            logger.info("Exportando produtos da API...")
+            exportar_produtos_para_excel()
+        preload_templates()
+        na_lista = sessao_na_lista_filtrada()
+        if na_lista:
+            logger.info("ERP ainda na lista filtrada de notas; retomando sem login...")
+        else:
+            logger.info("Iniciando o login...")
+            login(USUARIO, SENHA)
         logger.info("Iniciando recebimento de notas fiscais...")
-        exportar_xml()
+        # Reaproveita a checagem acima: uma segunda espera pela imagem poderia discordar dela
+        exportar_xml(na_lista=na_lista)
         logger.info("Processo de automação concluído com sucesso.")
     except Exception as e:
         logger.error(f"Erro durante a execução: {e}")
+    finally:
+        # Nota que ficou pela metade volta a ficar livre para os outros workers
+        NoteJournal().liberar(WORKER_ID)
+        logger.info(f"Cache de templates: {template_cache_stats()}")
+        logger.info(f"Captura de tela: {capture_stats()}")
+        for template, stats in location_hint_stats().items():
+            logger.info(f"Hint de localização {template}: {stats}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
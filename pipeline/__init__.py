@@ -1,5 +1,5 @@
 from .login import login
-from .exportar_xml import exportar_xml
+from .exportar_xml import exportar_xml, sessao_na_lista_filtrada
 from .analisador_produto import (
     AnalisadorProduto,
     ResultadoAnalise,
@@ -11,6 +11,7 @@ from .analisador_produto import (
 __all__ = [
     "login",
     "exportar_xml",
+    "sessao_na_lista_filtrada",
     "AnalisadorProduto",
     "ResultadoAnalise", 
     "AcaoRequerida",
@@ -13,6 +13,8 @@ realize o cadastro/vínculo automaticamente.
 import os
 import sys
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Optional, Any
 from enum import Enum
@@ -31,6 +33,7 @@ if parent_dir not in sys.path:
 from pipeline.autenticacao import APIClient
 from pipeline.pre_filtro_inteligente import MatcherHibrido, ProviderOpenAI, ProviderAnthropic
 import pandas as pd
+from config import ANALISE_WORKERS
 
 
 class AcaoRequerida(Enum):
@@ -206,10 +209,17 @@ class AnalisadorProduto:
         self._grupos_cache = None
         self._unidades_cache = None
         self._matcher = None
+        # Protege a carga preguiçosa dos caches quando analisar() roda em threads
+        self._lock = threading.RLock()
     
     def _get_matcher(self) -> MatcherHibrido:
         """Obtém ou cria o matcher híbrido."""
-        if self._matcher is None:
+        if self._matcher is not None:
+            return self._matcher
+        with self._lock:
+            if self._matcher is not None:
+                return self._matcher
+
             # Carrega produtos da API
             produtos = self.api_client.get_produtos()
             
@@ -240,20 +250,22 @@ class AnalisadorProduto:
     
     def _get_grupos(self) -> List[Dict]:
         """Obtém lista de grupos."""
-        if self._grupos_cache is None:
-            try:
-                self._grupos_cache = self.api_client.get_grupos()
-            except:
-                self._grupos_cache = []
+        with self._lock:
+            if self._grupos_cache is None:
+                try:
+                    self._grupos_cache = self.api_client.get_grupos()
+                except:
+                    self._grupos_cache = []
         return self._grupos_cache
     
     def _get_unidades(self) -> List[Dict]:
         """Obtém lista de unidades."""
-        if self._unidades_cache is None:
-            try:
-                self._unidades_cache = self.api_client.get_unidades()
-            except:
-                self._unidades_cache = []
+        with self._lock:
+            if self._unidades_cache is None:
+                try:
+                    self._unidades_cache = self.api_client.get_unidades()
+                except:
+                    self._unidades_cache = []
         return self._unidades_cache
     
     def _selecionar_grupo_padrao(self) -> Optional[Dict]:
@@ -584,34 +596,53 @@ Responda APENAS em JSON com a estrutura:
         self,
         produtos: List[Dict],
         auto_cadastrar: bool = False,
-        debug: bool = False
+        debug: bool = False,
+        max_workers: int = ANALISE_WORKERS
     ) -> List[ResultadoAnalise]:
         """
         Analisa um lote de produtos.
         
+        Descrições repetidas (mesmo texto e código de fornecedor) são
+        analisadas uma única vez, e as distintas rodam em paralelo em até
+        `max_workers` threads, já que o tempo é dominado pela IA e pela API.
+        
         Args:
             produtos: Lista de dicts com 'descricao' e opcionalmente 'codigo_fornecedor'
             auto_cadastrar: Se True, cadastra automaticamente
             debug: Se True, imprime informações de debug
+            max_workers: Máximo de análises simultâneas
             
         Returns:
-            Lista de ResultadoAnalise
+            Lista de ResultadoAnalise, na ordem de `produtos`
         """
-        resultados = []
+        chaves = [
+            (chave_descricao(item.get('descricao', '')), item.get('codigo_fornecedor'))
+            for item in produtos
+        ]
+        unicos = {}
+        for chave, item in zip(chaves, produtos):
+            unicos.setdefault(chave, item)
         
-        for item in produtos:
-            descricao = item.get('descricao', '')
-            codigo = item.get('codigo_fornecedor')
-            
-            resultado = self.analisar(
-                descricao_produto=descricao,
-                codigo_fornecedor=codigo,
+        def analisar_item(item):
+            return self.analisar(
+                descricao_produto=item.get('descricao', ''),
+                codigo_fornecedor=item.get('codigo_fornecedor'),
                 auto_cadastrar=auto_cadastrar,
                 debug=debug
             )
-            resultados.append(resultado)
+        
+        if max_workers <= 1 or len(unicos) <= 1:
+            resultados = {chave: analisar_item(item) for chave, item in unicos.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analise') as pool:
+                resultados = dict(zip(unicos, pool.map(analisar_item, unicos.values())))
             
-        return resultados
+        return [resultados[chave] for chave in chaves]
+
+
+def chave_descricao(descricao: str) -> str:
+    """Chave de deduplicação: descrição em maiúsculas com espaços normalizados."""
+    return ' '.join(str(descricao).upper().split())
 
 
 # ============================================================================
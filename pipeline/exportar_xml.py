@@ -1,27 +1,146 @@
-from tools import click_on_image, houver_on_image, apagar_xml_downloads, click_on_all_images
-import time
-import pyautogui
+from tools import (
+    click_on_image, click_on_image_index, houver_on_image, apagar_xml_downloads, click_on_all_images, wait_for_any,
+    wait_for_screen_stable, wait_for_screen_change, screen_reference, wait_for_image, watch_downloads, GridNavigator,
+    press_key, type_text, pause, timeline, Flow, Step,
+)
 import pandas as pd
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime,timedelta
-import xml.etree.ElementTree as ET
 import glob
+from collections import OrderedDict
 
 # Import do analisador de produtos com IA
-from pipeline.analisador_produto import AnalisadorProduto, AcaoRequerida
-from config import DOWNLOADS_PATH
+from pipeline.analisador_produto import AnalisadorProduto, AcaoRequerida, chave_descricao
+from pipeline.nfe import NotaFiscal, ler_nota, hash_arquivo
+from pipeline.journal import NoteJournal, Progresso, SESSAO, STATUS_OK
+from config import DOWNLOADS_PATH, ANALISE_WORKERS, MAX_FALHAS_SEGUIDAS, WORKER_ID, WORKER_INDEX, ITENS_FONTE
 
 read_path = os.path.join(DOWNLOADS_PATH, 'gd_ItensXML.xls')
 xml_download_path = DOWNLOADS_PATH
 
+# Coluna do código do produto na grade de vínculo de itens (a partir da primeira)
+COLUNA_CODIGO_GRADE = 8
+
+# Espera quando não há nota livre para este worker na lista
+ESPERA_SEM_NOTA_S = 30
+
+# Navegação até a lista de notas em aberto com vencimento preenchido
+NAVEGACAO_FLOW = Flow('navegacao', [
+    Step('menu', 'click', 'exportar_xml/EpuPRI53T2.png', settle={'timeout': 5}),
+    Step('todos_os_modulos', 'click', 'exportar_xml/todos_os_modulos.png', settle={'timeout': 5}),
+    Step('fiscal', 'click', 'exportar_xml/fiscal.png', settle={'timeout': 20, 'stable_for': 1.5}),
+    Step('fechar', 'click', 'exportar_xml/fechar.png', timeout=30, settle={'timeout': 5}),
+    Step('aviso_1', 'click', 'exportar_xml/KgFh1LwTzB.png', timeout=30, optional=True),
+    Step('aviso_2', 'click', 'exportar_xml/KgFh1LwTzB.png', timeout=30, optional=True, settle={'timeout': 5}),
+    Step('gerenciador_de_nf', 'click', 'exportar_xml/gerenciador_de_nf.png', settle={'timeout': 5}),
+    Step('calendario', 'click', 'exportar_xml/calendario.png'),
+    Step('limpar', 'click', 'exportar_xml/limpar.png'),
+    Step('data_inicial', 'type', value=lambda ctx: (datetime.now() - timedelta(days=365)).strftime('%d%m%Y')),
+    Step('tab_data_final', 'keys', value='tab'),
+    Step('data_final', 'type', value=lambda ctx: (datetime.now() - timedelta(days=1)).strftime('%d%m%Y'),
+         settle=None),
+    Step('status_xml', 'click', 'exportar_xml/status_xml.png'),
+    Step('status_descer', 'keys', value='down', presses=2, interval=1),
+    Step('aberto', 'click', 'exportar_xml/aberto.png'),
+    Step('filtrar', 'click', 'exportar_xml/filtrar.png', settle={'timeout': 10, 'stable_for': 1.5}),
+    Step('status_aberto', 'click', 'exportar_xml/status_aberto.png', settle=None),
+    Step('ir_para_vencimento', 'keys', value='right', presses=30, interval=0.2),
+    Step('data_venc_hover', 'hover', 'exportar_xml/data_venc.png', optional=True),
+    Step('filtro', 'click', 'exportar_xml/filtro.png'),
+    Step('nao_vazio', 'click', 'exportar_xml/nao_vazio.png'),
+    Step('data_venc', 'click', 'exportar_xml/data_venc.png'),
+    Step('voltar_inicio', 'keys', value='left', presses=30, interval=0.2, settle=None),
+])
+
+# Exportação do XML da nota aberta (depois do duplo clique na linha)
+EXPORTAR_XML_FLOW = Flow('exportar_xml', [
+    Step('outros', 'click', 'exportar_xml/outros.png'),
+    Step('exportar_hover', 'hover', 'exportar_xml/exportar.png', optional=True),
+    Step('exportar_descer', 'keys', value='down', presses=3, interval=1, settle={'timeout': 1}),
+    Step('exportar_confirmar', 'keys', value='enter'),
+    Step('webfile', 'click', 'exportar_xml/webfile.png'),
+    Step('webfile_confirmar', 'keys', value='enter'),
+    Step('ok', 'click', 'exportar_xml/ok.png', optional=True, settle={'timeout': 5}),
+    Step('download_hover', 'hover', 'exportar_xml/lYW5IFXKAw.png', optional=True,
+         settle={'timeout': 10, 'stable_for': 1.5}),
+    Step('fechar', 'click', 'exportar_xml/fechar2.png', timeout=30),
+])
+
+# Exportação da grade de vínculo de itens para XLS (fallback de itens_do_xml)
+ITENS_XLS_FLOW = Flow('itens_xls', [
+    Step('descricao', 'right', 'exportar_xml/descricao.png'),
+    Step('exportar_xls', 'click', 'exportar_xml/exportar_xls.png'),
+    Step('ok', 'click', 'exportar_xml/ok3.png', optional=True),
+    Step('acesso', 'click', 'exportar_xml/acesso.png', confidence=0.9, timeout=30),
+    Step('tab_pastas', 'keys', value='tab', settle=None),
+    Step('pasta_descer', 'keys', value='down', presses=6, interval=0.5),
+    Step('webfile', 'double', 'exportar_xml/webfile2.png', timeout=30),
+    Step('salvar', 'click', 'exportar_xml/salvar.png', timeout=30),
+    Step('confirmar', 'keys', value='enter', settle=None),
+])
+
 
 
 # Instância global do analisador (reutilizada para performance)
 _analisador_produto: Optional[AnalisadorProduto] = None
+_pool_analise: Optional[ThreadPoolExecutor] = None
+
+# Máximo de notas mantidas no cache em memória
+MAX_NOTAS_CACHE = 64
+
+# Cache de notas já lidas, por hash do conteúdo do arquivo
+_notas_cache: "OrderedDict[str, NotaFiscal]" = OrderedDict()
+
+
+def xml_mais_recente() -> Optional[str]:
+    """Caminho do XML mais recente na pasta de downloads, ou None."""
+    xml_files = glob.glob(os.path.join(xml_download_path, '*.xml'))
+    if not xml_files:
+        return None
+    return max(xml_files, key=os.path.getctime)
+
+
+def carregar_nota_fiscal(caminho: Optional[str] = None) -> Optional[NotaFiscal]:
+    """
+    Lê a NF-e do XML uma única vez e devolve o objeto em cache.
+
+    O cache é indexado pelo hash do conteúdo: reabrir o mesmo arquivo (ou
+    uma cópia dele) não faz novo parse; um XML novo com o mesmo nome faz.
+
+    Args:
+        caminho: XML da nota; padrão é o mais recente da pasta de downloads
+
+    Returns:
+        NotaFiscal ou None se não houver XML ou ele for inválido
+    """
+    caminho = caminho or xml_mais_recente()
+    if caminho is None:
+        print("Nenhum arquivo XML encontrado.")
+        return None
+
+    try:
+        hash_xml = hash_arquivo(caminho)
+        nota = _notas_cache.get(hash_xml)
+        if nota is not None:
+            _notas_cache.move_to_end(hash_xml)
+            return nota
+
+        print(f"Lendo XML: {os.path.basename(caminho)}")
+        nota = ler_nota(caminho, hash=hash_xml)
+    except Exception as e:
+        print(f"Erro ao ler XML da NF-e ({os.path.basename(caminho)}): {e}")
+        return None
+
+    _notas_cache[hash_xml] = nota
+    if len(_notas_cache) > MAX_NOTAS_CACHE:
+        _notas_cache.popitem(last=False)
+    return nota
 
 
-def extrair_tipo_frete_xml() -> str:
+def extrair_tipo_frete_xml(nota: Optional[NotaFiscal] = None) -> str:
     """
     Extrai o tipo de frete do XML da NF-e baixado.
 
@@ -31,63 +150,27 @@ def extrair_tipo_frete_xml() -> str:
     - 2 (Por conta de terceiros): 'RED' (ou outro código conforme sistema)
     - 9 (Sem frete): 'RED' (padrão)
 
+    Args:
+        nota: Nota já carregada; padrão é a do XML mais recente
+
     Returns:
         str: Código do tipo de frete ('CIF', 'FOB' ou 'RED')
     """
-    try:
-        # Busca o arquivo XML mais recente na pasta de downloads
-        xml_files = glob.glob(os.path.join(xml_download_path, '*.xml'))
-
-        if not xml_files:
-            print("Nenhum arquivo XML encontrado. Usando CIF como padrão.")
-            return 'CIF'
-
-        # Pega o arquivo XML mais recente
-        xml_mais_recente = max(xml_files, key=os.path.getctime)
-        print(f"Lendo XML: {os.path.basename(xml_mais_recente)}")
-
-        # Parse do XML
-        tree = ET.parse(xml_mais_recente)
-        root = tree.getroot()
-
-        # Namespace da NF-e (necessário para buscar elementos)
-        ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-
-        # Busca o elemento modFrete
-        mod_frete_elem = root.find('.//nfe:transp/nfe:modFrete', ns)
-
-        if mod_frete_elem is None:
-            # Tenta sem namespace (alguns XMLs podem não ter)
-            mod_frete_elem = root.find('.//transp/modFrete')
-
-        if mod_frete_elem is not None:
-            mod_frete = mod_frete_elem.text.strip()
-            print(f"modFrete encontrado no XML: {mod_frete}")
-
-            # Mapeamento conforme documentação da NF-e
-            mapeamento = {
-                '0': 'CIF',  # Emitente
-                '1': 'FOB',  # Destinatário
-                '2': 'RED',  # Terceiros (Redespacho)
-                '3': 'RED',  # Próprio por conta do Remetente
-                '4': 'RED',  # Próprio por conta do Destinatário
-                '9': 'RED'   # Sem frete
-            }
-
-            tipo_frete = mapeamento.get(mod_frete, 'CIF')
-            print(f"Tipo de frete mapeado: {tipo_frete}")
-            return tipo_frete
-        else:
-            print("Campo modFrete não encontrado no XML. Usando CIF como padrão.")
-            return 'CIF'
-
-    except Exception as e:
-        print(f"Erro ao extrair tipo de frete do XML: {e}")
+    nota = nota or carregar_nota_fiscal()
+    if nota is None:
         print("Usando CIF como padrão.")
         return 'CIF'
 
+    if nota.mod_frete is None:
+        print("Campo modFrete não encontrado no XML. Usando CIF como padrão.")
+    else:
+        print(f"modFrete encontrado no XML: {nota.mod_frete}")
+    tipo_frete = nota.tipo_frete
+    print(f"Tipo de frete mapeado: {tipo_frete}")
+    return tipo_frete
+
 
-def extrair_vencimentos_xml() -> list:
+def extrair_vencimentos_xml(nota: Optional[NotaFiscal] = None) -> list:
     """
     Extrai as datas de vencimento das duplicatas do XML da NF-e.
 
@@ -96,63 +179,25 @@ def extrair_vencimentos_xml() -> list:
     - vencimento: Data de vencimento (formato YYYY-MM-DD)
     - valor: Valor da duplicata
 
+    Args:
+        nota: Nota já carregada; padrão é a do XML mais recente
+
     Returns:
         list: Lista de dicionários com dados das duplicatas
     """
-    try:
-        xml_files = glob.glob(os.path.join(xml_download_path, '*.xml'))
-
-        if not xml_files:
-            print("Nenhum arquivo XML encontrado para extrair vencimentos.")
-            return []
-
-        xml_mais_recente = max(xml_files, key=os.path.getctime)
-        print(f"Lendo XML para vencimentos: {os.path.basename(xml_mais_recente)}")
-
-        tree = ET.parse(xml_mais_recente)
-        root = tree.getroot()
-
-        ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-
-        duplicatas = root.findall('.//nfe:cobr/nfe:dup', ns)
-
-        if not duplicatas:
-            duplicatas = root.findall('.//cobr/dup')
-
-        vencimentos = []
-        for dup in duplicatas:
-            # Tenta com namespace primeiro
-            n_dup = dup.find('nfe:nDup', ns)
-            d_venc = dup.find('nfe:dVenc', ns)
-            v_dup = dup.find('nfe:vDup', ns)
-
-            # Se não encontrar, tenta sem namespace
-            if n_dup is None:
-                n_dup = dup.find('nDup')
-            if d_venc is None:
-                d_venc = dup.find('dVenc')
-            if v_dup is None:
-                v_dup = dup.find('vDup')
-
-            vencimento_info = {
-                'numero': n_dup.text.strip() if n_dup is not None else None,
-                'vencimento': d_venc.text.strip() if d_venc is not None else None,
-                'valor': float(v_dup.text.strip()) if v_dup is not None else None
-            }
-            vencimentos.append(vencimento_info)
-
-        print(f"Vencimentos encontrados: {len(vencimentos)}")
-        for v in vencimentos:
-            print(f"  Parcela {v['numero']}: {v['vencimento']} - R$ {v['valor']:.2f}" if v['valor'] else f"  Parcela {v['numero']}: {v['vencimento']}")
+    nota = nota or carregar_nota_fiscal()
+    if nota is None:
+        return []
 
-        return vencimentos
+    vencimentos = nota.vencimentos
+    print(f"Vencimentos encontrados: {len(vencimentos)}")
+    for v in vencimentos:
+        print(f"  Parcela {v['numero']}: {v['vencimento']} - R$ {v['valor']:.2f}" if v['valor'] else f"  Parcela {v['numero']}: {v['vencimento']}")
 
-    except Exception as e:
-        print(f"Erro ao extrair vencimentos do XML: {e}")
-        return []
+    return vencimentos
 
 
-def extrair_parcelas_xml() -> str:
+def extrair_parcelas_xml(nota: Optional[NotaFiscal] = None) -> str:
     """
     Extrai a quantidade de parcelas do XML da NF-e e retorna o código de condição de pagamento.
 
@@ -166,57 +211,89 @@ def extrair_parcelas_xml() -> str:
     - 4 parcelas = '30/60/90/120'
     - etc.
 
+    Args:
+        nota: Nota já carregada; padrão é a do XML mais recente
+
     Returns:
         str: Código da condição de pagamento
     """
-    try:
-        # Busca o arquivo XML mais recente na pasta de downloads
-        xml_files = glob.glob(os.path.join(xml_download_path, '*.xml'))
-
-        if not xml_files:
-            print("Nenhum arquivo XML encontrado. Usando 30D como padrão.")
-            return '30D'
-
-        # Pega o arquivo XML mais recente
-        xml_mais_recente = max(xml_files, key=os.path.getctime)
-        print(f"Lendo XML para parcelas: {os.path.basename(xml_mais_recente)}")
-
-        # Parse do XML
-        tree = ET.parse(xml_mais_recente)
-        root = tree.getroot()
+    nota = nota or carregar_nota_fiscal()
+    if nota is None:
+        print("Usando 30D como padrão.")
+        return '30D'
 
-        # Namespace da NF-e
-        ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+    print(f"Quantidade de parcelas encontradas: {len(nota.duplicatas)}")
+    if not nota.duplicatas:
+        print("Nenhuma duplicata encontrada. Usando 30D como padrão.")
 
-        # Busca todos os elementos <dup> (duplicatas) dentro de <cobr>
-        duplicatas = root.findall('.//nfe:cobr/nfe:dup', ns)
+    condicao = nota.condicao_pagamento
+    print(f"Condição de pagamento: {condicao}")
+    return condicao
 
-        if not duplicatas:
-            # Tenta sem namespace
-            duplicatas = root.findall('.//cobr/dup')
 
-        quantidade_parcelas = len(duplicatas)
-        print(f"Quantidade de parcelas encontradas: {quantidade_parcelas}")
+def itens_do_xml(nota: NotaFiscal, vinculos: Optional[Dict[str, int]] = None) -> pd.DataFrame:
+    """
+    Monta as linhas da grade de vínculo de itens a partir do det/prod do XML.
 
-        if quantidade_parcelas == 0:
-            print("Nenhuma duplicata encontrada. Usando 30D como padrão.")
-            return '30D'
+    As linhas seguem a ordem da grade do ERP (nItem) e usam as mesmas
+    colunas da exportação XLS ('Cód.Produto', 'Descrição XML'), mais o
+    código do item no fornecedor e os dados fiscais. O XML não traz o
+    código do produto no ERP: ele vem de `vinculos` (código do fornecedor ->
+    código do produto) e é 0 para itens sem vínculo conhecido.
 
-        # Monta o código de condição de pagamento
-        if quantidade_parcelas == 1:
-            condicao = '30D'
-        else:
-            # Gera sequência: 30/60/90/120...
-            dias = [str(30 * i) for i in range(1, quantidade_parcelas + 1)]
-            condicao = '/'.join(dias)
+    Args:
+        nota: Nota já carregada
+        vinculos: Vínculos conhecidos do emitente (NoteJournal.vinculos)
 
-        print(f"Condição de pagamento: {condicao}")
-        return condicao
+    Returns:
+        pd.DataFrame: Uma linha por item, na ordem da grade
+    """
+    vinculos = vinculos or {}
+    itens = sorted(nota.itens, key=lambda item: (item.item is None, item.item or 0))
+    return pd.DataFrame({
+        'Item': [item.item for item in itens],
+        'Cód.Fornecedor': [item.codigo for item in itens],
+        'Descrição XML': [item.descricao or '' for item in itens],
+        'EAN': [item.ean for item in itens],
+        'NCM': [item.ncm for item in itens],
+        'Unidade': [item.unidade for item in itens],
+        'Quantidade': [item.quantidade for item in itens],
+        'Valor Unitário': [item.valor_unitario for item in itens],
+        'Cód.Produto': [int(vinculos.get(item.codigo, 0)) for item in itens],
+    }, columns=['Item', 'Cód.Fornecedor', 'Descrição XML', 'EAN', 'NCM', 'Unidade',
+                'Quantidade', 'Valor Unitário', 'Cód.Produto'])
+
+
+def conciliar_itens(df_xml: pd.DataFrame, df_xls: pd.DataFrame) -> Tuple[Dict[str, int], List[str], List[int]]:
+    """
+    Confere linha a linha as linhas do XML com as exportadas do ERP.
 
-    except Exception as e:
-        print(f"Erro ao extrair parcelas do XML: {e}")
-        print("Usando 30D como padrão.")
-        return '30D'
+    Returns:
+        tuple: (vinculos, divergencias, conferidas) — `vinculos` são os códigos
+        de produto do XLS por código do fornecedor, só das linhas em que as
+        descrições batem (0 quando um vínculo conhecido não existe mais no
+        ERP); `divergencias` descreve cada diferença encontrada;
+        `conferidas` são as posições em que as descrições batem
+    """
+    divergencias = []
+    if len(df_xml) != len(df_xls):
+        divergencias.append(f'{len(df_xls)} linhas no XLS e {len(df_xml)} no XML')
+
+    vinculos = {}
+    conferidas = []
+    linhas = zip(df_xml.to_dict('records'), df_xls.to_dict('records'))
+    for posicao, (xml, xls) in enumerate(linhas):
+        if chave_descricao(str(xml['Descrição XML'])) != chave_descricao(str(xls['Descrição XML'])):
+            divergencias.append(f"linha {posicao}: XLS '{xls['Descrição XML']}' x XML '{xml['Descrição XML']}'")
+            continue
+        conferidas.append(posicao)
+        codigo = int(xls['Cód.Produto'])
+        if xml['Cód.Produto'] and codigo != xml['Cód.Produto']:
+            divergencias.append(f"linha {posicao}: vínculo de '{xml['Cód.Fornecedor']}' mudou de "
+                                f"{xml['Cód.Produto']} para {codigo} no ERP")
+        if codigo or xml['Cód.Produto']:
+            vinculos[xml['Cód.Fornecedor']] = codigo
+    return vinculos, divergencias, conferidas
 
 
 def get_analisador() -> AnalisadorProduto:
@@ -227,7 +304,7 @@ def get_analisador() -> AnalisadorProduto:
     return _analisador_produto
 
 
-def analisar_e_obter_id_produto(descricao_item: str, auto_cadastrar: bool = True) -> Dict:
+def analisar_e_obter_id_produto(descricao_item: str, auto_cadastrar: bool = True, debug: bool = True) -> Dict:
     """
     Analisa a descrição do item usando IA e retorna o código do produto.
     
@@ -240,6 +317,7 @@ def analisar_e_obter_id_produto(descricao_item: str, auto_cadastrar: bool = True
     Args:
         descricao_item: Descrição do item da nota fiscal
         auto_cadastrar: Se True, cadastra automaticamente quando produto não existe
+        debug: Se True, imprime o detalhamento da busca
         
     Returns:
         Dict com:
@@ -260,7 +338,7 @@ def analisar_e_obter_id_produto(descricao_item: str, auto_cadastrar: bool = True
     resultado = analisador.analisar(
         descricao_produto=descricao_item,
         auto_cadastrar=auto_cadastrar,
-        debug=True
+        debug=debug
     )
     
     # Monta resposta estruturada
@@ -298,333 +376,444 @@ def analisar_e_obter_id_produto(descricao_item: str, auto_cadastrar: bool = True
     return resposta
 
 
-def exportar_xml():
-    primeiro_loop = True
-    
-    while True:
-    
-        apagar_xml_downloads()
-        if os.path.exists(read_path):
-            os.remove(read_path)
-            
-        time.sleep(5)
-        if primeiro_loop:
-            click_on_image('exportar_xml/EpuPRI53T2.png', confidence=0.7, timeout=20)
-            
-            time.sleep(5)
-            
-            click_on_image('exportar_xml/todos_os_modulos.png', confidence=0.7, timeout=20)
-            
-            time.sleep(5)
-            
-            click_on_image('exportar_xml/fiscal.png', confidence=0.7, timeout=20)
-            
-            time.sleep(20)
-            
-            click_on_image('exportar_xml/fechar.png', confidence=0.7, timeout=30)
-            
-            time.sleep(5)
-            
-            click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
-            time.sleep(2)
-            click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
-        
-            time.sleep(5)
-        
-            click_on_image('exportar_xml/gerenciador_de_nf.png', confidence=0.7, timeout=20)
-        
-            time.sleep(5)
-        
-            click_on_image('exportar_xml/calendario.png', confidence=0.7, timeout=20)
-        
-            time.sleep(2)
-        
-            click_on_image('exportar_xml/limpar.png', confidence=0.7, timeout=20)
-        
-            time.sleep(2)
-        
-            pyautogui.write((datetime.now() - timedelta(days=365)).strftime('%d%m%Y'))
+def _get_pool_analise() -> ThreadPoolExecutor:
+    global _pool_analise
+    if _pool_analise is None:
+        _pool_analise = ThreadPoolExecutor(max_workers=ANALISE_WORKERS, thread_name_prefix='analise')
+    return _pool_analise
+
+
+def pre_analisar_itens(df: pd.DataFrame, progresso: Optional[Progresso] = None) -> Dict[str, Future]:
+    """
+    Dispara em segundo plano a análise de todos os itens sem código da grade.
+
+    Descrições repetidas viram uma única análise (chave_descricao) e no
+    máximo ANALISE_WORKERS rodam ao mesmo tempo. A navegação na grade
+    segue em paralelo e cada linha só espera o resultado da sua descrição.
+
+    Com `progresso`, cada resultado com código vai para o journal da nota
+    e, numa retomada, os já resolvidos são reaproveitados sem nova chamada
+    à IA nem novo cadastro.
+
+    Returns:
+        Dict chave_descricao -> Future com o dict de analisar_e_obter_id_produto
+    """
+    futuros = {}
+    sem_codigo = df[df['Cód.Produto'].astype(int) == 0]
+    if sem_codigo.empty:
+        return futuros
+
+    resolvidos = {}
+    if progresso is not None:
+        resolvidos = {d['descricao']: d['resultado'] for d in progresso.journal.detalhes(progresso.nota, 'analise')}
+
+    def registrar(chave, futuro):
+        if futuro.exception() is None and futuro.result().get('produto_codigo'):
+            progresso.journal.registrar(progresso.nota, 'analise',
+                                        detalhes={'descricao': chave, 'resultado': futuro.result()})
+
+    pool = None
+    for descricao in sem_codigo['Descrição XML'].astype(str).str.strip():
+        chave = chave_descricao(descricao)
+        if chave in futuros:
+            continue
+        if chave in resolvidos:
+            futuros[chave] = Future()
+            futuros[chave].set_result(resolvidos[chave])
+            continue
+        if pool is None:
+            # Cria o analisador (e a carga do matcher) antes de abrir as threads
+            get_analisador()
+            pool = _get_pool_analise()
+        futuros[chave] = pool.submit(analisar_e_obter_id_produto, descricao, True, False)
+        if progresso is not None:
+            futuros[chave].add_done_callback(lambda futuro, chave=chave: registrar(chave, futuro))
+
+    reaproveitados = sum(1 for chave in futuros if chave in resolvidos)
+    print(f'Pré-análise: {len(futuros)} descrições distintas de {len(sem_codigo)} itens sem código '
+          f'({reaproveitados} do journal, {ANALISE_WORKERS} em paralelo)')
+    return futuros
+
+
+def _resultado_pre_analise(futuro: Future) -> Dict:
+    # O tempo bloqueado aqui é a parte da análise que a navegação não escondeu
+    with timeline.medir('wait_analise') as medicao:
+        inicio = time.perf_counter()
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            resultado = {'erro': str(e), 'produto_codigo': None, 'justificativa': None}
+        medicao.ocioso_s = time.perf_counter() - inicio
+        medicao.ok = not resultado.get('erro')
+    return resultado
+
+
+def sessao_na_lista_filtrada(journal: Optional[NoteJournal] = None) -> bool:
+    """
+    Indica se dá para retomar direto na lista filtrada de notas.
+
+    Vale quando a última etapa de sessão no journal é a navegação
+    concluída e a lista ainda está visível na tela (ERP aberto).
+    """
+    journal = journal or NoteJournal()
+    ultima = journal.ultima(SESSAO)
+    if ultima is None or ultima['etapa'] != 'navegacao' or ultima['status'] != STATUS_OK:
+        return False
+    return wait_for_image('exportar_xml/status_aberto.png', confidence=0.7, timeout=3) is not None
+
+
+def _exportar_itens_xls(downloads) -> pd.DataFrame:
+    """Exporta a grade de vínculo de itens para XLS pelo ERP e lê o arquivo baixado."""
+    ITENS_XLS_FLOW.run()
+    xls_path = downloads.wait(os.path.basename(read_path), timeout=30) or read_path
+    return pd.read_excel(xls_path)
+
+
+def _itens_da_nota(nota: Optional[NotaFiscal], journal: NoteJournal, downloads,
+                   fonte: str = ITENS_FONTE) -> Tuple[pd.DataFrame, str]:
+    """
+    Linhas da grade de vínculo de itens, do XML quando possível.
+
+    O XML não diz quais itens já estão vinculados no ERP; por isso, no modo
+    'auto', as linhas só saem do XML quando todo item tem vínculo conhecido
+    no journal. Senão (e sempre no modo 'xls') a grade é exportada para XLS
+    e conciliada com o XML: divergências são avisadas e os vínculos do ERP
+    vão para o journal, para a próxima nota do mesmo fornecedor. No modo
+    'xml' a exportação nunca é feita.
+
+    Returns:
+        tuple: (DataFrame com 'Cód.Produto' e 'Descrição XML', 'xml' ou 'xls')
+    """
+    if fonte not in ('auto', 'xml', 'xls'):
+        raise ValueError(f"ITENS_FONTE inválido: '{fonte}'. Use: ('auto', 'xml', 'xls')")
+
+    df_xml = None
+    if nota is not None and nota.itens:
+        df_xml = itens_do_xml(nota, journal.vinculos(nota.emitente.cnpj))
+        sem_vinculo = int((df_xml['Cód.Produto'] == 0).sum())
+        if fonte == 'xml' or (fonte == 'auto' and sem_vinculo == 0):
+            print(f'Itens lidos do XML ({len(df_xml)} linhas, {sem_vinculo} sem vínculo); exportação XLS dispensada')
+            return df_xml, 'xml'
+        if fonte == 'auto':
+            print(f'{sem_vinculo} de {len(df_xml)} itens sem vínculo conhecido; exportando XLS do ERP')
+    elif fonte == 'xml':
+        print('[WARN] Sem XML da nota; exportando XLS do ERP')
+
+    df = _exportar_itens_xls(downloads)
+    if df_xml is not None:
+        vinculos, divergencias, conferidas = conciliar_itens(df_xml, df)
+        for divergencia in divergencias:
+            print(f'[WARN] Conciliação XML x XLS: {divergencia}')
+        journal.registrar_vinculos(nota.emitente.cnpj, vinculos)
+        # Permite gravar os vínculos feitos nesta nota pelo código do fornecedor,
+        # só nas linhas conferidas: numa grade desalinhada o código seria de outro item
+        fornecedor = [None] * len(df)
+        for posicao in conferidas:
+            fornecedor[posicao] = df_xml['Cód.Fornecedor'].iat[posicao]
+        df['Cód.Fornecedor'] = fornecedor
+    return df, 'xls'
+
+
+def _processar_proxima_nota(progresso: Progresso, navegar: bool, linha: int = 0) -> Optional[bool]:
+    """
+    Recebe a nota em aberto da `linha` da lista, registrando cada etapa concluída no journal.
+
+    Na retomada o journal pula: a navegação (se a lista filtrada ainda está
+    na tela), a análise de IA/cadastro de cada item já resolvido e a nota
+    inteira se ela já chegou a 'concluida'. As demais etapas da nota (de
+    'xml' a 'parcelas') preenchem formulários do ERP que não sobrevivem a
+    uma queda e são refeitas desde o início da nota.
+
+    Returns:
+        True se a nota foi recebida, False se ela já estava reservada por
+        outro worker ou já concluída (o detalhe dela fica aberto: o chamador
+        volta para a lista pela navegação) e None se a lista não tem essa linha
+    """
+    timeline.nova_execucao()
+    apagar_xml_downloads(xml_download_path)
+    if os.path.exists(read_path):
+        os.remove(read_path)
+
+    # Armado antes dos downloads: devolve o caminho exato do XML e do XLS.
+    # O bloco fecha o observador (fd do inotify) também quando uma etapa falha
+    with watch_downloads(xml_download_path) as downloads:
+        wait_for_screen_stable(timeout=5)
+        if navegar:
+            NAVEGACAO_FLOW.run()
+            progresso.concluir('navegacao')
+
+        if linha == 0:
+            click_on_image('exportar_xml/status_aberto.png', click_type='double', confidence=0.7, timeout=20)
+        elif not click_on_image_index('exportar_xml/status_aberto.png', linha, click_type='double',
+                                      confidence=0.7, timeout=5, continue_after_fail=True):
+            # Menos notas em aberto que a linha pedida: volta para a primeira
+            return None
+
+        wait_for_screen_stable(timeout=2)
+
+        EXPORTAR_XML_FLOW.run()
+
+        # Lê o XML da nota uma vez; frete, parcelas e vencimentos saem do mesmo objeto
+        nota = carregar_nota_fiscal(downloads.wait('*.xml', timeout=30))
+        chave = nota.chave if nota is not None else None
+        # Com vários workers, a nota só segue se a reserva for deste worker
+        if chave and not progresso.journal.reservar(chave, WORKER_ID):
+            print(f'Nota {nota.numero} ({chave}) já reservada por outro worker; voltando para a lista.')
+            return False
+        ultima = progresso.journal.ultima(chave) if chave else None
+        if ultima is not None and ultima['etapa'] == 'concluida' and ultima['status'] == STATUS_OK:
+            print(f"Nota {nota.numero} ({chave}) já concluída em {ultima['registrado_em']}; voltando para a lista.")
+            return False
+        # Daqui em diante as etapas são da nota (chave provisória se o XML não foi lido)
+        progresso.identificar(chave)
+        timeline.identificar(chave)
+        if nota is not None:
+            progresso.concluir('xml', numero=nota.numero, emitente=nota.emitente.nome, itens=len(nota.itens))
 
-            time.sleep(2)
-            pyautogui.press('tab')
-            time.sleep(2)
-            pyautogui.write((datetime.now() - timedelta(days=1)).strftime('%d%m%Y'))
-        
-            click_on_image('exportar_xml/status_xml.png', confidence=0.7, timeout=20)
-        
-            time.sleep(2)
-        
-            pyautogui.press('down', presses=2, interval=1)
-        
-            time.sleep(2)
-        
-            click_on_image('exportar_xml/aberto.png', confidence=0.7, timeout=20)
-        
-            time.sleep(2)
-        
-            click_on_image('exportar_xml/filtrar.png', confidence=0.7, timeout=20)
-        
-            time.sleep(10)
-            
-            click_on_image('exportar_xml/status_aberto.png', confidence=0.7, timeout=20)
-            
-            pyautogui.press('right', presses=30, interval=0.2)
-            
-            time.sleep(2)
-            
-            houver_on_image('exportar_xml/data_venc.png', confidence=0.7, timeout=20)
-            
-            time.sleep(2)
-            
-            click_on_image('exportar_xml/filtro.png', confidence=0.7, timeout=20)
-            
-            time.sleep(2)
-            
-            click_on_image('exportar_xml/nao_vazio.png', confidence=0.7, timeout=20)
-            
-            time.sleep(2)
-            
-            click_on_image('exportar_xml/data_venc.png', confidence=0.7, timeout=20)
-            
-            time.sleep(2)
-            
-            pyautogui.press('left', presses=30, interval=0.2)
-    
-            primeiro_loop = False
-        
-        click_on_image('exportar_xml/status_aberto.png', click_type='double', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/outros.png', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        houver_on_image('exportar_xml/exportar.png', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        pyautogui.press('down', presses=3, interval=1)
-        
-        time.sleep(1)
-        
-        pyautogui.press('enter')
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/webfile.png', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        pyautogui.press('enter')
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/ok.png', confidence=0.7, timeout=20, continue_after_fail=True)
-        
-        time.sleep(5)
-        
-        houver_on_image('exportar_xml/lYW5IFXKAw.png', confidence=0.7, timeout=20)
-        
-        time.sleep(10)
-        click_on_image('exportar_xml/fechar2.png', confidence=0.7, timeout=30)
-        
-        time.sleep(2)
-        
         click_on_image('exportar_xml/receber.png', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        pyautogui.press('down', presses=2, interval=1)
-        
-        pyautogui.press('enter')
-        
-        time.sleep(15)
-        
-        pyautogui.write('864')
-        
-        time.sleep(2)
-        
-        pyautogui.press('tab')
-        
-        time.sleep(2)
-        
-        pyautogui.write('NFS')
-        
-        pyautogui.press('tab', presses=3, interval=1)
+
+        wait_for_screen_stable(timeout=2)
+
+        press_key('down', presses=2, interval=1)
+
+        # O código só pode ser digitado com o formulário de recebimento aberto:
+        # exige que a tela reaja ao enter, não só que fique parada (tela parada
+        # também é o ERP ainda sem responder)
+        antes = screen_reference()
+        press_key('enter')
+        if wait_for_screen_change(antes, timeout=15) is None:
+            raise Exception('Formulário de recebimento não abriu após o enter')
+
+        wait_for_screen_stable(timeout=15, stable_for=1.5)
+
+        type_text('864')
+
+        wait_for_screen_stable(timeout=2)
+
+        press_key('tab')
+
+        wait_for_screen_stable(timeout=2)
+
+        type_text('NFS')
+
+        press_key('tab', presses=3, interval=1)
 
         # Extrai o tipo de frete do XML e usa no sistema
-        tipo_frete = extrair_tipo_frete_xml()
+        tipo_frete = extrair_tipo_frete_xml(nota)
 
-        pyautogui.write(tipo_frete)
+        type_text(tipo_frete)
 
-        pyautogui.press('tab')
+        press_key('tab')
 
-        condicao_pagamento = extrair_parcelas_xml()
-        pyautogui.write(condicao_pagamento)
+        condicao_pagamento = extrair_parcelas_xml(nota)
+        type_text(condicao_pagamento)
+        progresso.concluir('cabecalho', tipo_frete=tipo_frete, condicao_pagamento=condicao_pagamento)
+
+
+        wait_for_screen_stable(timeout=2)
 
-        
-        time.sleep(2)
-        
         click_on_image('exportar_xml/vincular_itens.png', confidence=0.7, timeout=20)
 
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/descricao.png', click_type='right', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/exportar_xls.png', confidence=0.7, timeout=20)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/ok3.png', confidence=0.7, timeout=20, continue_after_fail=True)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/acesso.png', confidence=0.9, timeout=30)
-        
-        time.sleep(2)
-        
-        pyautogui.press('tab')
-        
-        pyautogui.press('down', presses=6, interval=0.5)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/webfile2.png',click_type='double', confidence=0.7, timeout=30)
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/salvar.png', confidence=0.7, timeout=30)
-        
-        time.sleep(2)
-        
-        pyautogui.press('enter')
-        
-        time.sleep(10)
-        
-        df = pd.read_excel(read_path)
-        
-        print(f'Total de linhas no excel: {df.shape[0]}')
-        
-        pyautogui.press('up', presses=df.shape[0], interval=0.5)
-        
-        time.sleep(2)
-        
-        pyautogui.press('right', presses=4, interval=0.2)
-        
-        time.sleep(2)
-        pyautogui.press('right', presses=4, interval=0.5) 
-        time.sleep(2)
-        
-        for row, values in df.iterrows():
-            codigo_produto = int(values['Cód.Produto'])
-            descricao_item = str(values['Descrição XML']).strip()
+        wait_for_screen_stable(timeout=2)
+
+        df, fonte = _itens_da_nota(nota, progresso.journal, downloads)
+    
+    print(f'Total de linhas ({fonte}): {df.shape[0]}')
+    
+    # Análises de IA/API rodam enquanto a grade é navegada e preenchida
+    progresso.concluir('itens_exportados', linhas=df.shape[0], fonte=fonte)
+    analises = pre_analisar_itens(df, progresso)
+    
+    # Ctrl+Home e deslocamento direto até a coluna do código; só as linhas
+    # editadas são visitadas, com intervalo ajustado à resposta da grade
+    grade = GridNavigator()
+    grade.home()
+    # A medição desce uma linha e volta: só com outra linha abaixo (descer da
+    # última numa grade editável pode inserir linha em branco) e se algo for editado
+    if df.shape[0] > 1 and (df['Cód.Produto'].astype(int) == 0).any():
+        grade.calibrate()
+    grade.move_to(0, COLUNA_CODIGO_GRADE)
+    
+    # Vínculos digitados nesta nota; só vão para o journal quando ela for confirmada
+    vinculados = {}
+    for posicao, (row, values) in enumerate(df.iterrows()):
+        codigo_produto = int(values['Cód.Produto'])
+        descricao_item = str(values['Descrição XML']).strip()
+        
+        if codigo_produto == 0:
+            print(f'Produto sem código: {descricao_item}')
+            
+            resultado_ia = _resultado_pre_analise(analises[chave_descricao(descricao_item)])
             
-            if codigo_produto == 0:
-                print(f'Produto sem código: {descricao_item}')
+            if resultado_ia['erro']:
+                print(f'Erro na análise: {resultado_ia["erro"]}')
+                continue
+            
+            if resultado_ia['produto_codigo']:
+                if resultado_ia['produto_novo']:
+                    print(f'Produto CADASTRADO com código: {resultado_ia["produto_codigo"]}')
+                else:
+                    print(f'Produto ENCONTRADO com código: {resultado_ia["produto_codigo"]}')
+                print(f'Descrição: {resultado_ia["descricao_match"]}')
+                print(f'Confiança: {resultado_ia["confianca"]} ({resultado_ia["similaridade"]}%)')
+                print(f'Justificativa: {resultado_ia["justificativa"]}')
                 
-                resultado_ia = analisar_e_obter_id_produto(descricao_item, auto_cadastrar=True)
                 
-                if resultado_ia['erro']:
-                    print(f'Erro na análise: {resultado_ia["erro"]}')
-                    continue
+                if resultado_ia.get('dados_cadastro'):
+                    dados = resultado_ia['dados_cadastro']
+                    if dados.get('grupo'):
+                        grupo = dados['grupo']
+                        print(f'     Grupo: {grupo.get("codigo")} - {grupo.get("descricao", "N/A")}')
+                    if dados.get('unidade'):
+                        unidade = dados['unidade']
+                        print(f'     Unidade: {unidade.get("codigo")}')
                 
-                if resultado_ia['produto_codigo']:
-                    if resultado_ia['produto_novo']:
-                        print(f'Produto CADASTRADO com código: {resultado_ia["produto_codigo"]}')
-                    else:
-                        print(f'Produto ENCONTRADO com código: {resultado_ia["produto_codigo"]}')
-                    print(f'Descrição: {resultado_ia["descricao_match"]}')
-                    print(f'Confiança: {resultado_ia["confianca"]} ({resultado_ia["similaridade"]}%)')
-                    print(f'Justificativa: {resultado_ia["justificativa"]}')
-                    
-                    
-                    if resultado_ia.get('dados_cadastro'):
-                        dados = resultado_ia['dados_cadastro']
-                        if dados.get('grupo'):
-                            grupo = dados['grupo']
-                            print(f'     Grupo: {grupo.get("codigo")} - {grupo.get("descricao", "N/A")}')
-                        if dados.get('unidade'):
-                            unidade = dados['unidade']
-                            print(f'     Unidade: {unidade.get("codigo")}')
-                    
-                    codigo_produto = resultado_ia['produto_codigo']
-                    
-                    print(f'Vinculando produto no sistema...')
-                    
-                    pyautogui.write(str(codigo_produto))
-                else:
-                    print(f'Não foi possível identificar/cadastrar o produto')
-                    print(f'Justificativa: {resultado_ia["justificativa"]}')
-                    
-                            
-            pyautogui.press('down')
-            
+                codigo_produto = resultado_ia['produto_codigo']
                 
-        print('---')
-        print('Processo de exportação e vinculação finalizado.')
-        time.sleep(5)
-        
-        click_on_image('exportar_xml/vincular_pedidos.png', confidence=0.7, timeout=30)
-        
-        time.sleep(2)
-        
-        pyautogui.press('enter')
-        
-        time.sleep(2)
-        
-        click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=30, continue_after_fail=True)
-        time.sleep(2)
-        click_on_image('exportar_xml/sim.png', confidence=0.7, timeout=30, continue_after_fail=True)
-        time.sleep(2)
-        click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=10, continue_after_fail=True)
-        
-        time.sleep(10)
+                print(f'Vinculando produto no sistema...')
+                
+                # Coluna explícita: se um deslocamento falhou, a grade voltou para (0, 0)
+                if not grade.move_to(posicao, COLUNA_CODIGO_GRADE):
+                    print(f'[WARN] Cursor da grade não confirmado na linha {posicao}; '
+                          f'item não vinculado: {descricao_item}')
+                    continue
+                type_text(str(codigo_produto))
+                grade.down()
+                if values.get('Cód.Fornecedor'):
+                    vinculados[values['Cód.Fornecedor']] = codigo_produto
+            else:
+                print(f'Não foi possível identificar/cadastrar o produto')
+                print(f'Justificativa: {resultado_ia["justificativa"]}')
+            
+    print(f'Navegação na grade: {grade.stats()}')
+    progresso.concluir('itens_vinculados', **grade.stats())
+    print('---')
+    print('Processo de exportação e vinculação finalizado.')
+    wait_for_screen_stable(timeout=5)
+    
+    click_on_image('exportar_xml/vincular_pedidos.png', confidence=0.7, timeout=30)
+    
+    wait_for_screen_stable(timeout=2)
+    
+    press_key('enter')
+    
+    wait_for_screen_stable(timeout=2)
+    
+    # Diálogos opcionais, na ordem fixa do ERP (confirmar -> sim -> confirmar):
+    # cada passo só procura o seu botão, para o "confirmar" do formulário que
+    # continua visível atrás do modal nunca ser clicado no lugar do "sim".
+    # A cadeia toda divide um prazo só e para no primeiro diálogo que não vem
+    prazo = time.time() + 30
+    for dialogo in ('confirmar', 'sim', 'confirmar'):
+        encontrado, _ = wait_for_any([f'exportar_xml/{dialogo}.png'], confidence=0.7,
+                                     timeout=max(0, prazo - time.time()), click_type='single')
+        if encontrado is None:
+            break
+        wait_for_screen_stable(timeout=2)
+    
+    wait_for_screen_stable(timeout=10, stable_for=1.5)
+    progresso.concluir('pedidos')
 
-        
-        click_on_image('exportar_xml/serie_ap.png', confidence=0.7, timeout=30)
-        time.sleep(2)
-        
-        pyautogui.write('AP')
-        
-        pyautogui.press('tab', presses=4, interval=1)
-        
-        time.sleep(2)
-        
-        pyautogui.write('2')
-        time.sleep(2)
-        
-        pyautogui.press('tab')
-        time.sleep(2)
     
-        click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=30)
-        
-        time.sleep(20)
-
-        vencimentos = extrair_vencimentos_xml()
-        for v in vencimentos:
-            print(f"Parcela {v['numero']}: Vencimento {v['vencimento']} - Valor R$ {v['valor']:.2f}" if v['valor'] else f"Parcela {v['numero']}: Vencimento {v['vencimento']}")
-            click_on_image('exportar_xml/parcelas.png', confidence=0.7, timeout=30)
-            time.sleep(2)
-            pyautogui.press('tab')
-            time.sleep(2)     
-            vencimento_dt = datetime.strptime(v['vencimento'], '%Y-%m-%d')
-            pyautogui.write(vencimento_dt.strftime('%d%m%Y'))
-            time.sleep(2)
-            pyautogui.press('tab')
-            time.sleep(2)
-            pyautogui.write(vencimento_dt.strftime('%d%m%Y'))
-            
-            if int(v.index) == len(vencimentos):    
-                click_on_all_images('exportar_xml/down.png', confidence=0.7)
-            
-            click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
-            time.sleep(2)
-            click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
-        
-        click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=30)
-        time.sleep(5)
-        
-        
+    click_on_image('exportar_xml/serie_ap.png', confidence=0.7, timeout=30)
+    wait_for_screen_stable(timeout=2)
+    
+    type_text('AP')
+    
+    press_key('tab', presses=4, interval=1)
+    
+    wait_for_screen_stable(timeout=2)
+    
+    type_text('2')
+    wait_for_screen_stable(timeout=2)
+    
+    press_key('tab')
+    wait_for_screen_stable(timeout=2)
+
+    click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=30)
+    
+    wait_for_screen_stable(timeout=20, stable_for=1.5)
+
+    vencimentos = extrair_vencimentos_xml(nota)
+    for numero_parcela, v in enumerate(vencimentos, start=1):
+        print(f"Parcela {v['numero']}: Vencimento {v['vencimento']} - Valor R$ {v['valor']:.2f}" if v['valor'] else f"Parcela {v['numero']}: Vencimento {v['vencimento']}")
+        click_on_image('exportar_xml/parcelas.png', confidence=0.7, timeout=30)
+        wait_for_screen_stable(timeout=2)
+        press_key('tab')
+        wait_for_screen_stable(timeout=2)
+        vencimento_dt = datetime.strptime(v['vencimento'], '%Y-%m-%d')
+        type_text(vencimento_dt.strftime('%d%m%Y'))
+        wait_for_screen_stable(timeout=2)
+        press_key('tab')
+        wait_for_screen_stable(timeout=2)
+        type_text(vencimento_dt.strftime('%d%m%Y'))
+        
+        if numero_parcela == len(vencimentos):
+            click_on_all_images('exportar_xml/down.png', confidence=0.7)
+        
+        click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
+        wait_for_screen_stable(timeout=2)
+        click_on_image('exportar_xml/KgFh1LwTzB.png', confidence=0.7, timeout=30, continue_after_fail=True)
+    progresso.concluir('parcelas', quantidade=len(vencimentos))
+    
+    click_on_image('exportar_xml/confirmar.png', confidence=0.7, timeout=30)
+    wait_for_screen_stable(timeout=5)
+    progresso.concluir('concluida')
+    if nota is not None:
+        progresso.journal.registrar_vinculos(nota.emitente.cnpj, vinculados)
+    return True
+
+
+def exportar_xml(retomar: bool = True, na_lista: Optional[bool] = None):
+    """
+    Recebe as notas em aberto, uma por vez, até não haver mais.
+
+    Falhas numa nota ficam registradas no journal e o fluxo volta ao
+    último ponto seguro (a lista filtrada, refazendo só a navegação), sem
+    novo login. Depois de MAX_FALHAS_SEGUIDAS falhas seguidas o erro sobe.
+
+    No modo multi-worker (supervisor.py) o worker começa pela linha
+    WORKER_INDEX da lista e só recebe notas que conseguir reservar no
+    journal; nota de outro worker (ou já concluída no journal) faz ele
+    voltar para a lista e tentar a linha seguinte. Depois de uma nota recebida a linha se mantém: a nota
+    sai da lista de abertas e as linhas anteriores continuam com os outros.
+
+    Args:
+        retomar: Se True e a lista filtrada ainda estiver aberta, pula a navegação
+        na_lista: Resultado de sessao_na_lista_filtrada() já obtido pelo chamador;
+            None consulta aqui
+    """
+    journal = NoteJournal()
+    if na_lista is None:
+        na_lista = retomar and sessao_na_lista_filtrada(journal)
+    navegar = not (retomar and na_lista)
+    if not navegar:
+        print('Lista de notas já filtrada na tela; retomando sem refazer a navegação.')
+    falhas_seguidas = 0
+    # Cada worker começa por uma linha diferente da lista para não disputar a mesma nota
+    linha = WORKER_INDEX
+
+    while True:
+        progresso = Progresso(journal)
+        try:
+            recebida = _processar_proxima_nota(progresso, navegar, linha)
+        except Exception as e:
+            progresso.falhar(e)
+            falhas_seguidas += 1
+            print(f'Falha na nota {progresso.nota} após a etapa {progresso.etapa}: {e}')
+            if falhas_seguidas >= MAX_FALHAS_SEGUIDAS:
+                raise
+            navegar = True
+            continue
+
+        falhas_seguidas = 0
+        navegar = False
+        if recebida is None:
+            # Todas as notas visíveis estão com outros workers: espera a lista andar
+            print(f'Nenhuma nota livre a partir da linha {linha}; aguardando {ESPERA_SEM_NOTA_S}s.')
+            pause(ESPERA_SEM_NOTA_S, 'sem_nota_livre')
+            linha = 0
+        elif recebida is False:
+            # O detalhe da nota reservada (ou já concluída) ficou aberto: a navegação volta para a lista
+            navegar = True
+            linha += 1
@@ -0,0 +1,180 @@
+"""
+Journal de etapas por nota fiscal (SQLite, só inserções).
+
+Cada etapa concluída (ou falha) vira uma linha em `etapas`; nada é
+atualizado ou apagado, então uma queda no meio de uma gravação nunca
+corrompe o histórico. Na retomada o fluxo consulta o journal para pular
+o que já foi feito:
+
+- sessão ('_sessao:<worker>'): navegação até a lista filtrada de notas; se a
+  tela ainda está nela, login e filtros não são refeitos;
+- por nota (chave da NF-e): resultados de análise/cadastro de cada
+  item, para não chamar a IA nem cadastrar o mesmo produto de novo.
+  Nota sem chave legível fica numa chave provisória ('_sem_chave:...'),
+  nunca na da sessão, para não confundir a retomada.
+
+As tabelas com atualização são `reservas`, que garante que no modo
+multi-worker uma nota seja processada por um único worker, e `vinculos`,
+o último código de produto do ERP conhecido para cada código de item de
+cada fornecedor (lido da exportação XLS ou digitado pelo próprio bot).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import JOURNAL_DB, RESERVA_TTL_S, WORKER_ID
+
+# Etapas de sessão são por worker: cada um tem seu display e sua sessão no ERP
+SESSAO = f'_sessao:{WORKER_ID}'
+
+STATUS_OK = 'ok'
+STATUS_FALHA = 'falha'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS etapas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nota TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    status TEXT NOT NULL,
+    detalhes TEXT,
+    registrado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_etapas_nota ON etapas (nota, etapa);
+CREATE TABLE IF NOT EXISTS reservas (
+    nota TEXT PRIMARY KEY,
+    worker TEXT NOT NULL,
+    reservado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vinculos (
+    fornecedor TEXT NOT NULL,
+    codigo_fornecedor TEXT NOT NULL,
+    produto_codigo INTEGER NOT NULL,
+    atualizado_em TEXT NOT NULL,
+    PRIMARY KEY (fornecedor, codigo_fornecedor)
+);
+"""
+
+
+class NoteJournal:
+    """Journal durável das etapas de cada nota; seguro para uso entre threads."""
+
+    def __init__(self, path: str = JOURNAL_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Vários processos (workers) escrevem no mesmo arquivo: espera o lock em vez de falhar
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def registrar(self, nota: str, etapa: str, status: str = STATUS_OK, detalhes: Optional[Dict] = None):
+        texto = json.dumps(detalhes, ensure_ascii=False, default=str) if detalhes else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO etapas (nota, etapa, status, detalhes, registrado_em) VALUES (?, ?, ?, ?, ?)',
+                (nota, etapa, status, texto, datetime.now().isoformat(timespec='seconds')),
+            )
+
+    def ultima(self, nota: str) -> Optional[Dict]:
+        """Último registro da nota: {'etapa', 'status', 'detalhes', 'registrado_em'} ou None."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etapa, status, detalhes, registrado_em FROM etapas WHERE nota = ? ORDER BY id DESC LIMIT 1',
+                (nota,),
+            ).fetchone()
+        if row is None:
+            return None
+        etapa, status, detalhes, registrado_em = row
+        return {'etapa': etapa, 'status': status, 'registrado_em': registrado_em,
+                'detalhes': json.loads(detalhes) if detalhes else None}
+
+    def detalhes(self, nota: str, etapa: str) -> list:
+        """Detalhes de todos os registros OK de uma etapa da nota, em ordem."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT detalhes FROM etapas WHERE nota = ? AND etapa = ? AND status = ? ORDER BY id',
+                (nota, etapa, STATUS_OK),
+            ).fetchall()
+        return [json.loads(d) for d, in rows if d]
+
+    def reservar(self, nota: str, worker: str, ttl_s: float = RESERVA_TTL_S) -> bool:
+        """
+        Reserva a nota para `worker` de forma atômica.
+
+        Funciona se a nota está livre, já é do próprio worker (retomada) ou
+        a reserva de outro worker tem mais de `ttl_s` segundos.
+
+        Returns:
+            bool: True se a nota ficou com este worker
+        """
+        agora = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO reservas (nota, worker, reservado_em) VALUES (?, ?, ?) '
+                'ON CONFLICT(nota) DO UPDATE SET worker = excluded.worker, reservado_em = excluded.reservado_em '
+                'WHERE reservas.worker = excluded.worker OR reservas.reservado_em < ?',
+                (nota, worker, agora, agora - ttl_s),
+            )
+        return cursor.rowcount == 1
+
+    def liberar(self, worker: str):
+        """Libera as reservas de um worker (encerrado pelo supervisor)."""
+        with self._lock:
+            self._conn.execute('DELETE FROM reservas WHERE worker = ?', (worker,))
+
+    def vinculos(self, fornecedor: str) -> Dict[str, int]:
+        """Códigos de produto conhecidos do fornecedor (CNPJ): código do item no fornecedor -> código no ERP."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT codigo_fornecedor, produto_codigo FROM vinculos WHERE fornecedor = ?', (fornecedor,)
+            ).fetchall()
+        return dict(rows)
+
+    def registrar_vinculos(self, fornecedor: str, vinculos: Dict[str, int]):
+        """Grava (ou atualiza) vínculos item do fornecedor -> produto; código 0 apaga o vínculo."""
+        if not fornecedor:
+            return
+        agora = datetime.now().isoformat(timespec='seconds')
+        gravar = [(fornecedor, str(codigo), int(produto), agora)
+                  for codigo, produto in vinculos.items() if codigo and produto]
+        apagar = [(fornecedor, str(codigo)) for codigo, produto in vinculos.items() if codigo and not produto]
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO vinculos (fornecedor, codigo_fornecedor, produto_codigo, atualizado_em) '
+                'VALUES (?, ?, ?, ?) ON CONFLICT(fornecedor, codigo_fornecedor) DO UPDATE SET '
+                'produto_codigo = excluded.produto_codigo, atualizado_em = excluded.atualizado_em',
+                gravar,
+            )
+            self._conn.executemany(
+                'DELETE FROM vinculos WHERE fornecedor = ? AND codigo_fornecedor = ?', apagar)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Progresso:
+    """Etapa corrente de uma nota no journal (a nota só é conhecida depois do XML)."""
+
+    def __init__(self, journal: NoteJournal, nota: str = SESSAO):
+        self.journal = journal
+        self.nota = nota
+        self.etapa: Optional[str] = None
+
+    def identificar(self, nota: Optional[str]):
+        """Passa a registrar na chave da NF-e; sem chave (XML ilegível), numa provisória desta tentativa."""
+        self.nota = nota or f'_sem_chave:{WORKER_ID}:{datetime.now().isoformat(timespec="microseconds")}'
+
+    def concluir(self, etapa: str, **detalhes):
+        self.journal.registrar(self.nota, etapa, STATUS_OK, detalhes or None)
+        self.etapa = etapa
+
+    def falhar(self, erro: Exception):
+        self.journal.registrar(self.nota, self.etapa or 'inicio', STATUS_FALHA,
+                               {'erro': f"{type(erro).__name__}: {erro}"})
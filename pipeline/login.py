@@ -1,42 +1,37 @@
-from tools import init_chrome, close_chrome, click_on_image, houver_on_image
-import time 
-import pyautogui
+from config import CALIBRATION_ANCHORS
+from tools import init_chrome, close_chrome, ensure_calibrated, timeline, Flow, Step
 
-def login(usuario, senha, usuario_mega="mega", senha_mega="a"):
-    
-    close_chrome()
-    init_chrome(url="https://dev.megaerp.online/", anonimo=False)
-    time.sleep(5)
-    click_on_image('login/usuario.png', confidence=0.7, timeout=60)
-    pyautogui.press('tab')
-    pyautogui.write(usuario)
-    pyautogui.press('tab')
-    pyautogui.write(senha)
-    
-    click_on_image('login/acessar.png', confidence=0.7, timeout=20)
-    time.sleep(5)
-    click_on_image('login/conection.png', confidence=0.7, timeout=320, click_type='double')
-    time.sleep(10)
-    click_on_image('login/minimizar.png', confidence=0.7, timeout=30)
-    time.sleep(10)
-    click_on_image('login/abrir_mega.png', confidence=0.7, timeout=30, click_type='double')
-    time.sleep(10)
-    click_on_image('login/logo.png', confidence=0.7, timeout=30)
-    pyautogui.press('tab')
-    time.sleep(1)
-    pyautogui.write(usuario_mega)
-    time.sleep(1)
-    pyautogui.press('tab')
-    
-    pyautogui.write(senha_mega)
-    
-    click_on_image('login/autenticar.png', confidence=0.7, timeout=30)
-    time.sleep(15)
-    
-    click_on_image('login/fechar.png', confidence=0.7, timeout=30)
-    time.sleep(5)
-    
-    print("Login realizado com sucesso.")
+LOGIN_FLOW = Flow('login', [
+    Step('fechar_chrome', 'call', value=lambda ctx: close_chrome(), settle=None),
+    Step('abrir_chrome', 'call', value=lambda ctx: init_chrome(url="https://dev.megaerp.online/", anonimo=False),
+         settle={'timeout': 5}),
+    Step('calibrar', 'call', value=lambda ctx: ensure_calibrated(CALIBRATION_ANCHORS, timeout=60),
+         settle=None),
+    Step('usuario', 'click', 'login/usuario.png', timeout=60, settle=None),
+    Step('tab_usuario', 'keys', value='tab', settle=None),
+    Step('digitar_usuario', 'type', value=lambda ctx: ctx['usuario'], settle=None),
+    Step('tab_senha', 'keys', value='tab', settle=None),
+    Step('digitar_senha', 'type', value=lambda ctx: ctx['senha'], settle=None),
+    Step('acessar', 'click', 'login/acessar.png', settle={'timeout': 5}),
+    Step('conexao', 'double', 'login/conection.png', timeout=320, settle={'timeout': 10, 'stable_for': 1.5}),
+    Step('minimizar', 'click', 'login/minimizar.png', timeout=30, settle={'timeout': 10, 'stable_for': 1.5}),
+    Step('abrir_mega', 'double', 'login/abrir_mega.png', timeout=30, settle={'timeout': 10, 'stable_for': 1.5}),
+    Step('logo', 'click', 'login/logo.png', timeout=30, settle=None),
+    Step('tab_usuario_mega', 'keys', value='tab', settle={'timeout': 1}),
+    Step('digitar_usuario_mega', 'type', value=lambda ctx: ctx['usuario_mega'], settle={'timeout': 1}),
+    Step('tab_senha_mega', 'keys', value='tab', settle=None),
+    Step('digitar_senha_mega', 'type', value=lambda ctx: ctx['senha_mega'], settle=None),
+    Step('autenticar', 'click', 'login/autenticar.png', timeout=30, settle={'timeout': 15, 'stable_for': 1.5}),
+    Step('fechar', 'click', 'login/fechar.png', timeout=30, settle={'timeout': 5}),
+])
+
+
+def login(usuario, senha, usuario_mega="mega", senha_mega="a", dry_run=False):
+
+    timeline.nova_execucao('login')
+    ctx = {'usuario': usuario, 'senha': senha, 'usuario_mega': usuario_mega, 'senha_mega': senha_mega}
+    LOGIN_FLOW.run(ctx, dry_run=dry_run)
+
+    if not dry_run:
+        print("Login realizado com sucesso.")
     return True
-    
-    
\ No newline at end of file
@@ -0,0 +1,312 @@
+"""
+Leitura de XMLs de NF-e.
+
+O parser é em streaming (ET.iterparse): cada <det>, <dup>, <transp>,
+<emit> e <ide> vira um registro assim que o elemento termina e é limpo
+e removido do pai em seguida, então a memória não cresce com o tamanho do arquivo. A
+mesma leitura monta a NotaFiscal usada pelo fluxo de exportação e
+alimenta o processamento em lote de pastas com um pool de processos.
+"""
+
+import glob
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Tuple
+
+from config import NFE_WORKERS
+
+NFE_NAMESPACE = 'http://www.portalfiscal.inf.br/nfe'
+
+# Mapeamento de <modFrete> para o código usado no sistema
+MAPA_MOD_FRETE = {
+    '0': 'CIF',  # Emitente
+    '1': 'FOB',  # Destinatário
+    '2': 'RED',  # Terceiros (Redespacho)
+    '3': 'RED',  # Próprio por conta do Remetente
+    '4': 'RED',  # Próprio por conta do Destinatário
+    '9': 'RED'   # Sem frete
+}
+
+# Grupos do infNFe descartados assim que terminam, mesmo sem registro
+_GRUPOS_DESCARTADOS = {'dest', 'total', 'cobr', 'pag', 'infAdic', 'autXML', 'infRespTec'}
+
+
+def _local(tag: str) -> Optional[str]:
+    # Nome local da tag se ela for da NF-e (com ou sem namespace); None para outros namespaces
+    namespace, _, nome = tag.rpartition('}')
+    if namespace in ('', '{' + NFE_NAMESPACE):
+        return nome
+    return None
+
+
+def _texto(elem, caminho: str) -> Optional[str]:
+    # Caminhos usam {*} para aceitar XMLs com ou sem o namespace da NF-e
+    if elem is None:
+        return None
+    achado = elem.find(caminho)
+    if achado is None or achado.text is None:
+        return None
+    return achado.text.strip()
+
+
+def _numero(valor: Optional[str]) -> Optional[float]:
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+class Emitente:
+    __slots__ = ('cnpj', 'nome', 'fantasia', 'uf')
+
+    def __init__(self, cnpj=None, nome=None, fantasia=None, uf=None):
+        self.cnpj = cnpj
+        self.nome = nome
+        self.fantasia = fantasia
+        self.uf = uf
+
+    def __repr__(self):
+        return f"Emitente(cnpj={self.cnpj!r}, nome={self.nome!r})"
+
+
+class Transporte:
+    __slots__ = ('mod_frete', 'cnpj', 'nome')
+
+    def __init__(self, mod_frete=None, cnpj=None, nome=None):
+        self.mod_frete = mod_frete
+        self.cnpj = cnpj
+        self.nome = nome
+
+    def __repr__(self):
+        return f"Transporte(mod_frete={self.mod_frete!r}, nome={self.nome!r})"
+
+
+class Duplicata:
+    __slots__ = ('numero', 'vencimento', 'valor')
+
+    def __init__(self, numero=None, vencimento=None, valor=None):
+        self.numero = numero
+        self.vencimento = vencimento
+        self.valor = valor
+
+    def to_dict(self) -> Dict:
+        return {'numero': self.numero, 'vencimento': self.vencimento, 'valor': self.valor}
+
+    def __repr__(self):
+        return f"Duplicata({self.numero!r}, {self.vencimento!r}, {self.valor!r})"
+
+
+class ItemNota:
+    __slots__ = ('item', 'codigo', 'descricao', 'ean', 'ncm', 'cfop',
+                 'unidade', 'quantidade', 'valor_unitario', 'valor_total')
+
+    def __init__(self, item=None, codigo=None, descricao=None, ean=None, ncm=None, cfop=None,
+                 unidade=None, quantidade=None, valor_unitario=None, valor_total=None):
+        self.item = item
+        self.codigo = codigo
+        self.descricao = descricao
+        self.ean = ean
+        self.ncm = ncm
+        self.cfop = cfop
+        self.unidade = unidade
+        self.quantidade = quantidade
+        self.valor_unitario = valor_unitario
+        self.valor_total = valor_total
+
+    def __repr__(self):
+        return f"ItemNota({self.item!r}, {self.codigo!r}, {self.descricao!r})"
+
+
+class NotaFiscal:
+    """
+    NF-e lida uma única vez do XML.
+
+    Guarda só o que o fluxo usa (emitente, transp/modFrete, cobr/dup e
+    det/prod); tipo de frete, condição de pagamento e vencimentos são
+    derivados desses campos sem reler o arquivo.
+    """
+    __slots__ = ('caminho', 'hash', 'chave', 'numero', 'serie', 'emitente',
+                 'transporte', 'duplicatas', 'itens')
+
+    def __init__(self, caminho, hash, chave=None, numero=None, serie=None, emitente=None,
+                 transporte=None, duplicatas=None, itens=None):
+        self.caminho = caminho
+        self.hash = hash
+        self.chave = chave
+        self.numero = numero
+        self.serie = serie
+        self.emitente = emitente or Emitente()
+        self.transporte = transporte or Transporte()
+        self.duplicatas = duplicatas or []
+        self.itens = itens or []
+
+    @property
+    def mod_frete(self) -> Optional[str]:
+        return self.transporte.mod_frete
+
+    @property
+    def tipo_frete(self) -> str:
+        """Código do tipo de frete ('CIF', 'FOB' ou 'RED'); CIF se ausente."""
+        if self.mod_frete is None:
+            return 'CIF'
+        return MAPA_MOD_FRETE.get(self.mod_frete, 'CIF')
+
+    @property
+    def condicao_pagamento(self) -> str:
+        """'30D' para até 1 parcela, senão '30/60/90...' conforme as duplicatas."""
+        quantidade = len(self.duplicatas)
+        if quantidade <= 1:
+            return '30D'
+        return '/'.join(str(30 * i) for i in range(1, quantidade + 1))
+
+    @property
+    def vencimentos(self) -> list:
+        return [dup.to_dict() for dup in self.duplicatas]
+
+    def __repr__(self):
+        return (f"NotaFiscal(numero={self.numero!r}, emitente={self.emitente.nome!r}, "
+                f"itens={len(self.itens)}, duplicatas={len(self.duplicatas)})")
+
+
+def iter_registros(origem) -> Iterator[Tuple[str, object]]:
+    """
+    Percorre o XML em streaming e produz (tipo, registro).
+
+    Tipos: 'chave' (str), 'ide' (dict com numero/serie), 'emitente'
+    (Emitente), 'item' (ItemNota), 'transporte' (Transporte) e
+    'duplicata' (Duplicata). Cada elemento é limpo e solto do pai logo
+    depois de lido.
+
+    Args:
+        origem: Caminho do XML ou objeto arquivo binário
+    """
+    # Ancestrais do elemento corrente: o grupo lido sai do pai, senão o
+    # infNFe acumularia um <det> vazio por item
+    pilha = []
+    for evento, elem in ET.iterparse(origem, events=('start', 'end')):
+        if evento == 'start':
+            pilha.append(elem)
+        else:
+            pilha.pop()
+        nome = _local(elem.tag)
+        if nome is None:
+            continue
+
+        if evento == 'start':
+            if nome == 'infNFe':
+                chave = elem.get('Id') or ''
+                yield 'chave', chave[3:] if chave.startswith('NFe') else chave
+            continue
+
+        if nome == 'det':
+            prod = elem.find('{*}prod')
+            n_item = elem.get('nItem')
+            yield 'item', ItemNota(
+                item=int(n_item) if n_item else None,
+                codigo=_texto(prod, '{*}cProd'),
+                descricao=_texto(prod, '{*}xProd'),
+                ean=_texto(prod, '{*}cEAN'),
+                ncm=_texto(prod, '{*}NCM'),
+                cfop=_texto(prod, '{*}CFOP'),
+                unidade=_texto(prod, '{*}uCom'),
+                quantidade=_numero(_texto(prod, '{*}qCom')),
+                valor_unitario=_numero(_texto(prod, '{*}vUnCom')),
+                valor_total=_numero(_texto(prod, '{*}vProd')),
+            )
+        elif nome == 'dup':
+            yield 'duplicata', Duplicata(
+                numero=_texto(elem, '{*}nDup'),
+                vencimento=_texto(elem, '{*}dVenc'),
+                valor=_numero(_texto(elem, '{*}vDup')),
+            )
+        elif nome == 'transp':
+            yield 'transporte', Transporte(
+                mod_frete=_texto(elem, '{*}modFrete'),
+                cnpj=_texto(elem, '{*}transporta/{*}CNPJ'),
+                nome=_texto(elem, '{*}transporta/{*}xNome'),
+            )
+        elif nome == 'emit':
+            yield 'emitente', Emitente(
+                cnpj=_texto(elem, '{*}CNPJ') or _texto(elem, '{*}CPF'),
+                nome=_texto(elem, '{*}xNome'),
+                fantasia=_texto(elem, '{*}xFant'),
+                uf=_texto(elem, '{*}enderEmit/{*}UF'),
+            )
+        elif nome == 'ide':
+            yield 'ide', {'numero': _texto(elem, '{*}nNF'), 'serie': _texto(elem, '{*}serie')}
+        elif nome not in _GRUPOS_DESCARTADOS:
+            continue
+
+        elem.clear()
+        if pilha:
+            pilha[-1].remove(elem)
+
+
+def ler_nota(origem, caminho: Optional[str] = None, hash: Optional[str] = None) -> NotaFiscal:
+    """Monta a NotaFiscal a partir dos registros de `iter_registros`."""
+    nota = NotaFiscal(caminho=caminho or (origem if isinstance(origem, str) else None), hash=hash)
+    for tipo, registro in iter_registros(origem):
+        if tipo == 'item':
+            if registro.item is None:
+                registro.item = len(nota.itens) + 1
+            nota.itens.append(registro)
+        elif tipo == 'duplicata':
+            nota.duplicatas.append(registro)
+        elif tipo == 'transporte':
+            nota.transporte = registro
+        elif tipo == 'emitente':
+            nota.emitente = registro
+        elif tipo == 'ide':
+            nota.numero, nota.serie = registro['numero'], registro['serie']
+        elif tipo == 'chave' and nota.chave is None:
+            nota.chave = registro
+    return nota
+
+
+def hash_arquivo(caminho: str, bloco: int = 1 << 16) -> str:
+    """SHA-1 do conteúdo do arquivo, lido em blocos."""
+    sha1 = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            sha1.update(parte)
+    return sha1.hexdigest()
+
+
+def _ler_arquivo(caminho: str) -> NotaFiscal:
+    return ler_nota(caminho, hash=hash_arquivo(caminho))
+
+
+def processar_pasta(pasta: str, padrao: str = '*.xml', workers: int = NFE_WORKERS,
+                    max_pendentes: Optional[int] = None) -> Iterator[NotaFiscal]:
+    """
+    Lê todos os XMLs de uma pasta em paralelo, produzindo uma NotaFiscal por arquivo.
+
+    Os arquivos são listados de forma preguiçosa e no máximo
+    `max_pendentes` (padrão: 2 x workers) ficam em andamento ao mesmo
+    tempo, então a memória não depende da quantidade de arquivos. As
+    notas saem na ordem em que terminam; arquivos inválidos são
+    reportados e ignorados.
+    """
+    max_pendentes = max_pendentes or 2 * workers
+    arquivos = glob.iglob(os.path.join(pasta, padrao))
+
+    def concluidas(futuros):
+        for futuro in futuros:
+            caminho = pendentes.pop(futuro)
+            try:
+                yield futuro.result()
+            except Exception as e:
+                print(f"[WARN] Falha ao ler XML {os.path.basename(caminho)}: {e}")
+
+    pendentes = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for caminho in arquivos:
+            pendentes[pool.submit(_ler_arquivo, caminho)] = caminho
+            if len(pendentes) >= max_pendentes:
+                prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                yield from concluidas(prontos)
+        while pendentes:
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            yield from concluidas(prontos)
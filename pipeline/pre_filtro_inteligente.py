@@ -13,20 +13,39 @@ Vantagens:
 
 import re
 import json
+import time
+from itertools import islice
+
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterable, Optional, Tuple
 from dataclasses import dataclass
 from fuzzywuzzy import fuzz
 from abc import ABC, abstractmethod
 import os
 import sys
 
+try:
+    from rapidfuzz import fuzz as rfuzz
+    from rapidfuzz.process import cdist
+except ImportError:
+    rfuzz = None
+    cdist = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
 # Adiciona diretório pai ao path para imports
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from config import PRODUTOS_CACHE
+from config import (
+    PRODUTOS_CACHE, FUZZY_BACKEND, FUZZY_WORKERS,
+    PREFILTRO_GERADOR, TFIDF_NGRAM, TFIDF_CANDIDATOS, TFIDF_LOTE,
+)
 
 
 # ============================================================================
@@ -268,8 +287,121 @@ Responda APENAS com JSON válido:
 # PRÉ-FILTRO TRADICIONAL (mantido da v2.1)
 # ============================================================================
 
+# fuzzywuzzy (full_process com force_ascii) apaga os caracteres 128-255 antes
+# de trocar \W por espaço; o scorer em lote repete isso para dar os mesmos scores
+_LATIN1 = {i: None for i in range(128, 256)}
+
+
+def _processar_como_fuzzywuzzy(texto: str) -> str:
+    return re.sub(r'(?ui)\W', ' ', texto.translate(_LATIN1)).lower().strip()
+
+
+class IndiceTfidf:
+    """
+    TF-IDF de n-gramas de caracteres (matriz esparsa) das descrições.
+    
+    A matriz do catálogo é montada uma vez; um lote de consultas vira outra
+    matriz esparsa no mesmo vocabulário e a similaridade de cosseno com o
+    catálogo inteiro sai de um único produto de matrizes.
+    
+    Cada n-grama é um inteiro de 63 bits (21 bits por caractere, n <= 3),
+    extraído com numpy de todos os textos de uma vez.
+    """
+    
+    BITS_CARACTERE = 21
+    
+    def __init__(self, textos: List[str], n: int = TFIDF_NGRAM):
+        if sparse is None:
+            raise ImportError("Instale: pip install scipy")
+        if not 1 <= n <= 3:
+            raise ValueError(f"n-grama de {n} caracteres não cabe em 63 bits (use 1 a 3)")
+        self.n = n
+        linhas, codigos = self._ngramas(textos)
+        self.vocab, colunas = np.unique(codigos, return_inverse=True)
+        del codigos
+        
+        contagens = self._contagens(linhas, colunas.ravel().astype(np.int32), len(textos))
+        del linhas, colunas
+        df = np.bincount(contagens.indices, minlength=len(self.vocab))
+        self.idf = (np.log((1 + len(textos)) / (1 + df)) + 1).astype(np.float32)
+        # n-grama x produto: o produto consulta @ matriz já sai por produto
+        self._matriz_t = self._pesar(contagens).T.tocsr()
+    
+    def _ngramas(self, textos: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(linha, código do n-grama) de cada n-grama dos textos (com espaço nas pontas)."""
+        n = self.n
+        textos = [f' {texto} ' for texto in textos]
+        tamanhos = np.fromiter(map(len, textos), dtype=np.int64, count=len(textos))
+        chars = np.frombuffer(''.join(textos).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        
+        # Início de cada n-grama sem atravessar a fronteira entre textos
+        por_texto = np.maximum(tamanhos - n + 1, 0)
+        linhas = np.repeat(np.arange(len(textos), dtype=np.int32), por_texto)
+        inicios = np.repeat(np.cumsum(tamanhos) - tamanhos - (np.cumsum(por_texto) - por_texto), por_texto)
+        inicios += np.arange(len(linhas))
+        
+        codigos = np.zeros(len(inicios), dtype=np.uint64)
+        for j in range(n):
+            codigos = (codigos << np.uint64(self.BITS_CARACTERE)) | chars[inicios + j]
+        return linhas, codigos
+    
+    def _contagens(self, linhas: np.ndarray, colunas: np.ndarray, n_linhas: int):
+        # Pares (linha, coluna) repetidos são somados na conversão para CSR
+        return sparse.csr_matrix(
+            (np.ones(len(colunas), dtype=np.float32), (linhas, colunas)),
+            shape=(n_linhas, len(self.vocab)),
+        )
+    
+    def _pesar(self, contagens):
+        """tf sublinear (1 + log) x idf, linhas normalizadas (L2)."""
+        matriz = contagens.copy()
+        matriz.data = (1 + np.log(matriz.data)) * self.idf[matriz.indices]
+        normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+        normas[normas == 0] = 1
+        return sparse.diags(1 / normas).dot(matriz).tocsr()
+    
+    def buscar(self, consultas: List[str], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k do catálogo para cada consulta (já normalizada como `_norm`).
+        
+        Returns:
+            list: (posições, similaridades) por consulta, da mais parecida para
+            a menos; só produtos com algum n-grama em comum
+        """
+        resultados = []
+        for inicio in range(0, len(consultas), TFIDF_LOTE):
+            bloco = consultas[inicio:inicio + TFIDF_LOTE]
+            linhas, codigos = self._ngramas(bloco)
+            colunas = np.minimum(np.searchsorted(self.vocab, codigos), max(len(self.vocab) - 1, 0))
+            conhecidos = self.vocab[colunas] == codigos if len(self.vocab) else np.zeros(len(codigos), bool)
+            consulta = self._pesar(self._contagens(linhas[conhecidos], colunas[conhecidos], len(bloco)))
+            
+            # Um produto de matrizes por bloco (o bloco limita a memória do resultado)
+            similaridades = consulta.dot(self._matriz_t).tocsr()
+            for i in range(len(bloco)):
+                a, b = similaridades.indptr[i], similaridades.indptr[i + 1]
+                posicoes, valores = similaridades.indices[a:b], similaridades.data[a:b]
+                if len(valores) > k:
+                    top = np.argpartition(-valores, k - 1)[:k]
+                    posicoes, valores = posicoes[top], valores[top]
+                ordem = np.lexsort((posicoes, -valores))
+                resultados.append((posicoes[ordem].astype(np.int64), valores[ordem]))
+        return resultados
+
+
 class PreFiltroTradicional:
-    """Pré-filtro rápido usando técnicas tradicionais."""
+    """
+    Pré-filtro rápido usando técnicas tradicionais.
+    
+    Scorers: 'rapidfuzz' (lote query x candidatos com cdist, em todos os
+    núcleos) ou 'fuzzywuzzy' (legado, um candidato por vez, para conferir
+    paridade dos scores); 'auto' usa rapidfuzz se estiver instalado.
+    
+    Geradores de candidatos: 'tfidf' (top-k por TF-IDF de n-gramas de
+    caracteres sobre o catálogo inteiro) ou 'indice' (mesmo tipo de produto +
+    produtos com uma das três primeiras palavras); 'auto' usa tfidf se o
+    scipy estiver instalado.
+    """
     
     PRODUTOS_PRINCIPAIS = {
         'CERA', 'SABAO', 'DETERGENTE', 'DESINFETANTE', 'LIMPA', 'LIMPADOR',
@@ -292,31 +424,207 @@ class PreFiltroTradicional:
     
     PREFIXOS_SECUNDARIOS = {'COR', 'TIPO', 'MODELO', 'LINHA', 'GIZ', 'TONS', 'TOM'}
     
-    def __init__(self, df_produtos: pd.DataFrame):
+    # Colunas da busca exata por código, em ordem de prioridade (só as que existirem)
+    COLUNAS_CODIGO = ('PRO_ST_CODREAL', 'alternativo', 'PRO_IN_CODIGO', 'ean', 'gtin', 'codigo_barras')
+    
+    # Colunas copiadas para listas para montar resultados sem pandas
+    COLUNAS_RESULTADO = ('PRO_ST_CODREAL', 'PRO_ST_DESCRICAO', 'PRO_IN_CODIGO', 'GRU_IN_CODIGO')
+    
+    SCORERS = ('rapidfuzz', 'fuzzywuzzy')
+    GERADORES = ('tfidf', 'indice')
+    
+    def __init__(self, df_produtos: pd.DataFrame, scorer: str = FUZZY_BACKEND, gerador: str = PREFILTRO_GERADOR):
+        self.scorer = self._resolver_scorer(scorer)
+        self.gerador = self._resolver_gerador(gerador)
         self.df = df_produtos.copy()
         self._preparar_indices()
     
+    @classmethod
+    def _resolver_gerador(cls, gerador: str) -> str:
+        if gerador == 'auto':
+            return 'tfidf' if sparse is not None else 'indice'
+        if gerador not in cls.GERADORES:
+            raise ValueError(f"Gerador inválido: '{gerador}'. Use 'auto', 'tfidf' ou 'indice'")
+        if gerador == 'tfidf' and sparse is None:
+            raise ImportError("Instale: pip install scipy")
+        return gerador
+    
+    @classmethod
+    def _resolver_scorer(cls, scorer: str) -> str:
+        if scorer == 'auto':
+            return 'rapidfuzz' if cdist is not None else 'fuzzywuzzy'
+        if scorer not in cls.SCORERS:
+            raise ValueError(f"Scorer inválido: '{scorer}'. Use 'auto', 'rapidfuzz' ou 'fuzzywuzzy'")
+        if scorer == 'rapidfuzz' and cdist is None:
+            raise ImportError("Instale: pip install rapidfuzz")
+        return scorer
+    
     def _preparar_indices(self):
+        inicio = time.perf_counter()
+        
         # Garante que colunas são string
         self.df['PRO_ST_CODREAL'] = self.df['PRO_ST_CODREAL'].astype(str).str.strip()
         self.df['PRO_ST_DESCRICAO'] = self.df['PRO_ST_DESCRICAO'].astype(str).fillna('')
         
+        # Pontuação e espaços viram um espaço só: uma passada de \W+ equivale a
+        # trocar [^\w\s] por espaço e depois colapsar \s+
         self.df['_norm'] = (
             self.df['PRO_ST_DESCRICAO']
             .str.upper()
-            .str.replace(r'[^\w\s]', ' ', regex=True)
-            .str.replace(r'\s+', ' ', regex=True)
+            .str.replace(r'\W+', ' ', regex=True)
             .str.strip()
         )
         
-        self.indice_tipo = {}
-        self.tipo_cache = {}
+        self._norm_lista = self.df['_norm'].tolist()
+        if self.scorer == 'rapidfuzz':
+            # _norm já só tem \w e espaços: basta o resto do full_process
+            self._norm_processado = (
+                self.df['_norm'].str.translate(_LATIN1).str.lower().str.strip().tolist()
+            )
+        
+        self._indexar_codigos()
+        
+        # Uma linha por palavra: posição do produto no catálogo + token
+        palavras = self.df['_norm'].str.split().reset_index(drop=True).explode().dropna()
+        posicoes = pd.Series(palavras.index.to_numpy(dtype=np.int64))
+        tokens = pd.Series(palavras.to_numpy(dtype=object))
         
-        for idx, row in self.df.iterrows():
-            tipo = self._identificar_tipo(row['_norm'])
-            if tipo:
-                self.tipo_cache[idx] = tipo
-                self.indice_tipo.setdefault(tipo, []).append(idx)
+        self._indexar_tipos(posicoes, tokens)
+        self._indexar_tokens(posicoes, tokens)
+        self.tfidf = IndiceTfidf(self._norm_lista) if self.gerador == 'tfidf' else None
+        
+        self.estatisticas_indices = {
+            'produtos': len(self.df),
+            'tokens': len(self._vocab),
+            'tempo_s': round(time.perf_counter() - inicio, 3),
+        }
+        print(f"[INFO] Pré-filtro: {len(self.df)} produtos indexados em "
+              f"{self.estatisticas_indices['tempo_s']:.2f}s")
+    
+    @staticmethod
+    def _chaves_codigo(serie: pd.Series) -> pd.Series:
+        """Códigos normalizados como na consulta (maiúsculas, sem espaços nas pontas); vazios viram NaN."""
+        if pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+            serie = serie.astype('Int64')  # 123.0 lido do Excel/JSON vira '123'
+        chaves = serie.astype(str).str.upper().str.strip()
+        return chaves.where(serie.notna() & (chaves != ''))
+    
+    def _indexar_codigos(self):
+        """Dicionários código -> posições das linhas, por coluna de código presente."""
+        self.indice_codigo = {}
+        for coluna in self.COLUNAS_CODIGO:
+            if coluna in self.df.columns:
+                chaves = self._chaves_codigo(self.df[coluna]).reset_index(drop=True).dropna()
+                indice = {}
+                for pos, chave in zip(chaves.index.tolist(), chaves.tolist()):
+                    indice.setdefault(chave, []).append(pos)
+                self.indice_codigo[coluna] = indice
+        
+        self._resultado = {
+            coluna: self.df[coluna].tolist()
+            for coluna in self.COLUNAS_RESULTADO if coluna in self.df.columns
+        }
+    
+    def _indexar_tipos(self, posicoes: pd.Series, tokens: pd.Series):
+        """
+        Tipo de cada produto (mesma regra de _identificar_tipo) sem percorrer
+        linha a linha: compara cada palavra com as duas anteriores do mesmo
+        produto e fica com a primeira palavra principal válida.
+        """
+        anterior = tokens.shift(1).where(posicoes.eq(posicoes.shift(1)))
+        anterior2 = tokens.shift(2).where(posicoes.eq(posicoes.shift(2)))
+        valido = (
+            tokens.isin(self.PRODUTOS_PRINCIPAIS)
+            & ~anterior.isin(self.PREFIXOS_SECUNDARIOS)
+            & ~(anterior.eq('DE') & anterior2.isin(self.PREFIXOS_SECUNDARIOS))
+        )
+        primeiro = valido & ~posicoes.where(valido).duplicated()
+        
+        rotulos = self.df.index[posicoes[primeiro].to_numpy()]
+        tipos = tokens[primeiro].to_numpy()
+        self.tipo_cache = dict(zip(rotulos, tipos))
+        self.indice_tipo = {
+            tipo: list(grupo)
+            for tipo, grupo in pd.Series(rotulos).groupby(tipos, sort=False)
+        }
+        
+        # Mesmo índice por posição, usado pelo scorer em lote ('' = sem tipo)
+        pos_tipo = posicoes[primeiro].to_numpy()
+        self._tipo_pos = np.full(len(self.df), '', dtype=object)
+        self._tipo_pos[pos_tipo] = tipos
+        self._posicoes_tipo = {
+            tipo: grupo.tolist()
+            for tipo, grupo in pd.Series(pos_tipo).groupby(tipos, sort=False)
+        }
+    
+    def _indexar_tokens(self, posicoes: pd.Series, tokens: pd.Series):
+        """
+        Índice invertido das descrições normalizadas.
+        
+        - token -> posições (ordenadas) das linhas que contêm o token
+        - trigrama -> ids (ordenados) dos tokens do vocabulário que contêm o
+          trigrama, para achar palavras parciais sem varrer o catálogo
+        """
+        pares = pd.DataFrame({'pos': posicoes, 'token': tokens}).drop_duplicates()
+        ids, vocab = pd.factorize(pares['token'], sort=True)
+        ordem = np.argsort(ids, kind='stable')
+        limites = np.cumsum(np.bincount(ids, minlength=len(vocab)))[:-1]
+        
+        self._vocab = list(vocab)
+        self._postings = np.split(pares['pos'].to_numpy(dtype=np.int32)[ordem], limites)
+        self._token_id = {token: i for i, token in enumerate(self._vocab)}
+        
+        trigramas = {}
+        for i, token in enumerate(self._vocab):
+            for tri in {token[j:j + 3] for j in range(len(token) - 2)}:
+                trigramas.setdefault(tri, []).append(i)
+        self._trigramas = {tri: np.asarray(ids, dtype=np.int32) for tri, ids in trigramas.items()}
+    
+    def _tokens_contendo(self, parte: str) -> np.ndarray:
+        """Ids dos tokens do vocabulário que contêm `parte`."""
+        if len(parte) < 3:
+            return np.array([i for i, token in enumerate(self._vocab) if parte in token], dtype=np.int32)
+        
+        listas = []
+        for tri in {parte[j:j + 3] for j in range(len(parte) - 2)}:
+            ids = self._trigramas.get(tri)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            listas.append(ids)
+        
+        # Interseção começando pela lista mais curta
+        listas.sort(key=len)
+        ids = listas[0]
+        for outra in listas[1:]:
+            ids = np.intersect1d(ids, outra, assume_unique=True)
+            if not len(ids):
+                return ids
+        
+        if len(parte) > 3:
+            # Ter todos os trigramas não garante a substring inteira
+            ids = ids[np.fromiter((parte in self._vocab[i] for i in ids), dtype=bool, count=len(ids))]
+        return ids
+    
+    def _posicoes_contendo(self, parte: str) -> np.ndarray:
+        """
+        Posições (ordenadas) das linhas cujo `_norm` contém `parte`.
+        
+        Mesmo resultado de `_norm.str.contains(re.escape(parte))` para uma
+        palavra sem espaços: como `_norm` só tem letras/dígitos separados por
+        espaço, a ocorrência cabe num único token e vira a união das listas
+        dos tokens que contêm `parte`.
+        """
+        if not parte:
+            return np.arange(len(self.df), dtype=np.int32)
+        if re.search(r'[^\w]', parte):
+            return np.empty(0, dtype=np.int32)
+        
+        ids = self._tokens_contendo(parte)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int32)
+        if len(ids) == 1:
+            return self._postings[ids[0]]
+        return np.unique(np.concatenate([self._postings[i] for i in ids]))
     
     def _identificar_tipo(self, desc: str) -> Optional[str]:
         palavras = desc.split()
@@ -331,47 +639,144 @@ class PreFiltroTradicional:
                 return p_limpa
         return None
     
+    def buscar_codigo(self, codigo) -> List[Dict]:
+        """
+        Produtos cujo código (PRO_ST_CODREAL, alternativo, PRO_IN_CODIGO ou
+        código de barras, nessa ordem) é exatamente `codigo`.
+        
+        Consulta só os dicionários montados em _preparar_indices, sem pandas.
+        """
+        chave = str(codigo).upper().strip()
+        if not chave:
+            return []
+        for indice in self.indice_codigo.values():
+            posicoes = indice.get(chave)
+            if posicoes is not None:
+                return [self._to_dict(self._linha(pos), 100, 'codigo') for pos in posicoes]
+        return []
+    
+    def buscar_codigos(self, codigos: Iterable) -> Dict[str, List[Dict]]:
+        """Resolve vários códigos de uma vez: {codigo: produtos} (lista vazia se não achou)."""
+        return {codigo: self.buscar_codigo(codigo) for codigo in codigos}
+    
+    def _linha(self, pos: int) -> Dict:
+        return {coluna: valores[pos] for coluna, valores in self._resultado.items()}
+    
+    @staticmethod
+    def _normalizar(texto: str) -> str:
+        """Mesma normalização da coluna `_norm`."""
+        return re.sub(r'\W+', ' ', texto.upper()).strip()
+    
     def filtrar(self, query: str, limite: int = 20) -> List[Dict]:
-        query_norm = query.upper().strip()
+        return self.filtrar_batch([query], limite)[0]
+    
+    def filtrar_batch(self, queries: List[str], limite: int = 20) -> List[List[Dict]]:
+        """
+        filtrar() de várias consultas. Com o gerador 'tfidf' os candidatos de
+        todas saem do mesmo produto de matrizes esparsas.
+        """
+        consultas = [query.upper().strip() for query in queries]
         
-        # Match exato por código (coluna já é string após _preparar_indices)
-        match_cod = self.df[self.df['PRO_ST_CODREAL'].str.upper().str.strip() == query_norm]
-        if not match_cod.empty:
-            return [self._to_dict(row, 100, 'codigo') for _, row in match_cod.iterrows()]
+        # Match exato por código (dicionários, sem varrer o catálogo)
+        resultados = [self.buscar_codigo(query_norm) for query_norm in consultas]
+        pendentes = [i for i, exatos in enumerate(resultados) if not exatos]
+        
+        if self.gerador == 'tfidf':
+            achados = self.tfidf.buscar([self._normalizar(consultas[i]) for i in pendentes],
+                                        max(TFIDF_CANDIDATOS, limite))
+            candidatos = [posicoes for posicoes, _ in achados]
+        else:
+            candidatos = [self._candidatos_indice(consultas[i], limite) for i in pendentes]
         
-        # Identifica tipo da query
+        for i, posicoes in zip(pendentes, candidatos):
+            resultados[i] = self._ranquear(consultas[i], posicoes, limite)
+        return resultados
+    
+    def _candidatos_indice(self, query_norm: str, limite: int) -> np.ndarray:
+        """Candidatos do mesmo tipo da consulta, completados por palavras da consulta."""
         tipo_query = self._identificar_tipo(query_norm)
         
-        # Busca por tipo
-        candidatos = pd.DataFrame()
-        if tipo_query and tipo_query in self.indice_tipo:
-            indices = self.indice_tipo[tipo_query]
-            candidatos = self.df.loc[indices]
+        # Busca por tipo (posições no catálogo)
+        posicoes = list(self._posicoes_tipo.get(tipo_query, [])) if tipo_query else []
         
-        # Expande se necessário
-        if len(candidatos) < limite:
+        # Expande se necessário (listas do índice invertido, sem varrer o catálogo)
+        if len(posicoes) < limite:
+            vistos = set(posicoes)
             palavras = [p for p in query_norm.split() if len(p) > 2]
             for p in palavras[:3]:
-                mask = self.df['_norm'].str.contains(re.escape(p), na=False)
-                extras = self.df[mask & ~self.df.index.isin(candidatos.index)]
-                candidatos = pd.concat([candidatos, extras.head(limite)])
-                if len(candidatos) >= limite * 2:
+                novas = (int(pos) for pos in self._posicoes_contendo(p) if pos not in vistos)
+                extras = list(islice(novas, limite))
+                posicoes.extend(extras)
+                vistos.update(extras)
+                if len(posicoes) >= limite * 2:
                     break
         
-        # Scoring
-        scores = []
-        for idx, row in candidatos.iterrows():
-            score = self._calcular_score(query_norm, row['_norm'], idx, tipo_query)
-            scores.append((idx, score))
-        
-        scores.sort(key=lambda x: x[1], reverse=True)
+        return np.asarray(posicoes, dtype=np.int64)
+    
+    def _ranquear(self, query_norm: str, posicoes: np.ndarray, limite: int) -> List[Dict]:
+        # Scoring em lote; sort estável mantém a ordem dos candidatos nos empates
+        scores = self.pontuar([query_norm], posicoes)[0]
+        ordem = np.argsort(-scores, kind='stable')[:limite]
         
         return [
-            self._to_dict(self.df.loc[idx], score, 'fuzzy')
-            for idx, score in scores[:limite]
+            self._to_dict(self._linha(pos), int(score), 'fuzzy')
+            for pos, score in zip(posicoes[ordem], scores[ordem])
             if score >= 30
         ]
     
+    def pontuar(
+        self,
+        queries: List[str],
+        posicoes: Optional[np.ndarray] = None,
+        tipos: Optional[List[Optional[str]]] = None
+    ) -> np.ndarray:
+        """
+        Scores de cada consulta contra cada candidato numa chamada só: a
+        mesma mistura de _calcular_score (token_sort 40%, token_set 30%,
+        partial 30%) com o bônus/penalidade de tipo.
+        
+        Args:
+            queries: Consultas em maiúsculas
+            posicoes: Posições dos candidatos no catálogo (None = catálogo inteiro)
+            tipos: Tipo de cada consulta (None = identifica)
+        
+        Returns:
+            np.ndarray: Scores inteiros 0-100, shape (len(queries), len(posicoes))
+        """
+        if posicoes is None:
+            posicoes = np.arange(len(self.df))
+        if tipos is None:
+            tipos = [self._identificar_tipo(q) for q in queries]
+        
+        if self.scorer == 'fuzzywuzzy':
+            rotulos = self.df.index[posicoes]
+            scores = [
+                [self._calcular_score(q, self._norm_lista[pos], idx, tipo) for pos, idx in zip(posicoes, rotulos)]
+                for q, tipo in zip(queries, tipos)
+            ]
+            return np.array(scores, dtype=np.int64).reshape(len(queries), len(posicoes))
+        
+        textos = [self._norm_lista[pos] for pos in posicoes]
+        processados = [self._norm_processado[pos] for pos in posicoes]
+        queries_processadas = [_processar_como_fuzzywuzzy(q) for q in queries]
+        
+        def _matriz(scorer, consultas, escolhas):
+            # fuzzywuzzy arredonda cada razão para inteiro antes da mistura
+            return np.rint(cdist(consultas, escolhas, scorer=scorer, workers=FUZZY_WORKERS)).astype(np.float64)
+        
+        base = (
+            _matriz(rfuzz.token_sort_ratio, queries_processadas, processados) * 0.4 +
+            _matriz(rfuzz.token_set_ratio, queries_processadas, processados) * 0.3 +
+            _matriz(rfuzz.partial_ratio, queries, textos) * 0.3
+        )
+        
+        tipos_q = np.array([tipo or '' for tipo in tipos], dtype=object)[:, None]
+        tipos_c = self._tipo_pos[posicoes][None, :]
+        com_tipo = (tipos_q != '') & (tipos_c != '')
+        base += np.where(com_tipo, np.where(tipos_q == tipos_c, 30, -50), 0)
+        
+        return np.clip(base, 0, 100).astype(np.int64)
+    
     def _calcular_score(self, q: str, p: str, idx: int, tipo_q: str) -> int:
         base = (
             fuzz.token_sort_ratio(q, p) * 0.4 +
@@ -418,9 +823,10 @@ class MatcherHibrido:
         df_produtos: pd.DataFrame,
         provider_ia: Optional[ProviderIA] = None,
         peso_prefiltro: float = 0.3,
-        peso_ia: float = 0.7
+        peso_ia: float = 0.7,
+        gerador: str = PREFILTRO_GERADOR
     ):
-        self.pre_filtro = PreFiltroTradicional(df_produtos)
+        self.pre_filtro = PreFiltroTradicional(df_produtos, gerador=gerador)
         self.provider_ia = provider_ia
         self.peso_pre = peso_prefiltro
         self.peso_ia = peso_ia
@@ -446,6 +852,23 @@ class MatcherHibrido:
                 'metricas': Dict
             }
         """
+        # ESTÁGIO 1: Pré-filtro tradicional
+        if debug:
+            print(f"\n[ESTÁGIO 1] Pré-filtro para: '{query}'")
+        
+        candidatos = self.pre_filtro.filtrar(query, limite=20)
+        return self._combinar(query, candidatos, limite, usar_ia, contexto, debug)
+    
+    def _combinar(
+        self,
+        query: str,
+        candidatos: List[Dict],
+        limite: int,
+        usar_ia: bool,
+        contexto: Optional[str],
+        debug: bool
+    ) -> Dict:
+        """Estágio 2 (IA) e ranking final sobre os candidatos do pré-filtro."""
         resultado = {
             'query': query,
             'resultados': [],
@@ -453,12 +876,6 @@ class MatcherHibrido:
             'sugestao_cadastro': False,
             'metricas': {}
         }
-        
-        # ESTÁGIO 1: Pré-filtro tradicional
-        if debug:
-            print(f"\n[ESTÁGIO 1] Pré-filtro para: '{query}'")
-        
-        candidatos = self.pre_filtro.filtrar(query, limite=20)
         resultado['metricas']['candidatos_prefiltro'] = len(candidatos)
         
         if not candidatos:
@@ -530,13 +947,23 @@ class MatcherHibrido:
         
         return resultado
     
+    def buscar_codigos(self, codigos: Iterable) -> Dict[str, List[Dict]]:
+        """Resolve vários códigos exatos de uma vez (veja PreFiltroTradicional.buscar_codigo)."""
+        return self.pre_filtro.buscar_codigos(codigos)
+    
     def buscar_batch(
         self,
         queries: List[str],
-        usar_ia: bool = True
+        usar_ia: bool = True,
+        limite: int = 10,
+        contexto: Optional[str] = None
     ) -> List[Dict]:
-        """Busca múltiplos produtos."""
-        return [self.buscar(q, usar_ia=usar_ia) for q in queries]
+        """Busca múltiplos produtos (pré-filtro de todas as consultas num lote só)."""
+        candidatos = self.pre_filtro.filtrar_batch(queries, limite=20)
+        return [
+            self._combinar(q, c, limite, usar_ia, contexto, debug=False)
+            for q, c in zip(queries, candidatos)
+        ]
 
 
 # ============================================================================
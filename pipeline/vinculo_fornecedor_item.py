@@ -1,17 +1,16 @@
 from tools import * 
-import time
 
 def vinculo_fornecedor_item():
     
-    time.sleep(5)
+    pause(5, 'vinculo_inicio')
     
     click_on_image('vinculo_forn_item/favoritos.png')
     
-    time.sleep(2)
+    pause(2, 'vinculo_favoritos')
     
     click_on_image('vinculo_forn_item/fornecedores_itens.png')
     
-    time.sleep(30)
+    pause(30, 'vinculo_fornecedores_itens')
     
     
     
@@ -0,0 +1,398 @@
+"""
+Benchmark offline da camada de matching de tela (sem ERP e sem display).
+
+Monta desktops sintéticos colando os templates reais de images/login,
+images/exportar_xml e images/vinculo_forn_item sobre fundos gravados
+(--fundos) ou gerados, com variação de ruído, escala e posição. Os frames
+são servidos pelo StaticBackend de tools.capture e o pyautogui é
+substituído por um módulo falso, então nenhum clique real acontece.
+
+Para cada template o relatório mostra:
+- latência por tentativa de busca (p50/p95, ms)
+- tentativas até encontrar (o template aparece com alguns frames de atraso)
+- taxa de falso negativo (não achou ou achou no lugar errado)
+- taxa de falso positivo (achou num desktop sem o template)
+- margem de confiança (score no lugar certo - maior score fora dele)
+- recall/precisão do modo multi-match (click_on_all_images)
+- recall do find_all contra a correlação exaustiva em resolução cheia, em
+  escala única e em várias escalas (--escalas): o estágio coarse não pode
+  perder um match que a busca completa acha
+
+Uso:
+    python scripts/benchmark_matching.py [--variacoes 3] [--fundos DIR] [--escalas 0.9,0.95,1,1.05,1.1]
+                                         [--json saida.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEMPLATE_DIRS = ('login', 'exportar_xml', 'vinculo_forn_item')
+
+
+def _install_fake_gui():
+    """Substitui pyautogui/pygetwindow por módulos falsos que só registram ações."""
+    clicks = []
+    fake = types.ModuleType('pyautogui')
+
+    class ImageNotFoundException(Exception):
+        pass
+
+    def _record(kind):
+        return lambda *args, **kwargs: clicks.append((kind, args))
+
+    fake.ImageNotFoundException = ImageNotFoundException
+    for name in ('click', 'doubleClick', 'rightClick', 'moveTo', 'press', 'write', 'keyDown', 'keyUp', 'hotkey'):
+        setattr(fake, name, _record(name))
+    fake.center = lambda box: (box[0] + int(box[2] / 2), box[1] + int(box[3] / 2))
+
+    def _no_screen(*args, **kwargs):
+        raise RuntimeError("Captura real desabilitada no benchmark")
+    fake.screenshot = _no_screen
+
+    windows = types.ModuleType('pygetwindow')
+    windows.getAllTitles = _no_screen
+
+    sys.modules['pyautogui'] = fake
+    sys.modules['pygetwindow'] = windows
+    return clicks
+
+
+CLICKS = _install_fake_gui()
+
+from config import IMAGES_DIR  # noqa: E402
+from tools import capture, matching  # noqa: E402
+from tools import tools as gui  # noqa: E402
+from tools.capture import StaticBackend  # noqa: E402
+from tools.hints import LocationHintStore  # noqa: E402
+from tools.templates import registry  # noqa: E402
+
+
+# ============================================================================
+# GERAÇÃO DE DESKTOPS SINTÉTICOS
+# ============================================================================
+
+def _listar_templates(filtro=None):
+    nomes = []
+    for pasta in TEMPLATE_DIRS:
+        base = os.path.join(IMAGES_DIR, pasta)
+        for arquivo in sorted(os.listdir(base)):
+            if arquivo.lower().endswith('.png'):
+                nome = f"{pasta}/{arquivo}"
+                if filtro is None or filtro in nome:
+                    nomes.append(nome)
+    return nomes
+
+
+def _carregar_fundos(pasta, largura, altura):
+    fundos = []
+    for arquivo in sorted(os.listdir(pasta)):
+        if arquivo.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp')):
+            img = cv2.imread(os.path.join(pasta, arquivo), cv2.IMREAD_COLOR)
+            if img is not None:
+                fundos.append(cv2.resize(img, (largura, altura), interpolation=cv2.INTER_AREA))
+    if not fundos:
+        raise FileNotFoundError(f"Nenhuma imagem de fundo em {pasta}")
+    return fundos
+
+
+def _gerar_fundo(rng, largura, altura):
+    """Fundo no estilo do ERP: painéis claros, barras, linhas de grade e texto."""
+    img = np.full((altura, largura, 3), 240, np.uint8)
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randrange(largura), rng.randrange(altura)
+        x1, y1 = min(largura, x0 + rng.randint(80, 700)), min(altura, y0 + rng.randint(20, 400))
+        tom = rng.randint(170, 255)
+        cor = (tom, tom - rng.randint(0, 20), tom - rng.randint(0, 40))
+        cv2.rectangle(img, (x0, y0), (x1, y1), cor, -1)
+        cv2.rectangle(img, (x0, y0), (x1, y1), (150, 150, 150), 1)
+    for y in range(rng.randint(100, 300), altura, 22):
+        cv2.line(img, (0, y), (largura, y), (215, 215, 215), 1)
+    letras = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 '
+    for _ in range(rng.randint(40, 90)):
+        texto = ''.join(rng.choice(letras) for _ in range(rng.randint(4, 24)))
+        pos = (rng.randrange(largura), rng.randrange(20, altura))
+        cv2.putText(img, texto, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.4, (40, 40, 40), 1, cv2.LINE_AA)
+    return img
+
+
+def _colar(img, template_bgr, x, y):
+    h, w = template_bgr.shape[:2]
+    img[y:y + h, x:x + w] = template_bgr
+
+
+def _variar(template_bgr, escala):
+    if abs(escala - 1.0) < 1e-6:
+        return template_bgr
+    interp = cv2.INTER_AREA if escala < 1.0 else cv2.INTER_CUBIC
+    return cv2.resize(template_bgr, None, fx=escala, fy=escala, interpolation=interp)
+
+
+def _ruido(rng_np, img, sigma):
+    if sigma <= 0:
+        return img
+    ruido = rng_np.normal(0, sigma, img.shape)
+    return np.clip(img.astype(np.float32) + ruido, 0, 255).astype(np.uint8)
+
+
+def _posicao_livre(rng, largura, altura, w, h):
+    return rng.randrange(0, largura - w), rng.randrange(0, altura - h)
+
+
+def _desktop(rng, rng_np, args, fundos, distratores):
+    fundo = rng.choice(fundos).copy() if fundos else _gerar_fundo(rng, args.largura, args.altura)
+    for bgr in rng.sample(distratores, min(args.distratores, len(distratores))):
+        x, y = _posicao_livre(rng, args.largura, args.altura, bgr.shape[1], bgr.shape[0])
+        _colar(fundo, bgr, x, y)
+    return fundo
+
+
+def _bgra(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+
+def _buscar(template, frames, confianca, max_tentativas):
+    """Replica o laço de click_on_image sem sleeps; retorna (box, tentativas, latências)."""
+    backend = capture.screen.backend
+    backend.load(frames)
+    latencias = []
+    for tentativa in range(1, max_tentativas + 1):
+        capture.screen.invalidate()
+        start = time.perf_counter()
+        box = gui._locate_on_screen(template, confianca)
+        latencias.append((time.perf_counter() - start) * 1000)
+        if box is not None:
+            return box, tentativa, latencias
+    return None, max_tentativas, latencias
+
+
+def _correto(box, esperado):
+    if box is None or esperado is None:
+        return False
+    cx, cy = box[0] + box[2] / 2, box[1] + box[3] / 2
+    ex, ey = esperado[0] + esperado[2] / 2, esperado[1] + esperado[3] / 2
+    return abs(cx - ex) <= esperado[2] / 2 and abs(cy - ey) <= esperado[3] / 2
+
+
+def _margem(frame_bgr, template_gray, esperado):
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    if template_gray.shape[0] > gray.shape[0] or template_gray.shape[1] > gray.shape[1]:
+        return None, None
+    resposta = matching.match_template(gray, template_gray)
+    x, y, w, h = esperado
+    y0, y1 = max(0, y - 2), min(resposta.shape[0], y + 3)
+    x0, x1 = max(0, x - 2), min(resposta.shape[1], x + 3)
+    score_certo = float(resposta[y0:y1, x0:x1].max())
+    resposta[max(0, y - h // 2):y + h // 2 + 1, max(0, x - w // 2):x + w // 2 + 1] = -1.0
+    return score_certo, score_certo - float(resposta.max())
+
+
+def _exaustivo(gray, template_gray, confianca, escalas):
+    """Referência sem pirâmide: correlação em resolução cheia para cada escala."""
+    achados = []
+    for escala in escalas:
+        tpl = matching._resize(template_gray, escala)
+        if tpl.shape[0] > gray.shape[0] or tpl.shape[1] > gray.shape[1]:
+            continue
+        resposta = cv2.matchTemplate(gray, tpl, cv2.TM_CCOEFF_NORMED)
+        xs, ys, scores = matching.local_maxima(resposta, confianca, min(tpl.shape[:2]) // 2,
+                                               max_candidates=matching.MAX_NMS_CANDIDATES)
+        h, w = tpl.shape[:2]
+        achados += [{'position': (x, y), 'width': w, 'height': h, 'score': score}
+                    for x, y, score in zip(xs.tolist(), ys.tolist(), scores.tolist())]
+    return [(m['position'][0], m['position'][1], m['width'], m['height'])
+            for m in matching.non_max_suppression(achados)]
+
+
+def _recall_exaustivo(gray, template_gray, confianca, escalas):
+    """(matches do exaustivo, quantos deles o find_all também achou)."""
+    referencia = _exaustivo(gray, template_gray, confianca, escalas)
+    caixas = [(m['position'][0], m['position'][1], m['width'], m['height'])
+              for m in matching.find_all(gray, template_gray, confidence=confianca, scales=escalas)]
+    return len(referencia), sum(1 for r in referencia if any(_correto(c, r) for c in caixas))
+
+
+def _percentil(valores, p):
+    return round(float(np.percentile(valores, p)), 2) if valores else None
+
+
+def executar(args):
+    rng = random.Random(args.seed)
+    rng_np = np.random.default_rng(args.seed)
+
+    capture.screen.set_backend(StaticBackend())
+    # Hints num arquivo temporário para não misturar com os da máquina real
+    gui.hints = LocationHintStore(path=os.path.join(tempfile.mkdtemp(), 'hints.json'))
+
+    nomes = _listar_templates(args.filtro)
+    templates = {n: registry.get(gui.get_image_path(n)) for n in nomes}
+    todos_bgr = [t.bgr for t in templates.values()]
+    fundos = _carregar_fundos(args.fundos, args.largura, args.altura) if args.fundos else None
+
+    relatorio = {}
+    for nome, template in templates.items():
+        distratores = [b for b in todos_bgr if b is not template.bgr]
+        stats = {'latencias': [], 'tentativas': [], 'fn': 0, 'fp': 0,
+                 'positivos': 0, 'negativos': 0, 'margens': [], 'scores': [],
+                 'multi_esperado': 0, 'multi_certos': 0, 'multi_achados': 0, 'multi_ms': [],
+                 'exaustivo': [0, 0], 'exaustivo_escalas': [0, 0]}
+
+        for _ in range(args.variacoes):
+            # Cenário positivo: template aparece depois de `atraso` frames
+            escala = 1.0 + rng.uniform(-args.variacao_escala, args.variacao_escala)
+            sigma = rng.uniform(0, args.ruido)
+            bgr = _variar(template.bgr, escala)
+            base = _desktop(rng, rng_np, args, fundos, distratores)
+            x, y = _posicao_livre(rng, args.largura, args.altura, bgr.shape[1], bgr.shape[0])
+            com = base.copy()
+            _colar(com, bgr, x, y)
+            com = _ruido(rng_np, com, sigma)
+            atraso = rng.randint(0, args.atraso_max)
+            frames = [_bgra(_ruido(rng_np, base, sigma))] * atraso + [_bgra(com)]
+            esperado = (x, y, bgr.shape[1], bgr.shape[0])
+
+            box, tentativas, latencias = _buscar(template, frames, args.confianca,
+                                                 atraso + args.tentativas_extra)
+            stats['positivos'] += 1
+            stats['latencias'].extend(latencias)
+            if _correto(box, esperado):
+                stats['tentativas'].append(tentativas)
+            else:
+                stats['fn'] += 1
+                if box is not None:
+                    stats['fp'] += 1
+
+            score, margem = _margem(com, template.gray, esperado)
+            if margem is not None:
+                stats['scores'].append(score)
+                stats['margens'].append(margem)
+
+            # Cenário negativo: mesmo tipo de desktop, sem o template
+            negativo = _bgra(_ruido(rng_np, _desktop(rng, rng_np, args, fundos, distratores), sigma))
+            box, _, latencias = _buscar(template, [negativo], args.confianca, 1)
+            stats['negativos'] += 1
+            stats['latencias'].extend(latencias)
+            if box is not None:
+                stats['fp'] += 1
+
+            # Cenário multi-match: várias cópias no mesmo desktop
+            multi = _desktop(rng, rng_np, args, fundos, distratores)
+            esperados = []
+            for _ in range(args.copias):
+                mx, my = _posicao_livre(rng, args.largura, args.altura, bgr.shape[1], bgr.shape[0])
+                caixa = (mx, my, bgr.shape[1], bgr.shape[0])
+                if any(_correto(caixa, e) for e in esperados):
+                    continue
+                _colar(multi, bgr, mx, my)
+                esperados.append(caixa)
+            gray = cv2.cvtColor(_ruido(rng_np, multi, sigma), cv2.COLOR_BGR2GRAY)
+            start = time.perf_counter()
+            achados = matching.non_max_suppression(
+                matching.find_all(gray, template.gray, confidence=args.confianca))
+            stats['multi_ms'].append((time.perf_counter() - start) * 1000)
+            caixas = [(m['position'][0], m['position'][1], m['width'], m['height']) for m in achados]
+            stats['multi_esperado'] += len(esperados)
+            stats['multi_achados'] += len(caixas)
+            stats['multi_certos'] += sum(1 for e in esperados if any(_correto(c, e) for c in caixas))
+
+            for chave, escalas in (('exaustivo', [1.0]), ('exaustivo_escalas', args.escalas)):
+                total, achados = _recall_exaustivo(gray, template.gray, args.confianca, escalas)
+                stats[chave][0] += total
+                stats[chave][1] += achados
+
+        relatorio[nome] = {
+            'latencia_p50_ms': _percentil(stats['latencias'], 50),
+            'latencia_p95_ms': _percentil(stats['latencias'], 95),
+            'tentativas_media': round(float(np.mean(stats['tentativas'])), 2) if stats['tentativas'] else None,
+            'taxa_fn': round(stats['fn'] / stats['positivos'], 3),
+            'taxa_fp': round(stats['fp'] / (stats['positivos'] + stats['negativos']), 3),
+            'score_medio': round(float(np.mean(stats['scores'])), 3) if stats['scores'] else None,
+            'margem_min': round(float(np.min(stats['margens'])), 3) if stats['margens'] else None,
+            'margem_media': round(float(np.mean(stats['margens'])), 3) if stats['margens'] else None,
+            'multi_recall': round(stats['multi_certos'] / stats['multi_esperado'], 3) if stats['multi_esperado'] else None,
+            'multi_precisao': round(stats['multi_certos'] / stats['multi_achados'], 3) if stats['multi_achados'] else None,
+            'multi_p50_ms': _percentil(stats['multi_ms'], 50),
+            'recall_exaustivo': round(stats['exaustivo'][1] / stats['exaustivo'][0], 3) if stats['exaustivo'][0] else None,
+            'recall_exaustivo_escalas': (round(stats['exaustivo_escalas'][1] / stats['exaustivo_escalas'][0], 3)
+                                         if stats['exaustivo_escalas'][0] else None),
+        }
+        print(f"  {nome:<40} p50={relatorio[nome]['latencia_p50_ms']}ms "
+              f"fn={relatorio[nome]['taxa_fn']} fp={relatorio[nome]['taxa_fp']} "
+              f"margem_min={relatorio[nome]['margem_min']} "
+              f"recall_exaustivo={relatorio[nome]['recall_exaustivo']}/{relatorio[nome]['recall_exaustivo_escalas']}")
+
+    return relatorio
+
+
+def imprimir(relatorio, args):
+    colunas = ['latencia_p50_ms', 'latencia_p95_ms', 'tentativas_media', 'taxa_fn', 'taxa_fp',
+               'score_medio', 'margem_min', 'margem_media', 'multi_recall', 'multi_precisao', 'multi_p50_ms',
+               'recall_exaustivo', 'recall_exaustivo_escalas']
+    print('\n' + '=' * 60)
+    print(f"RELATÓRIO ({len(relatorio)} templates, {args.variacoes} variações, "
+          f"{args.largura}x{args.altura}, confiança {args.confianca})")
+    print('=' * 60)
+    print(f"{'template':<40} " + ' '.join(f"{c[:14]:>14}" for c in colunas))
+    for nome, linha in relatorio.items():
+        valores = ' '.join(f"{'-' if linha[c] is None else linha[c]:>14}" for c in colunas)
+        print(f"{nome:<40} {valores}")
+
+    def media(chave):
+        valores = [l[chave] for l in relatorio.values() if l[chave] is not None]
+        return round(float(np.mean(valores)), 3) if valores else None
+
+    print('-' * 60)
+    print(f"Média: p50={media('latencia_p50_ms')}ms p95={media('latencia_p95_ms')}ms "
+          f"fn={media('taxa_fn')} fp={media('taxa_fp')} margem={media('margem_media')} "
+          f"multi_recall={media('multi_recall')} recall_exaustivo={media('recall_exaustivo')} "
+          f"recall_exaustivo_escalas={media('recall_exaustivo_escalas')}")
+    print(f"Captura: {capture.capture_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variacoes', type=int, default=3, help='cenários por template')
+    parser.add_argument('--fundos', help='pasta com screenshots gravados para usar de fundo')
+    parser.add_argument('--filtro', help='só templates cujo nome contém este texto')
+    parser.add_argument('--largura', type=int, default=1920)
+    parser.add_argument('--altura', type=int, default=1080)
+    parser.add_argument('--confianca', type=float, default=0.7)
+    parser.add_argument('--ruido', type=float, default=6.0, help='sigma máximo do ruído gaussiano')
+    parser.add_argument('--variacao-escala', type=float, default=0.03, help='variação máxima de escala (+/-)')
+    parser.add_argument('--atraso-max', type=int, default=2, help='frames sem o template antes dele aparecer')
+    parser.add_argument('--tentativas-extra', type=int, default=2)
+    parser.add_argument('--distratores', type=int, default=6, help='outros templates colados no fundo')
+    parser.add_argument('--copias', type=int, default=3, help='cópias no cenário multi-match')
+    parser.add_argument('--escalas', default='0.9,0.95,1,1.05,1.1',
+                        help='escalas do find_all comparado com a busca exaustiva')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='salva o relatório em JSON para comparar execuções')
+    args = parser.parse_args()
+    args.escalas = [float(e) for e in args.escalas.split(',')]
+
+    print(f"Executando benchmark de matching (seed {args.seed})...")
+    relatorio = executar(args)
+    imprimir(relatorio, args)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'templates': relatorio}, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório salvo em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
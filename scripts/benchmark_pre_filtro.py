@@ -0,0 +1,129 @@
+"""
+Benchmark da construção do pré-filtro de produtos (PreFiltroTradicional).
+
+Monta o pré-filtro sobre catálogos de tamanhos crescentes, amostrados
+(com reposição) do cache de produtos da API, e mostra tempo e pico de
+memória de cada construção. Tempo e memória por produto devem ficar
+estáveis entre os tamanhos (crescimento linear).
+
+Com --paridade N, compara o scorer em lote (rapidfuzz) com o legado
+(fuzzywuzzy) usando N descrições do catálogo como consulta: diferença dos
+scores, top-1 igual e tempo de cada um.
+
+Uso:
+    python scripts/benchmark_pre_filtro.py [--fatores 0.25,0.5,1,2,4] [--arquivo produtos.xlsx]
+                                           [--paridade 200] [--json saida.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import PRODUTOS_CACHE  # noqa: E402
+from pipeline.pre_filtro_inteligente import PreFiltroTradicional  # noqa: E402
+
+COLUNAS = {'codigo': 'PRO_ST_CODREAL', 'descricao': 'PRO_ST_DESCRICAO'}
+
+
+def carregar_catalogo(arquivo: str) -> pd.DataFrame:
+    df = pd.read_excel(arquivo)
+    for antiga, nova in COLUNAS.items():
+        if antiga in df.columns and nova not in df.columns:
+            df[nova] = df[antiga]
+    return df[list(COLUNAS.values())]
+
+
+def medir(df: pd.DataFrame, fatores) -> list:
+    linhas = []
+    for fator in fatores:
+        amostra = df.sample(n=max(1, int(len(df) * fator)), replace=True, random_state=0)
+        amostra = amostra.reset_index(drop=True)
+        # Memória medida só aqui: o tracemalloc deixa a construção bem mais lenta
+        tracemalloc.start()
+        try:
+            stats = PreFiltroTradicional(amostra).estatisticas_indices
+            pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+        linhas.append({
+            **stats,
+            'pico_mb': round(pico_mb, 1),
+            'us_por_produto': round(stats['tempo_s'] * 1e6 / stats['produtos'], 1),
+            'kb_por_produto': round(pico_mb * 1024 / stats['produtos'], 2),
+        })
+    return linhas
+
+
+def comparar_scorers(df: pd.DataFrame, n_consultas: int) -> dict:
+    """Mesmas consultas nos dois scorers: paridade dos scores e do melhor candidato."""
+    rapido = PreFiltroTradicional(df, scorer='rapidfuzz')
+    legado = PreFiltroTradicional(df, scorer='fuzzywuzzy')
+    consultas = (df['PRO_ST_DESCRICAO'].astype(str).str.upper().str.strip()
+                 .sample(n=min(n_consultas, len(df)), random_state=0).tolist())
+
+    tempos = {}
+    resultados = {}
+    for nome, filtro in (('rapidfuzz', rapido), ('fuzzywuzzy', legado)):
+        inicio = time.perf_counter()
+        resultados[nome] = [filtro.filtrar(q) for q in consultas]
+        tempos[nome] = time.perf_counter() - inicio
+
+    diferencas = []
+    top1_igual = 0
+    for a, b in zip(resultados['rapidfuzz'], resultados['fuzzywuzzy']):
+        top1_igual += (a[:1] and b[:1] and a[0]['codigo'] == b[0]['codigo']) or (not a and not b)
+        scores_b = {r['codigo']: r['score'] for r in b}
+        diferencas += [abs(r['score'] - scores_b[r['codigo']]) for r in a if r['codigo'] in scores_b]
+
+    diferencas = np.array(diferencas or [0])
+    return {
+        'consultas': len(consultas),
+        'top1_igual_pct': round(100 * top1_igual / len(consultas), 1),
+        'scores_iguais_pct': round(100 * float((diferencas == 0).mean()), 1),
+        'dif_media': round(float(diferencas.mean()), 2),
+        'dif_max': int(diferencas.max()),
+        'ms_por_consulta': {nome: round(1000 * t / len(consultas), 2) for nome, t in tempos.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--arquivo', default=PRODUTOS_CACHE, help='planilha de produtos (padrão: cache da API)')
+    parser.add_argument('--fatores', default='0.25,0.5,1,2,4', help='tamanhos relativos ao catálogo')
+    parser.add_argument('--paridade', type=int, default=0, help='consultas para comparar rapidfuzz x fuzzywuzzy')
+    parser.add_argument('--json', help='salva as medições em JSON')
+    args = parser.parse_args()
+
+    df = carregar_catalogo(args.arquivo)
+    print(f"Catálogo: {len(df)} produtos ({args.arquivo})\n")
+    linhas = medir(df, [float(f) for f in args.fatores.split(',')])
+
+    print(f"\n{'PRODUTOS':>10} {'TOKENS':>8} {'TEMPO s':>9} {'PICO MB':>9} {'us/PROD':>9} {'KB/PROD':>9}")
+    for l in linhas:
+        print(f"{l['produtos']:>10} {l['tokens']:>8} {l['tempo_s']:>9.2f} {l['pico_mb']:>9.1f} "
+              f"{l['us_por_produto']:>9.1f} {l['kb_por_produto']:>9.2f}")
+
+    paridade = None
+    if args.paridade:
+        paridade = comparar_scorers(df, args.paridade)
+        print(f"\nParidade rapidfuzz x fuzzywuzzy ({paridade['consultas']} consultas): "
+              f"top-1 igual {paridade['top1_igual_pct']}%, scores iguais {paridade['scores_iguais_pct']}%, "
+              f"diferença média {paridade['dif_media']} (máx {paridade['dif_max']})")
+        print("Tempo por consulta: " + ", ".join(f"{nome} {ms} ms" for nome, ms in paridade['ms_por_consulta'].items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'construcao': linhas, 'paridade': paridade}, f, ensure_ascii=False, indent=2)
+        print(f"\nMedições salvas em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
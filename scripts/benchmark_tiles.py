@@ -0,0 +1,76 @@
+"""
+Compara o template matching em chamada única com a versão em tiles paralelos.
+
+Monta um desktop sintético (padrão: 3 monitores 1920x1080 lado a lado),
+cola um template de images/ em posição conhecida e mede as duas versões.
+A chamada única usa as threads internas do OpenCV; os tiles usam
+MATCH_WORKERS threads com o OpenCV em uma thread (tools.matching), então a
+comparação mostra qual das duas formas de paralelizar rende mais na máquina.
+
+Uso:
+    python scripts/benchmark_tiles.py [template] [largura] [altura] [repeticoes]
+"""
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MATCH_TILE_SIZE, MATCH_WORKERS
+from tools.matching import match_template
+from tools.templates import registry
+from tools.tools import get_image_path
+
+
+def _desktop(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (9, 9), 3)
+
+
+def _timed(func, repeticoes):
+    func()  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        start = time.perf_counter()
+        result = func()
+        tempos.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(tempos))
+
+
+def main(template_name='exportar_xml/cod.png', width=5760, height=1080, repeticoes=10):
+    template = registry.get(get_image_path(template_name)).gray
+    screen = _desktop(width, height)
+    x, y = width - template.shape[1] - 37, height // 2
+    screen[y:y + template.shape[0], x:x + template.shape[1]] = template
+
+    single, t_single = _timed(
+        lambda: cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED), repeticoes)
+    tiled, t_tiled = _timed(
+        lambda: match_template(screen, template, min_pixels=0), repeticoes)
+
+    print(f"Template: {template_name} {template.shape[1]}x{template.shape[0]}")
+    print(f"Desktop:  {width}x{height}  workers={MATCH_WORKERS}  tile={MATCH_TILE_SIZE}  "
+          f"threads do OpenCV={cv2.getNumThreads()} (1 durante os tiles)")
+    print(f"Chamada única: {t_single:8.1f} ms (mediana de {repeticoes})")
+    print(f"Tiles:         {t_tiled:8.1f} ms (mediana de {repeticoes})")
+    print(f"Speedup:       {t_single / t_tiled:8.2f}x")
+
+    loc_single = cv2.minMaxLoc(single)[3]
+    loc_tiled = cv2.minMaxLoc(tiled)[3]
+    diff = float(np.abs(single - tiled).max())
+    print(f"Melhor posição: única={loc_single} tiles={loc_tiled} (esperado {(x, y)}), "
+          f"diferença máxima no mapa={diff:.2e}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(
+        args[0] if len(args) > 0 else 'exportar_xml/cod.png',
+        int(args[1]) if len(args) > 1 else 5760,
+        int(args[2]) if len(args) > 2 else 1080,
+        int(args[3]) if len(args) > 3 else 10,
+    )
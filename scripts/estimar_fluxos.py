@@ -0,0 +1,32 @@
+"""
+Dry-run dos fluxos declarados: estima a duração de cada passo pelo p50 gravado
+na linha do tempo (logs/timeline_*.jsonl), sem tocar na tela.
+
+Uso:
+    python scripts/estimar_fluxos.py [arquivos...]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pipeline.login import LOGIN_FLOW
+from pipeline.exportar_xml import NAVEGACAO_FLOW, EXPORTAR_XML_FLOW, ITENS_XLS_FLOW
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('arquivos', nargs='*', help='arquivos ou globs da linha do tempo (padrão: logs/)')
+    args = parser.parse_args()
+
+    total = 0.0
+    for fluxo in (LOGIN_FLOW, NAVEGACAO_FLOW, EXPORTAR_XML_FLOW, ITENS_XLS_FLOW):
+        total += fluxo.print_estimate(patterns=args.arquivos or None)
+        print()
+    print(f"Total estimado dos fluxos declarados: ~{total:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Relatório da linha do tempo das ações de GUI (logs/timeline_*.jsonl).
+
+- Por passo: execuções, p50/p95 da duração, tempo total e fatia do total,
+  tentativas médias, tempo médio de matching, fração ociosa e falhas,
+  ordenado pelo tempo total (o topo é o que vale otimizar primeiro).
+- Cascata: para cada execução (uma volta do loop de notas ou o login),
+  cada passo com seu início relativo, duração e barra proporcional.
+
+Uso:
+    python scripts/relatorio_timeline.py [arquivos...] [--top 30] [--cascatas 1]
+                                         [--nota CHAVE] [--acao click] [--json saida.json]
+"""
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict, defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Importa o módulo direto da pasta: o pacote tools exige display (pyautogui)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+from timeline_io import carregar_eventos  # noqa: E402
+
+DEFAULT_PATTERN = os.path.join(ROOT, 'logs', 'timeline_*.jsonl')
+LARGURA_BARRA = 50
+
+
+def resumo_por_passo(eventos: List[Dict]) -> List[Dict]:
+    """Estatísticas por passo, do que mais consome tempo no total para o que menos consome."""
+    grupos = defaultdict(list)
+    for evento in eventos:
+        grupos[evento['passo']].append(evento)
+
+    total_geral = sum(e['duracao_ms'] for e in eventos) or 1.0
+    resumo = []
+    for passo, grupo in grupos.items():
+        duracoes = np.array([e['duracao_ms'] for e in grupo])
+        total = float(duracoes.sum())
+        resumo.append({
+            'passo': passo,
+            'n': len(grupo),
+            'p50_ms': round(float(np.percentile(duracoes, 50)), 1),
+            'p95_ms': round(float(np.percentile(duracoes, 95)), 1),
+            'total_s': round(total / 1000, 2),
+            'pct_total': round(100 * total / total_geral, 1),
+            'tentativas': round(sum(e['tentativas'] for e in grupo) / len(grupo), 1),
+            'match_ms': round(sum(e['match_ms'] for e in grupo) / len(grupo), 1),
+            'ocioso_pct': round(100 * sum(e['ocioso_ms'] for e in grupo) / total, 1) if total else 0.0,
+            'falhas': sum(1 for e in grupo if not e['ok']),
+        })
+    resumo.sort(key=lambda r: r['total_s'], reverse=True)
+    return resumo
+
+
+def por_execucao(eventos: List[Dict]) -> 'OrderedDict[str, Dict]':
+    """
+    Agrupa os eventos por execução, na ordem em que começaram.
+
+    Returns:
+        OrderedDict: execucao -> {'nota', 'inicio', 'duracao_s', 'eventos'}; `nota`
+        é a chave identificada em qualquer evento da execução (None se não houve)
+    """
+    execucoes: 'OrderedDict[str, Dict]' = OrderedDict()
+    for evento in eventos:
+        execucao = evento.get('execucao') or '(sem execução)'
+        grupo = execucoes.setdefault(execucao, {'nota': None, 'inicio': evento['t'], 'eventos': []})
+        grupo['eventos'].append(evento)
+        grupo['nota'] = grupo['nota'] or evento.get('nota')
+
+    for grupo in execucoes.values():
+        fim = max(e['t'] + e['duracao_ms'] / 1000 for e in grupo['eventos'])
+        grupo['duracao_s'] = round(fim - grupo['inicio'], 2)
+    return execucoes
+
+
+def imprimir_resumo(resumo: List[Dict], top: int):
+    print("=" * 118)
+    print(f"{'PASSO':<56} {'N':>5} {'P50ms':>8} {'P95ms':>8} {'TOTALs':>8} {'%':>5} "
+          f"{'TENT':>5} {'MATCHms':>8} {'OCIO%':>6} {'FALHA':>5}")
+    print("=" * 118)
+    for r in resumo[:top]:
+        passo = r['passo'] if len(r['passo']) <= 56 else '…' + r['passo'][-55:]
+        print(f"{passo:<56} {r['n']:>5} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['total_s']:>8.1f} "
+              f"{r['pct_total']:>5.1f} {r['tentativas']:>5.1f} {r['match_ms']:>8.1f} "
+              f"{r['ocioso_pct']:>6.1f} {r['falhas']:>5}")
+    if len(resumo) > top:
+        print(f"... e mais {len(resumo) - top} passos")
+
+
+def imprimir_cascata(execucao: str, grupo: Dict):
+    duracao = max(grupo['duracao_s'], 1e-3)
+    print(f"\n📄 {execucao}  nota={grupo['nota'] or '-'}  {grupo['duracao_s']:.1f}s, "
+          f"{len(grupo['eventos'])} passos")
+    print("-" * 118)
+    for evento in grupo['eventos']:
+        inicio = evento['t'] - grupo['inicio']
+        col = int(LARGURA_BARRA * inicio / duracao)
+        tamanho = max(1, int(round(LARGURA_BARRA * evento['duracao_ms'] / 1000 / duracao)))
+        barra = (' ' * col + '█' * tamanho)[:LARGURA_BARRA].ljust(LARGURA_BARRA)
+        marca = '✓' if evento['ok'] else '✗'
+        print(f"+{inicio:7.2f}s |{barra}| {evento['duracao_ms'] / 1000:6.2f}s {marca} "
+              f"{evento['passo']} ({evento['tentativas']} tent.)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('arquivos', nargs='*', default=[DEFAULT_PATTERN], help='arquivos ou globs (timeline_*.jsonl)')
+    parser.add_argument('--top', type=int, default=30, help='passos mostrados no resumo')
+    parser.add_argument('--cascatas', type=int, default=1, help='últimas execuções mostradas em cascata')
+    parser.add_argument('--nota', help='só execuções desta chave de NF-e (ou id de execução)')
+    parser.add_argument('--acao', help='só eventos desta ação (click, wait_stable, keys, ...)')
+    parser.add_argument('--json', help='salva resumo e execuções em JSON')
+    args = parser.parse_args()
+
+    eventos = carregar_eventos(args.arquivos)
+    if args.acao:
+        eventos = [e for e in eventos if e['acao'] == args.acao]
+    if not eventos:
+        print(f"Nenhum evento encontrado em {args.arquivos}")
+        sys.exit(1)
+
+    execucoes = por_execucao(eventos)
+    if args.nota:
+        execucoes = OrderedDict((k, g) for k, g in execucoes.items()
+                                if args.nota in (g['nota'] or '') or args.nota in k)
+        eventos = [e for g in execucoes.values() for e in g['eventos']]
+        if not eventos:
+            print(f"Nenhuma execução da nota '{args.nota}'")
+            sys.exit(1)
+
+    resumo = resumo_por_passo(eventos)
+    notas = [g for g in execucoes.values() if g['nota']]
+    print(f"{len(eventos)} eventos, {len(execucoes)} execuções, {len(notas)} notas identificadas")
+    if notas:
+        duracoes = [g['duracao_s'] for g in notas]
+        print(f"Tempo por nota: p50 {np.percentile(duracoes, 50):.1f}s, p95 {np.percentile(duracoes, 95):.1f}s")
+    imprimir_resumo(resumo, args.top)
+
+    for execucao in list(execucoes)[-args.cascatas:] if args.cascatas > 0 else []:
+        imprimir_cascata(execucao, execucoes[execucao])
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'passos': resumo,
+                       'execucoes': {k: {'nota': g['nota'], 'duracao_s': g['duracao_s'], 'passos': len(g['eventos'])}
+                                     for k, g in execucoes.items()}},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\nRelatório salvo em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Supervisor do modo multi-worker (Linux).
+
+Sobe N displays virtuais (Xvfb), cada um com um processo `main.py`
+próprio: DISPLAY, perfil do Chrome e pasta de downloads exclusivos, e
+BOT_WORKER_ID / BOT_WORKER_INDEX para o journal. As notas são
+distribuídas pela reserva atômica do journal (pipeline.journal): cada
+worker começa por uma linha diferente da lista de notas em aberto e, se
+a nota aberta já estiver reservada por outro, passa para a seguinte.
+
+Workers que terminam são reiniciados (até --max-reinicios vezes).
+Ctrl+C encerra todos.
+
+Uso:
+    python supervisor.py --workers 4 [--resolucao 1920x1080] [--display-base 90]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+from config import LOGS_DIR, WORKERS_DIR
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class VirtualDisplay:
+    """Um servidor Xvfb em :numero."""
+
+    def __init__(self, numero: int, resolucao: str = '1920x1080'):
+        self.numero = numero
+        self.resolucao = resolucao
+        self.process = None
+
+    @property
+    def name(self) -> str:
+        return f":{self.numero}"
+
+    def start(self, timeout: float = 10):
+        if shutil.which('Xvfb') is None:
+            raise FileNotFoundError("Xvfb não encontrado. Instale: apt install xvfb")
+        self.process = subprocess.Popen(
+            ['Xvfb', self.name, '-screen', '0', f'{self.resolucao}x24', '-nolisten', 'tcp'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        socket_path = f'/tmp/.X11-unix/X{self.numero}'
+        start_time = time.time()
+        while not os.path.exists(socket_path):
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Xvfb {self.name} encerrou ao iniciar (display em uso?)")
+            if time.time() - start_time > timeout:
+                raise TimeoutError(f"Xvfb {self.name} não ficou pronto em {timeout}s")
+            time.sleep(0.1)
+        print(f"[INFO] Display {self.name} pronto ({self.resolucao})")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class Worker:
+    """Um processo main.py num display próprio, com perfil do Chrome e downloads isolados."""
+
+    def __init__(self, indice: int, display: VirtualDisplay):
+        self.indice = indice
+        self.id = f"w{indice}"
+        self.display = display
+        self.base_dir = os.path.join(WORKERS_DIR, self.id)
+        self.profile_dir = os.path.join(self.base_dir, 'chrome')
+        self.downloads_dir = os.path.join(self.base_dir, 'downloads')
+        self.process = None
+        self.reinicios = 0
+        self._log = None
+
+    def _prepare_profile(self):
+        os.makedirs(self.downloads_dir, exist_ok=True)
+        default_dir = os.path.join(self.profile_dir, 'Default')
+        os.makedirs(default_dir, exist_ok=True)
+        preferences_path = os.path.join(default_dir, 'Preferences')
+        preferences = {}
+        if os.path.exists(preferences_path):
+            try:
+                with open(preferences_path, encoding='utf-8') as f:
+                    preferences = json.load(f)
+            except Exception:
+                preferences = {}
+        # Downloads sem diálogo, direto na pasta do worker
+        preferences.setdefault('download', {}).update({
+            'default_directory': self.downloads_dir,
+            'prompt_for_download': False,
+            'directory_upgrade': True,
+        })
+        preferences.setdefault('savefile', {})['default_directory'] = self.downloads_dir
+        with open(preferences_path, 'w', encoding='utf-8') as f:
+            json.dump(preferences, f)
+
+    def env(self) -> dict:
+        env = dict(os.environ)
+        env.update({
+            'DISPLAY': self.display.name,
+            'BOT_WORKER_ID': self.id,
+            'BOT_WORKER_INDEX': str(self.indice),
+            'CHROME_USER_DATA_DIR': self.profile_dir,
+            'DOWNLOADS_PATH': self.downloads_dir,
+            'CAPTURE_BACKEND': env.get('CAPTURE_BACKEND', 'mss'),
+            # Os workers dividem os núcleos; sem isso cada um abriria um pool do tamanho da máquina
+            'MATCH_WORKERS': env.get('MATCH_WORKERS', '1'),
+        })
+        return env
+
+    def start(self):
+        self._prepare_profile()
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        self._log = open(os.path.join(LOGS_DIR, f'worker_{self.id}.log'), 'a', encoding='utf-8')
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'main.py')],
+            cwd=ROOT, env=self.env(), stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        print(f"[INFO] Worker {self.id} iniciado no display {self.display.name} (pid {self.process.pid})")
+
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout: float = 30):
+        if self.running():
+            # SIGINT para o main.py rodar o finally (libera as reservas no journal)
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def supervisionar(workers: int, resolucao: str, display_base: int, max_reinicios: int, intervalo: float = 5):
+    displays = [VirtualDisplay(display_base + i, resolucao) for i in range(workers)]
+    pool = [Worker(i, display) for i, display in enumerate(displays)]
+
+    parar = []
+    signal.signal(signal.SIGTERM, lambda *_: parar.append(True))
+
+    try:
+        for display in displays:
+            display.start()
+        for worker in pool:
+            worker.start()
+
+        while not parar:
+            time.sleep(intervalo)
+            ativos = 0
+            for worker in pool:
+                if worker.running():
+                    ativos += 1
+                    continue
+                codigo = worker.process.returncode
+                worker.stop()
+                if worker.reinicios >= max_reinicios:
+                    continue
+                worker.reinicios += 1
+                print(f"[WARN] Worker {worker.id} terminou (código {codigo}); "
+                      f"reiniciando ({worker.reinicios}/{max_reinicios})")
+                worker.start()
+                ativos += 1
+            if ativos == 0:
+                print("[INFO] Todos os workers terminaram.")
+                break
+    except KeyboardInterrupt:
+        print("[INFO] Encerrando workers...")
+    finally:
+        for worker in pool:
+            worker.stop()
+        for display in displays:
+            display.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='quantidade de displays/sessões (padrão: metade dos núcleos)')
+    parser.add_argument('--resolucao', default='1920x1080')
+    parser.add_argument('--display-base', type=int, default=90, help='primeiro número de display (:90, :91, ...)')
+    parser.add_argument('--max-reinicios', type=int, default=5, help='reinícios por worker')
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        parser.error("O modo multi-worker precisa de Linux com Xvfb")
+    supervisionar(args.workers, args.resolucao, args.display_base, args.max_reinicios)
+
+
+if __name__ == "__main__":
+    main()
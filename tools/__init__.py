@@ -1,6 +1,8 @@
 from .tools import (
     click_on_image,
+    click_on_image_index,
     houver_on_image,
+    wait_for_any,
     wait_and_click_image,
     init_chrome,
     close_chrome,
@@ -8,16 +10,51 @@ from .tools import (
     get_image_path,
     IMAGES_DIR,
     click_on_all_images,
+    press_key,
+    press_hotkey,
+    type_text,
+    pause,
 )
+from .timeline import timeline
+from .templates import preload_templates, template_cache_stats
+from .hints import location_hint_stats
+from .capture import capture_stats
+from .calibration import ensure_calibrated
+from .waits import wait_for_screen_stable, wait_for_screen_change, screen_reference, wait_for_image, wait_for_file
+from .downloads import DownloadWatcher, watch_downloads
+from .grid import GridNavigator
+from .steps import Step, Flow
 
 __all__ = [
     "click_on_image",
+    "click_on_image_index",
     "houver_on_image",
+    "wait_for_any",
+    "wait_for_screen_stable",
+    "wait_for_screen_change",
+    "screen_reference",
+    "wait_for_image",
+    "wait_for_file",
+    "DownloadWatcher",
+    "watch_downloads",
+    "GridNavigator",
+    "Step",
+    "Flow",
     "apagar_xml_downloads",
     "click_on_all_images",
     "wait_and_click_image",
+    "press_key",
+    "press_hotkey",
+    "type_text",
+    "pause",
+    "timeline",
     "init_chrome",
     "close_chrome",
     "get_image_path",
     "IMAGES_DIR",
+    "preload_templates",
+    "template_cache_stats",
+    "location_hint_stats",
+    "capture_stats",
+    "ensure_calibrated",
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Gravação atômica dos caches JSON em disco.
+
+Vários workers (processos) e threads podem salvar o mesmo cache ao mesmo
+tempo: cada gravação usa um arquivo temporário com nome único na mesma
+pasta e troca o arquivo final com os.replace, então quem lê vê sempre um
+JSON inteiro (o da última gravação).
+"""
+
+import json
+import os
+import tempfile
+
+
+def write_json_atomic(path: str, data) -> None:
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=folder, prefix=os.path.basename(path) + '.',
+                                     suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        json.dump(data, f, indent=2)
+    try:
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,208 @@
+"""
+Calibração única da escala da tela (DPI / zoom do navegador).
+
+Procura alguns templates âncora em várias escalas, guarda a escala
+encontrada por máquina + resolução em disco e pré-redimensiona todo o
+conjunto de templates de `images/`. A partir daí todo o matching do
+`tools` roda em escala única. Se a resolução da tela mudar, a calibração
+deixa de valer; sem escala, a primeira busca seguinte recalibra
+(`calibrate_if_needed`) pela calibração salva ou pelas âncoras no frame.
+"""
+
+import json
+import os
+import platform
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from config import CALIBRATION_ANCHORS, CALIBRATION_CACHE, IMAGES_DIR
+from . import matching
+from .cache_io import write_json_atomic
+from .capture import screen
+from .templates import registry, _decode
+
+CALIBRATION_SCALES = np.round(np.arange(0.5, 2.0001, 0.05), 2)
+CALIBRATION_CONFIDENCE = 0.8
+
+_lock = threading.Lock()
+_calibrated_resolution: Optional[str] = None
+_anchor_names: List[str] = list(CALIBRATION_ANCHORS)
+# Resolução em que a recalibração sob demanda já falhou (não repete a cada frame)
+_attempted_resolution: Optional[str] = None
+
+
+def _resolution_key(shape) -> str:
+    height, width = shape[:2]
+    return f"{width}x{height}"
+
+
+def _host_key(shape) -> str:
+    return f"{platform.node()}|{_resolution_key(shape)}"
+
+
+def _anchor_path(image_name: str) -> str:
+    if os.path.isabs(image_name):
+        return image_name
+    return os.path.join(IMAGES_DIR, image_name)
+
+
+def _load_cache() -> Dict:
+    if not os.path.exists(CALIBRATION_CACHE):
+        return {}
+    try:
+        with open(CALIBRATION_CACHE, encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] Falha ao ler calibração ({CALIBRATION_CACHE}): {e}")
+        return {}
+
+
+def _save_cache(data: Dict):
+    write_json_atomic(CALIBRATION_CACHE, data)
+
+
+def measure_scale(screen_gray: np.ndarray, anchor_paths: Sequence[str],
+                  confidence: float = CALIBRATION_CONFIDENCE) -> Optional[Dict]:
+    """
+    Mede a escala da tela a partir dos templates âncora visíveis no frame.
+
+    A escala é a da âncora de maior score, não a média: uma âncora que
+    cai na escala vizinha daria uma escala intermediária que nenhuma
+    das duas mediu.
+
+    Returns:
+        Dict com 'scale' (da âncora de maior score) e 'anchors'
+        ({âncora: (escala, score)}), ou None se nenhuma âncora foi achada.
+    """
+    found = {}
+    for path in anchor_paths:
+        template = cv2.cvtColor(_decode(path), cv2.COLOR_BGR2GRAY)
+        matches = matching.find_all(screen_gray, template, confidence=confidence,
+                                    scales=CALIBRATION_SCALES)
+        if matches:
+            best = max(matches, key=lambda m: m['score'])
+            found[os.path.basename(path)] = (round(best['scale'], 3), round(best['score'], 3))
+
+    if not found:
+        return None
+    scale, _ = max(found.values(), key=lambda anchor: anchor[1])
+    return {'scale': round(float(scale), 3), 'anchors': found}
+
+
+def _apply(scale: float, resolution: str):
+    global _calibrated_resolution
+    _calibrated_resolution = resolution
+    if registry.scale != scale:
+        registry.set_scale(scale)
+
+
+def _store(cache: Dict, key: str, result: Dict, resolution: str):
+    cache[key] = {
+        'scale': result['scale'],
+        'anchors': result['anchors'],
+        'calibrado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    _save_cache(cache)
+    _apply(result['scale'], resolution)
+    print(f"[INFO] Escala da tela calibrada para {key}: {result['scale']} "
+          f"(âncoras: {result['anchors']})")
+
+
+def ensure_calibrated(anchor_names: List[str], timeout: float = 60) -> float:
+    """
+    Garante que os templates estão na escala da tela atual.
+
+    Usa a calibração salva para esta máquina + resolução; se não houver,
+    espera até `timeout` segundos alguma âncora aparecer para medir.
+    Sem âncora visível mantém a escala 1.0 (sem calibração).
+
+    Returns:
+        float: Escala aplicada aos templates
+    """
+    global _anchor_names, _attempted_resolution
+    _anchor_names = list(anchor_names)
+    anchor_paths = [_anchor_path(name) for name in anchor_names]
+
+    with _lock:
+        frame = screen.grab(max_age_ms=0)
+        key = _host_key(frame.shape)
+        cache = _load_cache()
+
+        if key in cache:
+            scale = cache[key]['scale']
+            _apply(scale, _resolution_key(frame.shape))
+            print(f"[INFO] Calibração de escala carregada para {key}: {scale}")
+            return scale
+
+        start_time = time.time()
+        result = None
+        while True:
+            result = measure_scale(frame.gray, anchor_paths)
+            if result is not None or time.time() - start_time >= timeout:
+                break
+            time.sleep(1)
+            frame = screen.grab(max_age_ms=0)
+
+        if result is None:
+            print(f"[WARN] Nenhuma âncora de calibração encontrada após {timeout}s; usando escala 1.0")
+            registry.set_scale(None, preload=False)
+            _attempted_resolution = _resolution_key(frame.shape)
+            return 1.0
+
+        _store(cache, key, result, _resolution_key(frame.shape))
+        return result['scale']
+
+
+def calibrate_if_needed(frame):
+    """
+    Recalibra no primeiro uso quando não há escala em vigor.
+
+    Cobre a resolução que mudou no meio da execução e a retomada sem
+    LOGIN_FLOW: usa a calibração salva para a resolução do frame ou mede
+    as âncoras nele mesmo, sem esperar. Sem âncora visível fica na
+    escala 1.0 e só tenta de novo quando a resolução mudar.
+    """
+    global _attempted_resolution
+    resolution = _resolution_key(frame.shape)
+    if registry.scale is not None or resolution == _attempted_resolution:
+        return
+
+    with _lock:
+        if registry.scale is not None or resolution == _attempted_resolution:
+            return
+        key = _host_key(frame.shape)
+        cache = _load_cache()
+        if key in cache:
+            _apply(cache[key]['scale'], resolution)
+            print(f"[INFO] Calibração de escala carregada para {key}: {cache[key]['scale']}")
+            return
+
+        result = measure_scale(frame.gray, [_anchor_path(name) for name in _anchor_names])
+        if result is None:
+            _attempted_resolution = resolution
+            print(f"[WARN] Sem calibração salva nem âncora visível para {key}; usando escala 1.0")
+            return
+        _store(cache, key, result, resolution)
+
+
+def check_resolution(shape):
+    """Invalida a calibração em uso se a resolução da tela mudou."""
+    global _calibrated_resolution, _attempted_resolution
+    if _calibrated_resolution is None:
+        return
+    resolution = _resolution_key(shape)
+    if resolution != _calibrated_resolution:
+        print(f"[WARN] Resolução mudou de {_calibrated_resolution} para {resolution}; "
+              f"calibração de escala invalidada")
+        _calibrated_resolution = None
+        _attempted_resolution = None
+        registry.set_scale(None, preload=False)
+
+
+def is_calibrated() -> bool:
+    return registry.scale is not None
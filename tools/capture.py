@@ -0,0 +1,236 @@
+"""
+Camada de captura de tela com backends intercambiáveis.
+
+- 'mss': X11 MIT-SHM / GDI / CoreGraphics via mss; o frame BGRA é uma
+  view NumPy direta sobre o buffer capturado (sem cópia).
+- 'pil': PIL.ImageGrab (RGB, com uma cópia para NumPy).
+- 'pyautogui': pyautogui.screenshot(), o caminho antigo.
+- StaticBackend: frames sintéticos, para medir o matching sem tela (não
+  selecionável por CAPTURE_BACKEND; use screen.set_backend(instância)).
+
+Posições no frame são relativas ao canto do monitor capturado; `origin`
+(left, top) converte para coordenadas de tela, que é o que o pyautogui usa.
+
+Um cache curto (CAPTURE_MAX_AGE_MS) permite que várias buscas seguidas
+reutilizem o mesmo frame, inclusive as conversões para cinza/BGR. Cliques
+invalidam o cache para nunca procurar numa tela anterior à ação.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_BACKEND, CAPTURE_MAX_AGE_MS, CAPTURE_MONITOR
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+
+class Frame:
+    """Um frame capturado, com conversões para cinza/BGR feitas sob demanda."""
+
+    def __init__(self, image: np.ndarray, order: str, latency_ms: float, backend: str):
+        self.image = image
+        self.order = order  # 'BGRA' ou 'RGB'
+        self.latency_ms = latency_ms
+        self.backend = backend
+        self.timestamp = time.monotonic()
+        self._gray = None
+        self._bgr = None
+
+    @property
+    def shape(self):
+        return self.image.shape[:2]
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            code = cv2.COLOR_BGRA2GRAY if self.order == 'BGRA' else cv2.COLOR_RGB2GRAY
+            self._gray = cv2.cvtColor(self.image, code)
+        return self._gray
+
+    @property
+    def bgr(self) -> np.ndarray:
+        if self._bgr is None:
+            code = cv2.COLOR_BGRA2BGR if self.order == 'BGRA' else cv2.COLOR_RGB2BGR
+            self._bgr = cv2.cvtColor(self.image, code)
+        return self._bgr
+
+
+class CaptureBackend(ABC):
+    """Interface dos backends de captura."""
+    name = 'base'
+    order = 'BGRA'
+    origin = (0, 0)  # canto superior esquerdo do frame na tela
+
+    @abstractmethod
+    def grab(self) -> np.ndarray:
+        pass
+
+
+class MssBackend(CaptureBackend):
+    name = 'mss'
+    order = 'BGRA'
+
+    def __init__(self, monitor: int = CAPTURE_MONITOR):
+        if mss is None:
+            raise ImportError("Instale: pip install mss")
+        self.monitor = monitor
+        # Instâncias do mss não podem ser compartilhadas entre threads
+        self._local = threading.local()
+
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def grab(self) -> np.ndarray:
+        sct = self._sct()
+        monitor = sct.monitors[self.monitor]
+        self.origin = (monitor['left'], monitor['top'])
+        shot = sct.grab(monitor)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+
+class PilBackend(CaptureBackend):
+    name = 'pil'
+    order = 'RGB'
+
+    def grab(self) -> np.ndarray:
+        from PIL import ImageGrab
+        return np.asarray(ImageGrab.grab().convert('RGB'))
+
+
+class PyAutoGuiBackend(CaptureBackend):
+    name = 'pyautogui'
+    order = 'RGB'
+
+    def grab(self) -> np.ndarray:
+        import pyautogui
+        return np.asarray(pyautogui.screenshot())
+
+
+class StaticBackend(CaptureBackend):
+    """
+    Serve frames prontos em vez de capturar a tela (benchmarks e testes offline).
+
+    Os frames são devolvidos em ordem; o último se repete indefinidamente.
+    """
+    name = 'static'
+    order = 'BGRA'
+
+    def __init__(self, frames=None):
+        self._frames = []
+        self.served = 0
+        if frames is not None:
+            self.load(frames)
+
+    def load(self, frames):
+        self._frames = list(frames)
+        self.served = 0
+
+    def grab(self) -> np.ndarray:
+        if not self._frames:
+            raise RuntimeError("StaticBackend sem frames carregados")
+        index = min(self.served, len(self._frames) - 1)
+        self.served += 1
+        return self._frames[index]
+
+
+BACKENDS = {
+    'mss': MssBackend,
+    'pil': PilBackend,
+    'pyautogui': PyAutoGuiBackend,
+}
+
+
+def _create_backend(name: str) -> CaptureBackend:
+    if name == 'auto':
+        name = 'mss' if mss is not None else 'pyautogui'
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de captura inválido: '{name}'. Use: {tuple(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class ScreenCapture:
+    """Captura com cache de frame curto e estatísticas de latência."""
+
+    def __init__(self, backend: str = CAPTURE_BACKEND, max_age_ms: float = CAPTURE_MAX_AGE_MS):
+        self._backend_name = backend
+        self._backend: Optional[CaptureBackend] = None
+        self.max_age_ms = max_age_ms
+        self._frame: Optional[Frame] = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.grabs = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.last_latency_ms = 0.0
+
+    @property
+    def backend(self) -> CaptureBackend:
+        if self._backend is None:
+            self._backend = _create_backend(self._backend_name)
+        return self._backend
+
+    def set_backend(self, backend):
+        """Troca o backend (nome registrado em BACKENDS ou instância)."""
+        with self._lock:
+            self._backend = backend if isinstance(backend, CaptureBackend) else _create_backend(backend)
+            self._frame = None
+
+    def invalidate(self):
+        self._frame = None
+
+    @property
+    def origin(self):
+        """(left, top) do frame capturado na tela; soma-se às posições no frame."""
+        return self.backend.origin
+
+    def grab(self, max_age_ms: Optional[float] = None) -> Frame:
+        """Retorna o frame em cache se tiver menos de `max_age_ms`, senão captura."""
+        max_age_ms = self.max_age_ms if max_age_ms is None else max_age_ms
+        with self._lock:
+            self.calls += 1
+            frame = self._frame
+            if frame is not None and (time.monotonic() - frame.timestamp) * 1000 <= max_age_ms:
+                return frame
+
+            backend = self.backend
+            start = time.perf_counter()
+            image = backend.grab()
+            latency_ms = (time.perf_counter() - start) * 1000
+
+            self.grabs += 1
+            self.total_latency_ms += latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self.last_latency_ms = latency_ms
+
+            frame = Frame(image, backend.order, latency_ms, backend.name)
+            self._frame = frame
+            return frame
+
+    def stats(self) -> Dict:
+        return {
+            'backend': self.backend.name,
+            'calls': self.calls,
+            'grabs': self.grabs,
+            'cache_hits': self.calls - self.grabs,
+            'avg_latency_ms': round(self.total_latency_ms / self.grabs, 2) if self.grabs else 0.0,
+            'max_latency_ms': round(self.max_latency_ms, 2),
+        }
+
+
+screen = ScreenCapture()
+
+
+def capture_stats() -> Dict:
+    return screen.stats()
@@ -0,0 +1,153 @@
+"""
+Observador de arquivos que chegam na pasta de downloads.
+
+Substitui o glob + getctime + sleep depois de cada download: o observador
+é armado antes da ação que dispara o download (guarda o estado da pasta)
+e `wait()` devolve o caminho exato do arquivo novo assim que ele termina
+de ser gravado.
+
+- Linux com inotify_simple: evento IN_CLOSE_WRITE / IN_MOVED_TO (o
+  navegador grava em .crdownload/.part e renomeia no final).
+- Demais casos: polling com tamanho estável por `stable_for` segundos.
+"""
+
+import fnmatch
+import os
+import sys
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from config import DOWNLOADS_PATH
+from .timeline import timeline
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# Extensões de arquivos parciais dos navegadores, nunca devolvidos
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.partial', '.tmp', '.download')
+
+
+def _is_partial(name: str) -> bool:
+    return name.lower().endswith(PARTIAL_SUFFIXES) or name.startswith('.')
+
+
+class DownloadWatcher:
+    """Espera arquivos novos (ou regravados) numa pasta desde que foi armado."""
+
+    def __init__(self, folder: str = DOWNLOADS_PATH, use_inotify: Optional[bool] = None):
+        self.folder = folder
+        if use_inotify is None:
+            use_inotify = INotify is not None and sys.platform.startswith('linux')
+        self._inotify = None
+        if use_inotify:
+            if INotify is None:
+                raise ImportError("Instale: pip install inotify_simple")
+            self._inotify = INotify()
+            self._inotify.add_watch(folder, flags.CLOSE_WRITE | flags.MOVED_TO)
+
+        self._baseline = self._snapshot()
+        self._completed: Dict[str, float] = {}
+        self._sizes: Dict[str, Tuple[int, float]] = {}
+        self._delivered: Set[str] = set()
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._inotify is not None else 'polling'
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        state = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        st = entry.stat()
+                        state[entry.name] = (st.st_mtime, st.st_size)
+        except FileNotFoundError:
+            pass
+        return state
+
+    def _is_new(self, name: str, pattern: str) -> bool:
+        if name in self._delivered or _is_partial(name) or not fnmatch.fnmatch(name, pattern):
+            return False
+        try:
+            st = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            return False
+        return st.st_size > 0 and self._baseline.get(name) != (st.st_mtime, st.st_size)
+
+    def _ready_inotify(self, pattern: str) -> Optional[str]:
+        for name in sorted(self._completed, key=self._completed.get):
+            if self._is_new(name, pattern):
+                return name
+        return None
+
+    def _ready_polling(self, pattern: str, stable_for: float) -> Optional[str]:
+        now = time.monotonic()
+        for name, (_, size) in self._snapshot().items():
+            if not self._is_new(name, pattern):
+                continue
+            previous = self._sizes.get(name)
+            if previous is None or previous[0] != size:
+                self._sizes[name] = (size, now)
+            elif now - previous[1] >= stable_for:
+                return name
+        return None
+
+    def wait(self, pattern: str = '*', timeout: float = 30, stable_for: float = 0.5,
+             interval: float = 0.2) -> Optional[str]:
+        """
+        Espera um arquivo que case com `pattern` (nome exato ou glob) terminar de ser gravado.
+
+        Cada arquivo é devolvido uma única vez, então o mesmo observador
+        pode esperar vários downloads em sequência.
+
+        Returns:
+            str: Caminho completo do arquivo, ou None se atingiu o timeout
+        """
+        start_time = time.monotonic()
+        with timeline.medir('download') as medicao:
+            medicao.extra['padrao'] = pattern
+            while True:
+                medicao.tentativas += 1
+                if self._inotify is not None:
+                    name = self._ready_inotify(pattern)
+                else:
+                    name = self._ready_polling(pattern, stable_for)
+
+                if name is not None:
+                    medicao.ok = True
+                    self._delivered.add(name)
+                    path = os.path.join(self.folder, name)
+                    elapsed = round(time.monotonic() - start_time, 2)
+                    print(f"✓ Download '{name}' concluído ({os.path.getsize(path)} bytes, {self.mode}) [{elapsed}s]")
+                    return path
+
+                remaining = timeout - (time.monotonic() - start_time)
+                if remaining <= 0:
+                    print(f"✗ Nenhum arquivo '{pattern}' concluído em {self.folder} após {timeout}s")
+                    return None
+
+                if self._inotify is not None:
+                    for event in self._inotify.read(timeout=int(min(remaining, 1.0) * 1000)):
+                        if event.name:
+                            self._completed[event.name] = time.monotonic()
+                else:
+                    medicao.dormir(min(interval, remaining))
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def watch_downloads(folder: str = DOWNLOADS_PATH) -> DownloadWatcher:
+    """Arma um observador na pasta de downloads; chame antes da ação que baixa o arquivo."""
+    return DownloadWatcher(folder)
@@ -0,0 +1,127 @@
+"""
+Navegação por teclado em grades do ERP.
+
+Em vez de andar célula a célula com intervalo fixo, o cursor vai para a
+origem com Ctrl+Home e segue direto para as células que serão editadas.
+O intervalo entre teclas é medido contra a resposta real da grade
+(tempo até a tela mudar depois de uma tecla), e cada deslocamento é
+conferido por uma sonda: se a tela não reagiu, o intervalo dobra e o
+cursor é reposicionado a partir da origem.
+"""
+
+import statistics
+from typing import Optional
+
+from config import GRID_LATENCY_FACTOR, GRID_MAX_INTERVAL, GRID_MIN_INTERVAL
+from . import capture
+from .tools import press_hotkey, press_key
+from .waits import _grab_thumbnail, wait_for_screen_change, wait_for_screen_stable
+
+
+class GridNavigator:
+    """Cursor de uma grade com posição conhecida (linha, coluna) a partir de Ctrl+Home."""
+
+    def __init__(self, min_interval: float = GRID_MIN_INTERVAL, max_interval: float = GRID_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = max_interval
+        self.row = 0
+        self.col = 0
+        self.keys_pressed = 0
+        self.retries = 0
+
+    def _press(self, key: str, presses: int = 1):
+        if presses <= 0:
+            return
+        press_key(key, presses=presses, interval=self.interval)
+        self.keys_pressed += presses
+
+    def _settle(self):
+        wait_for_screen_stable(timeout=2, stable_for=0.2, min_wait=0.05, interval=0.05)
+
+    def home(self):
+        """Vai para a primeira célula da grade (Ctrl+Home)."""
+        press_hotkey('ctrl', 'home')
+        self._settle()
+        self.row = 0
+        self.col = 0
+
+    def measure_latency(self, key: str = 'down', back_key: str = 'up', timeout: float = 2) -> Optional[float]:
+        """Tempo (s) até a tela reagir a uma tecla; volta o cursor com `back_key`."""
+        reference = _grab_thumbnail()
+        press_key(key)
+        latency = wait_for_screen_change(reference, timeout=timeout)
+        reference = _grab_thumbnail()
+        press_key(back_key)
+        wait_for_screen_change(reference, timeout=timeout)
+        capture.screen.invalidate()
+        return latency
+
+    def calibrate(self, samples: int = 3) -> float:
+        """
+        Ajusta o intervalo entre teclas à latência medida da grade.
+
+        Chame com o cursor numa linha que tenha outra abaixo (ex.: logo
+        depois de home()). Sem resposta mensurável mantém o intervalo máximo.
+
+        Returns:
+            float: Intervalo (s) adotado
+        """
+        latencies = [lat for lat in (self.measure_latency() for _ in range(samples)) if lat is not None]
+        if latencies:
+            interval = statistics.median(latencies) * GRID_LATENCY_FACTOR
+            self.interval = min(self.max_interval, max(self.min_interval, interval))
+        else:
+            self.interval = self.max_interval
+        print(f"[INFO] Grade: intervalo entre teclas {self.interval * 1000:.0f}ms "
+              f"(latências medidas: {[round(lat * 1000) for lat in latencies]}ms)")
+        return self.interval
+
+    def _move(self, row: int, col: int):
+        dr, dc = row - self.row, col - self.col
+        self._press('down' if dr > 0 else 'up', abs(dr))
+        self._press('right' if dc > 0 else 'left', abs(dc))
+        self.row, self.col = row, col
+
+    def move_to(self, row: int, col: Optional[int] = None, verify: bool = True, max_retries: int = 2) -> bool:
+        """
+        Leva o cursor até (row, col) com o mínimo de teclas.
+
+        Com `verify`, confere que a tela reagiu ao deslocamento; se não
+        reagiu, dobra o intervalo e refaz o caminho a partir de Ctrl+Home.
+
+        Returns:
+            bool: True se o deslocamento foi confirmado (ou não havia o que mover)
+        """
+        col = self.col if col is None else col
+        for _ in range(max_retries + 1):
+            if (row, col) == (self.row, self.col):
+                return True
+            reference = _grab_thumbnail() if verify else None
+            self._move(row, col)
+            if not verify:
+                return True
+            if wait_for_screen_change(reference, timeout=max(0.5, 4 * self.interval)) is not None:
+                return True
+
+            self.retries += 1
+            self.interval = min(self.max_interval, self.interval * 2)
+            print(f"[WARN] Grade não respondeu ao mover para ({row}, {col}); "
+                  f"intervalo {self.interval * 1000:.0f}ms, reposicionando")
+            self.home()
+
+        return False
+
+    def down(self):
+        """Uma linha para baixo (também confirma a edição da célula atual)."""
+        self._press('down')
+        self.row += 1
+
+    def stats(self):
+        return {
+            'linha': self.row,
+            'coluna': self.col,
+            'intervalo_ms': round(self.interval * 1000),
+            'teclas': self.keys_pressed,
+            'reposicionamentos': self.retries,
+        }
@@ -0,0 +1,135 @@
+"""
+Memória da última posição em que cada template foi encontrado.
+
+Os botões do ERP aparecem quase sempre no mesmo lugar a cada nota, então a
+busca tenta primeiro uma região dilatada em volta da última caixa e só
+varre a tela inteira quando a região falha. As caixas são persistidas em
+disco (JSON) para valer entre execuções: uma caixa nova só marca o store
+como alterado, e a gravação sai num timer (HINTS_FLUSH_S) ou na saída do
+processo, fora do caminho do matching.
+"""
+
+import atexit
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from config import HINTS_CACHE, HINTS_FLUSH_S, HINT_MARGIN, IMAGES_DIR
+from .cache_io import write_json_atomic
+
+Box = Tuple[int, int, int, int]
+
+
+class LocationHintStore:
+    """Guarda a última caixa (x, y, w, h) de cada template e as taxas de acerto."""
+
+    def __init__(self, path: str = HINTS_CACHE, margin: int = HINT_MARGIN, flush_s: float = HINTS_FLUSH_S):
+        self.path = path
+        self.margin = margin
+        self.flush_s = flush_s
+        self._boxes: Dict[str, Box] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._load()
+
+    @staticmethod
+    def key(image_path: str) -> str:
+        # Chave relativa a images/ para o arquivo valer em qualquer máquina
+        try:
+            rel = os.path.relpath(image_path, IMAGES_DIR)
+        except ValueError:
+            rel = image_path
+        return rel.replace(os.sep, '/')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._boxes = {k: tuple(v) for k, v in data.items()}
+        except Exception as e:
+            print(f"[WARN] Falha ao ler hints de localização ({self.path}): {e}")
+            self._boxes = {}
+
+    def save(self):
+        with self._lock:
+            data = {k: list(v) for k, v in self._boxes.items()}
+            self._dirty = False
+        write_json_atomic(self.path, data)
+
+    def flush(self):
+        """Grava as caixas se alguma mudou desde a última gravação."""
+        with self._lock:
+            self._timer = None
+            dirty = self._dirty
+        if dirty:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"[WARN] Falha ao salvar hints de localização: {e}")
+
+    def region(self, image_path: str, screen_shape) -> Optional[Box]:
+        """Região dilatada (x, y, w, h) em volta da última caixa, recortada à tela."""
+        box = self._boxes.get(self.key(image_path))
+        if box is None:
+            return None
+        x, y, w, h = box
+        screen_h, screen_w = screen_shape[:2]
+        x0 = max(0, x - self.margin)
+        y0 = max(0, y - self.margin)
+        x1 = min(screen_w, x + w + self.margin)
+        y1 = min(screen_h, y + h + self.margin)
+        if x1 - x0 < w or y1 - y0 < h:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def update(self, image_path: str, box: Box):
+        key = self.key(image_path)
+        box = tuple(int(v) for v in box)
+        with self._lock:
+            if self._boxes.get(key) == box:
+                return
+            self._boxes[key] = box
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def record(self, image_path: str, hit: bool, elapsed: float):
+        """Contabiliza uma busca: `hit` indica se a região do hint bastou."""
+        with self._lock:
+            stats = self._stats.setdefault(self.key(image_path), {
+                'hits': 0, 'misses': 0, 'hint_time_s': 0.0, 'full_time_s': 0.0,
+            })
+            if hit:
+                stats['hits'] += 1
+                stats['hint_time_s'] += elapsed
+            else:
+                stats['misses'] += 1
+                stats['full_time_s'] += elapsed
+
+    def stats(self) -> Dict[str, Dict]:
+        report = {}
+        for key, s in sorted(self._stats.items()):
+            total = s['hits'] + s['misses']
+            report[key] = {
+                'hits': s['hits'],
+                'misses': s['misses'],
+                'hit_rate': round(s['hits'] / total, 4) if total else 0.0,
+                'avg_hint_ms': round(1000 * s['hint_time_s'] / s['hits'], 2) if s['hits'] else None,
+                'avg_full_ms': round(1000 * s['full_time_s'] / s['misses'], 2) if s['misses'] else None,
+            }
+        return report
+
+
+hints = LocationHintStore()
+atexit.register(hints.flush)
+
+
+def location_hint_stats() -> Dict[str, Dict]:
+    return hints.stats()
@@ -0,0 +1,339 @@
+"""
+Motor de template matching multi-escala em dois estágios (coarse-to-fine).
+
+1. COARSE: a tela (já em tons de cinza) é reduzida com uma pirâmide
+   (cv2.pyrDown) e cada escala do template é correlacionada nessa
+   resolução baixa, o que custa 1/4^n de uma correlação completa. O
+   template nunca fica com menos de MIN_COARSE_SIZE px no menor lado:
+   menor que isso o borrão da redução derruba o score de uma cópia exata.
+2. FINE: as escalas com maior pico e os melhores máximos locais de cada
+   uma são refinados em resolução cheia, numa janela pequena em volta de
+   cada candidato, com um único método de correlação. O corte no nível
+   coarse é relativo ao pico de cada escala (COARSE_MARGIN), nunca um
+   limiar absoluto: só o score em resolução cheia decide.
+
+Com uma única escala (o caso normal depois da calibração) não há escala
+para escolher e a pirâmide só perderia matches: a correlação é feita
+direto em resolução cheia.
+
+Cada match devolvido carrega o score real da correlação em resolução cheia.
+Os candidatos são os máximos locais do mapa de resposta (não todo pixel
+acima do limiar) e a supressão de sobreposição é vetorizada em NumPy.
+
+Em desktops grandes (multi-monitor) o mapa de resposta é calculado em
+tiles sobrepostos num pool de threads; cada célula do mapa é escrita por
+exatamente um tile, então o resultado é determinístico e igual ao de uma
+chamada única (a menos de arredondamento de ponto flutuante). Durante os
+tiles o OpenCV roda com uma thread só, para as duas camadas de threads
+não disputarem os mesmos núcleos.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from config import MATCH_TILE_SIZE, MATCH_TILED_MIN_PIXELS, MATCH_WORKERS
+
+# Menor lado que o template pode ter num nível da pirâmide
+MIN_COARSE_SIZE = 16
+# Candidatos coarse de uma escala ficam a no máximo isso abaixo do pico dela;
+# relativo ao pico porque o score de uma cópia exata no nível reduzido varia
+# com o deslocamento de pixel (medido: até ~0.1 abaixo do pico)
+COARSE_MARGIN = 0.2
+# Escalas e candidatos (máximos locais) por escala que seguem para o refinamento
+MAX_COARSE_SCALES = 3
+MAX_COARSE_CANDIDATES = 200
+# Teto de matches brutos considerados pela supressão de sobreposição
+MAX_NMS_CANDIDATES = 1000
+
+
+_tile_pool = None
+_tile_pool_workers = 0
+_tile_pool_lock = threading.Lock()
+
+
+def _get_tile_pool(workers: int) -> ThreadPoolExecutor:
+    global _tile_pool, _tile_pool_workers
+    with _tile_pool_lock:
+        if _tile_pool is None or _tile_pool_workers != workers:
+            if _tile_pool is not None:
+                _tile_pool.shutdown(wait=False)
+            _tile_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile')
+            _tile_pool_workers = workers
+        return _tile_pool
+
+
+# Chamadas em tiles em andamento e o número de threads do OpenCV a restaurar
+_tiled_calls = 0
+_opencv_threads = None
+
+
+@contextmanager
+def _opencv_single_threaded():
+    """
+    Desliga o paralelismo interno do OpenCV enquanto houver matching em tiles.
+
+    Os tiles já ocupam MATCH_WORKERS threads; com o OpenCV também abrindo
+    as suas em cada matchTemplate os núcleos ficam disputados e os tiles
+    saem mais lentos que uma chamada única. O ajuste do OpenCV é global
+    (backend pthreads), então vale para o processo até o último tile acabar.
+    """
+    global _tiled_calls, _opencv_threads
+    with _tile_pool_lock:
+        if _tiled_calls == 0:
+            _opencv_threads = cv2.getNumThreads()
+            cv2.setNumThreads(1)
+        _tiled_calls += 1
+    try:
+        yield
+    finally:
+        with _tile_pool_lock:
+            _tiled_calls -= 1
+            if _tiled_calls == 0:
+                cv2.setNumThreads(_opencv_threads)
+
+
+def _tiles(out_h: int, out_w: int, tile_size: int):
+    for y in range(0, out_h, tile_size):
+        for x in range(0, out_w, tile_size):
+            yield x, y, min(tile_size, out_w - x), min(tile_size, out_h - y)
+
+
+def match_template(
+    screen_gray: np.ndarray,
+    template_gray: np.ndarray,
+    method: int = cv2.TM_CCOEFF_NORMED,
+    tile_size: int = MATCH_TILE_SIZE,
+    workers: int = MATCH_WORKERS,
+    min_pixels: int = MATCH_TILED_MIN_PIXELS,
+) -> np.ndarray:
+    """
+    Equivalente a cv2.matchTemplate, dividido em tiles paralelos em telas grandes.
+
+    Cada tile cobre `tile_size` x `tile_size` células do mapa de resposta e
+    lê da tela essa área mais (template - 1) px de sobreposição, de modo que
+    toda janela de correlação cabe inteira em um único tile.
+    """
+    th, tw = template_gray.shape[:2]
+    sh, sw = screen_gray.shape[:2]
+    out_h, out_w = sh - th + 1, sw - tw + 1
+    # Tiles muito menores que o template gastariam mais em sobreposição que em trabalho útil
+    tile_size = max(tile_size, 4 * max(th, tw))
+
+    if workers <= 1 or sh * sw < min_pixels or (out_h <= tile_size and out_w <= tile_size):
+        return cv2.matchTemplate(screen_gray, template_gray, method)
+
+    result = np.empty((out_h, out_w), dtype=np.float32)
+
+    def run(tile):
+        x, y, w, h = tile
+        roi = screen_gray[y:y + h + th - 1, x:x + w + tw - 1]
+        result[y:y + h, x:x + w] = cv2.matchTemplate(roi, template_gray, method)
+
+    pool = _get_tile_pool(workers)
+    with _opencv_single_threaded():
+        for future in [pool.submit(run, tile) for tile in _tiles(out_h, out_w, tile_size)]:
+            future.result()
+    return result
+
+
+def _scores(result: np.ndarray, method: int) -> np.ndarray:
+    # Normaliza para "maior é melhor" em [0, 1]
+    if method == cv2.TM_SQDIFF_NORMED:
+        return 1.0 - result
+    return result
+
+
+def local_maxima(result: np.ndarray, threshold: float, window: int,
+                 max_candidates: int = MAX_COARSE_CANDIDATES):
+    """
+    Máximos locais do mapa de resposta acima de `threshold`.
+
+    Um pixel é pico se for igual ao máximo da sua vizinhança `window`x`window`
+    (cv2.dilate). Retorna (xs, ys, scores) com no máximo `max_candidates`
+    picos, os de maior score.
+    """
+    window = max(3, window | 1)
+    kernel = np.ones((window, window), np.uint8)
+    dilated = cv2.dilate(result, kernel)
+    ys, xs = np.nonzero((result >= threshold) & (result >= dilated))
+    scores = result[ys, xs]
+    if len(scores) > max_candidates:
+        top = np.argpartition(scores, -max_candidates)[-max_candidates:]
+        xs, ys, scores = xs[top], ys[top], scores[top]
+    return xs, ys, scores
+
+
+def non_max_suppression(matches: List[Dict], overlap_threshold: float = 0.3,
+                        max_candidates: int = MAX_NMS_CANDIDATES) -> List[Dict]:
+    """
+    Supressão gulosa de sobreposição, do maior para o menor score.
+
+    A sobreposição é a área de interseção dividida pela área da menor
+    caixa; matches com sobreposição acima de `overlap_threshold` com um
+    match já aceito são descartados. Só os `max_candidates` matches de
+    maior score entram na supressão.
+    """
+    if not matches:
+        return []
+
+    boxes = np.array([(m['position'][0], m['position'][1], m['width'], m['height'])
+                      for m in matches], dtype=np.float64)
+    scores = np.array([m.get('score', 1.0) for m in matches], dtype=np.float64)
+
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+
+    order = np.argsort(-scores, kind='stable')[:max_candidates]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        min_area = np.minimum(areas[i], areas[rest])
+        overlap = np.divide(inter_w * inter_h, min_area,
+                            out=np.zeros_like(min_area), where=min_area > 0)
+        order = rest[overlap <= overlap_threshold]
+
+    return [matches[i] for i in keep]
+
+
+def build_pyramid(screen_gray: np.ndarray, levels: int) -> List[np.ndarray]:
+    """Nível 0 é a própria tela; cada nível seguinte tem metade da resolução."""
+    pyramid = [screen_gray]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def _level_for(template_shape, max_levels: int) -> int:
+    level = 0
+    side = min(template_shape[:2])
+    while level < max_levels and side / 2 >= MIN_COARSE_SIZE:
+        side /= 2
+        level += 1
+    return level
+
+
+def _resize(template_gray: np.ndarray, factor: float) -> np.ndarray:
+    if factor == 1.0:
+        return template_gray
+    interpolation = cv2.INTER_AREA if factor < 1.0 else cv2.INTER_CUBIC
+    return cv2.resize(template_gray, None, fx=factor, fy=factor, interpolation=interpolation)
+
+
+def _match(x, y, w, h, scale, method, score) -> Dict:
+    return {
+        'position': (int(x), int(y)),
+        'width': w,
+        'height': h,
+        'scale': scale,
+        'method': method,
+        'score': float(score),
+    }
+
+
+def find_all(
+    screen_gray: np.ndarray,
+    template_gray: np.ndarray,
+    confidence: float = 0.7,
+    scales: Optional[Sequence[float]] = None,
+    method: int = cv2.TM_CCOEFF_NORMED,
+    max_levels: int = 2,
+) -> List[Dict]:
+    """
+    Encontra todas as ocorrências do template na tela.
+
+    Args:
+        screen_gray: Screenshot em tons de cinza (convertido uma única vez)
+        template_gray: Template em tons de cinza, na escala 1.0
+        confidence: Score mínimo (0-1) da correlação em resolução cheia
+        scales: Escalas do template a testar (padrão: apenas 1.0)
+        method: Método do cv2.matchTemplate usado nos dois estágios
+        max_levels: Níveis máximos da pirâmide no estágio coarse
+
+    Returns:
+        Lista de dicts com 'position', 'width', 'height', 'scale',
+        'method' e 'score', sem supressão de sobreposição.
+    """
+    scales = list(scales) if scales is not None else [1.0]
+    screen_h, screen_w = screen_gray.shape[:2]
+
+    scaled = []
+    for scale in scales:
+        tpl = _resize(template_gray, float(scale))
+        if tpl.shape[0] > screen_h or tpl.shape[1] > screen_w:
+            continue
+        scaled.append((float(scale), tpl, _level_for(tpl.shape, max_levels)))
+
+    if not scaled:
+        return []
+
+    if len(scaled) == 1:
+        scale, tpl, _ = scaled[0]
+        result = _scores(match_template(screen_gray, tpl, method), method)
+        xs, ys, scores = local_maxima(result, confidence, min(tpl.shape[:2]) // 2,
+                                      max_candidates=MAX_NMS_CANDIDATES)
+        h, w = tpl.shape[:2]
+        return [_match(x, y, w, h, scale, method, score)
+                for x, y, score in zip(xs.tolist(), ys.tolist(), scores.tolist())]
+
+    pyramid = build_pyramid(screen_gray, max(level for _, _, level in scaled))
+
+    # ESTÁGIO 1: correlação em resolução reduzida para todas as escalas
+    coarse = []
+    for index, (scale, tpl, level) in enumerate(scaled):
+        factor = 0.5 ** level
+        tpl_coarse = _resize(tpl, factor)
+        screen_coarse = pyramid[level]
+        if tpl_coarse.shape[0] > screen_coarse.shape[0] or tpl_coarse.shape[1] > screen_coarse.shape[1]:
+            continue
+        result = _scores(match_template(screen_coarse, tpl_coarse, method), method)
+        coarse.append((float(result.max()), index, result))
+
+    coarse.sort(key=lambda c: c[0], reverse=True)
+
+    # ESTÁGIO 2: refinamento em resolução cheia só em volta dos candidatos.
+    # A redução borra o template, então a melhor escala no nível coarse pode
+    # ser a vizinha da real: cada candidato é refinado também nas escalas
+    # adjacentes e fica com a de maior score.
+    matches = []
+    for peak, index, result in coarse[:MAX_COARSE_SCALES]:
+        _, tpl, level = scaled[index]
+        factor = 2 ** level
+        neighbours = scaled[max(0, index - 1):index + 2]
+        pad_h = max(t.shape[0] for _, t, _ in neighbours)
+        pad_w = max(t.shape[1] for _, t, _ in neighbours)
+
+        window = min(tpl.shape[:2]) // factor // 2
+        xs, ys, _ = local_maxima(result, peak - COARSE_MARGIN, window)
+
+        for cx, cy in zip(xs.tolist(), ys.tolist()):
+            x0 = max(0, cx * factor - factor)
+            y0 = max(0, cy * factor - factor)
+            x1 = min(screen_w, cx * factor + factor + pad_w)
+            y1 = min(screen_h, cy * factor + factor + pad_h)
+            roi = screen_gray[y0:y1, x0:x1]
+
+            best = None
+            for scale, candidate, _ in neighbours:
+                h, w = candidate.shape[:2]
+                if roi.shape[0] < h or roi.shape[1] < w:
+                    continue
+                fine = _scores(cv2.matchTemplate(roi, candidate, method), method)
+                _, score, _, loc = cv2.minMaxLoc(fine)
+                if best is None or score > best[0]:
+                    best = (score, x0 + loc[0], y0 + loc[1], w, h, scale)
+
+            if best is not None and best[0] >= confidence:
+                score, x, y, w, h, scale = best
+                matches.append(_match(x, y, w, h, scale, method, score))
+
+    return matches
@@ -0,0 +1,264 @@
+"""
+Motor de fluxos RPA declarados como dados.
+
+Um fluxo é uma lista de Step: alvo (template), ação, pré-condição
+(`when`), espera depois da ação (`settle` = tela estável, `expect` =
+template que precisa aparecer) e política de repetição (`retries`).
+O Flow executa os passos em ordem e:
+
+- antecipa o próximo passo: enquanto a tela assenta depois da ação, uma
+  thread procura o template do passo seguinte; quando ele aparece parado
+  em dois frames seguidos a espera termina e o clique sai na hora (a
+  posição já fica no hint de localização). Só vale para alvos que não
+  estavam na tela antes da ação, senão a presença deles não diz nada;
+- registra cada passo na linha do tempo ('step:<fluxo>/<passo>') e o
+  fluxo inteiro ('flow:<fluxo>');
+- em dry-run não toca na tela e estima a duração de cada passo pelo p50
+  dos tempos gravados na linha do tempo.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config import STEP_PREFETCH, STEP_PREFETCH_INTERVAL, TIMELINE_DIR
+from .templates import registry
+from .timeline import timeline
+from .timeline_io import carregar_eventos
+from .tools import (
+    _grab_screen_gray, _locate_in_frame, click_on_image, get_image_path, houver_on_image,
+    pause, press_key, type_text,
+)
+from .waits import wait_for_image, wait_for_screen_stable
+
+CLICK_TYPES = {'click': 'single', 'double': 'double', 'right': 'right'}
+IMAGE_ACTIONS = set(CLICK_TYPES) | {'hover', 'wait'}
+ACTIONS = IMAGE_ACTIONS | {'keys', 'type', 'pause', 'call'}
+
+# Estimativa (ms) de passos sem histórico na linha do tempo
+ESTIMATIVA_PADRAO_MS = 1500
+
+
+@dataclass
+class Step:
+    """
+    Um passo do fluxo.
+
+    Ações: 'click', 'double', 'right', 'hover' e 'wait' (procuram `target`);
+    'keys' (tecla `value`, `presses` vezes), 'type' (texto `value`), 'pause'
+    (`value` segundos) e 'call' (`value(ctx)`, resultado guardado em
+    ctx[name]). `value` de 'keys'/'type' pode ser callable(ctx).
+    """
+    name: str
+    action: str
+    target: Optional[str] = None
+    value: Any = None
+    presses: int = 1
+    interval: float = 0.0
+    confidence: float = 0.7
+    timeout: float = 20
+    optional: bool = False
+    when: Optional[Callable[[Dict], bool]] = None
+    settle: Optional[Dict] = field(default_factory=lambda: {'timeout': 2})
+    expect: Optional[str] = None
+    expect_timeout: float = 10
+    retries: int = 0
+    prefetch: bool = True
+
+    def __post_init__(self):
+        if self.action not in ACTIONS:
+            raise ValueError(f"Ação inválida no passo '{self.name}': '{self.action}'. Use: {tuple(sorted(ACTIONS))}")
+        if self.action in IMAGE_ACTIONS and not self.target:
+            raise ValueError(f"Passo '{self.name}' ({self.action}) precisa de um template em `target`")
+
+
+class _Prefetch:
+    """Procura o template do próximo passo em segundo plano até ele ficar parado em dois frames."""
+
+    def __init__(self, image_name: str, confidence: float, interval: float = STEP_PREFETCH_INTERVAL):
+        self.template = registry.get(get_image_path(image_name))
+        self.confidence = confidence
+        self.interval = interval
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        previous = None
+        while not self._stop.is_set():
+            box = _locate_in_frame(_grab_screen_gray(max_age_ms=0), self.template, self.confidence)
+            if box is not None and box == previous:
+                self.ready.set()
+                return
+            previous = box
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+
+def _resolve(value, ctx: Dict):
+    return value(ctx) if callable(value) else value
+
+
+def _visible(step: Step) -> bool:
+    template = registry.get(get_image_path(step.target))
+    return _locate_in_frame(_grab_screen_gray(), template, step.confidence) is not None
+
+
+class Flow:
+    """Sequência de passos executada pelo motor; veja o docstring do módulo."""
+
+    def __init__(self, name: str, steps: List[Step]):
+        self.name = name
+        self.steps = list(steps)
+        nomes = [step.name for step in self.steps]
+        repetidos = {nome for nome in nomes if nomes.count(nome) > 1}
+        if repetidos:
+            raise ValueError(f"Passos repetidos no fluxo '{name}': {sorted(repetidos)}")
+
+    def _step_id(self, step: Step) -> str:
+        return f"{self.name}/{step.name}"
+
+    def _execute(self, step: Step, ctx: Dict) -> bool:
+        action = step.action
+        if action in CLICK_TYPES:
+            return click_on_image(step.target, confidence=step.confidence, timeout=step.timeout,
+                                  click_type=CLICK_TYPES[action], continue_after_fail=step.optional)
+        if action == 'hover':
+            return houver_on_image(step.target, confidence=step.confidence, timeout=step.timeout)
+        if action == 'wait':
+            return wait_for_image(step.target, confidence=step.confidence, timeout=step.timeout) is not None
+        if action == 'keys':
+            press_key(_resolve(step.value, ctx), presses=step.presses, interval=step.interval)
+        elif action == 'type':
+            type_text(str(_resolve(step.value, ctx)), interval=step.interval)
+        elif action == 'pause':
+            pause(step.value, self._step_id(step))
+        elif action == 'call':
+            ctx[step.name] = step.value(ctx)
+        return True
+
+    def _run_step(self, step: Step, ctx: Dict) -> bool:
+        for attempt in range(step.retries + 1):
+            try:
+                ok = self._execute(step, ctx)
+                if ok and step.expect:
+                    ok = wait_for_image(step.expect, confidence=step.confidence,
+                                        timeout=step.expect_timeout) is not None
+                if ok or step.optional:
+                    return ok
+                raise Exception(f"✗ Passo '{self._step_id(step)}' não concluído "
+                                f"({step.expect or step.target} não encontrado)")
+            except Exception as e:
+                if attempt == step.retries:
+                    raise
+                print(f"[WARN] Passo '{self._step_id(step)}' falhou ({e}); "
+                      f"tentativa {attempt + 2}/{step.retries + 1}")
+                wait_for_screen_stable(timeout=2)
+        return False
+
+    def run(self, ctx: Optional[Dict] = None, dry_run: bool = False, prefetch: bool = STEP_PREFETCH) -> Dict:
+        """
+        Executa o fluxo.
+
+        Args:
+            ctx: Valores usados pelos passos (textos, pré-condições); os
+                passos 'call' gravam o resultado nele
+            dry_run: Só imprime a estimativa de duração, sem tocar na tela
+            prefetch: Antecipa o template do próximo passo durante as esperas
+
+        Returns:
+            Dict: O próprio `ctx`
+        """
+        ctx = {} if ctx is None else ctx
+        if dry_run:
+            self.print_estimate(ctx)
+            return ctx
+
+        inicio = time.time()
+        relogio = time.perf_counter()
+        ok = False
+        try:
+            for index, step in enumerate(self.steps):
+                if step.when is not None and not step.when(ctx):
+                    print(f"[INFO] Passo '{self._step_id(step)}' pulado (pré-condição)")
+                    continue
+
+                following = self.steps[index + 1] if index + 1 < len(self.steps) else None
+                prefetchable = (prefetch and step.settle is not None and following is not None
+                                and following.prefetch and following.action in IMAGE_ACTIONS
+                                and not _visible(following))
+
+                step_start = time.time()
+                step_clock = time.perf_counter()
+                step_ok = False
+                try:
+                    step_ok = self._run_step(step, ctx)
+                    if step.settle is not None:
+                        early = _Prefetch(following.target, following.confidence) if prefetchable else None
+                        try:
+                            wait_for_screen_stable(**step.settle, stop=early.ready if early else None)
+                        finally:
+                            if early is not None:
+                                early.stop()
+                finally:
+                    timeline.registrar('step', self._step_id(step), step_start, time.perf_counter() - step_clock,
+                                       step_ok, acao_passo=step.action)
+            ok = True
+            return ctx
+        finally:
+            timeline.registrar('flow', self.name, inicio, time.perf_counter() - relogio, ok,
+                               passos=len(self.steps))
+
+    def estimate(self, ctx: Optional[Dict] = None, patterns: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Estima a duração de cada passo pelo p50 dos registros 'step:<fluxo>/<passo>'.
+
+        Passos sem histórico usam o tempo fixo deles ('pause', teclas com
+        intervalo) ou ESTIMATIVA_PADRAO_MS. Pré-condições que dependem de
+        valores ausentes em `ctx` contam o passo como executado.
+
+        Returns:
+            list: [{'passo', 'estimativa_ms', 'fonte', 'amostras'}]
+        """
+        ctx = {} if ctx is None else ctx
+        patterns = patterns or [f"{TIMELINE_DIR}/timeline_*.jsonl"]
+        duracoes: Dict[str, List[float]] = {}
+        for evento in carregar_eventos(patterns):
+            if evento.get('acao') == 'step' and evento.get('ok'):
+                duracoes.setdefault(evento['alvo'], []).append(evento['duracao_ms'])
+
+        estimativas = []
+        for step in self.steps:
+            try:
+                if step.when is not None and not step.when(ctx):
+                    continue
+            except Exception:
+                pass
+            amostras = duracoes.get(self._step_id(step), [])
+            if amostras:
+                estimativa, fonte = float(np.median(amostras)), 'histórico'
+            elif step.action == 'pause':
+                estimativa, fonte = step.value * 1000, 'fixo'
+            elif step.action == 'keys' and step.interval:
+                estimativa, fonte = step.presses * step.interval * 1000, 'fixo'
+            else:
+                estimativa, fonte = ESTIMATIVA_PADRAO_MS, 'padrão'
+            estimativas.append({'passo': self._step_id(step), 'estimativa_ms': round(estimativa, 1),
+                                'fonte': fonte, 'amostras': len(amostras)})
+        return estimativas
+
+    def print_estimate(self, ctx: Optional[Dict] = None, patterns: Optional[Iterable[str]] = None) -> float:
+        """Imprime a estimativa passo a passo; retorna o total em segundos."""
+        estimativas = self.estimate(ctx, patterns)
+        total = sum(e['estimativa_ms'] for e in estimativas) / 1000
+        print(f"[DRY-RUN] Fluxo '{self.name}': {len(estimativas)} passos, ~{total:.1f}s")
+        for e in estimativas:
+            print(f"  {e['estimativa_ms'] / 1000:7.2f}s  {e['passo']:<50} ({e['fonte']}, {e['amostras']} amostras)")
+        return total
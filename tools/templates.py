@@ -0,0 +1,149 @@
+"""
+Registro de templates de imagem usados na automação visual.
+
+Cada PNG de `images/` é lido e decodificado uma única vez e mantido em
+memória (BGR e tons de cinza), indexado por caminho + mtime. Se o arquivo
+for substituído em disco, o mtime muda e o template é recarregado.
+
+Quando a escala da tela foi calibrada (tools.calibration), os templates
+já são guardados redimensionados para essa escala, e o matching roda
+sempre em escala única.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from config import IMAGES_DIR
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+@dataclass(frozen=True)
+class Template:
+    """Template decodificado, pronto para cv2.matchTemplate."""
+    path: str
+    mtime: float
+    bgr: np.ndarray
+    gray: np.ndarray
+    scale: float = 1.0
+
+    @property
+    def width(self) -> int:
+        return self.gray.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.gray.shape[0]
+
+
+def _decode(path: str) -> np.ndarray:
+    # np.fromfile + imdecode aceita caminhos com acentos no Windows (cv2.imread não)
+    data = np.fromfile(path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Não foi possível carregar a imagem: {path}")
+    return image
+
+
+class TemplateRegistry:
+    """Cache de templates com contadores de hit/miss e tempo de decodificação."""
+
+    def __init__(self, root: str = IMAGES_DIR):
+        self.root = root
+        self._cache: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        # Hits são contados também fora de _lock (caminho rápido, chamado do pool
+        # do wait_for_any e da thread de prefetch): lock próprio, só do contador
+        self._hits_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.decode_time = 0.0
+        self.scale: Optional[float] = None  # None = tela não calibrada
+
+    def set_scale(self, scale: Optional[float], preload: bool = True):
+        """Define a escala da tela e redimensiona todo o conjunto de templates."""
+        with self._lock:
+            self.scale = scale
+            self._cache.clear()
+        if preload:
+            self.preload()
+
+    def _hit(self):
+        with self._hits_lock:
+            self.hits += 1
+
+    def get(self, image_path: str) -> Template:
+        path = os.path.abspath(image_path)
+        mtime = os.path.getmtime(path)
+
+        scale = self.scale or 1.0
+
+        cached = self._cache.get(path)
+        if cached is not None and cached.mtime == mtime and cached.scale == scale:
+            self._hit()
+            return cached
+
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached.mtime == mtime and cached.scale == scale:
+                self._hit()
+                return cached
+
+            start = time.perf_counter()
+            bgr = _decode(path)
+            if scale != 1.0:
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                bgr = cv2.resize(bgr, None, fx=scale, fy=scale, interpolation=interpolation)
+            gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+            self.decode_time += time.perf_counter() - start
+            self.misses += 1
+
+            template = Template(path=path, mtime=mtime, bgr=bgr, gray=gray, scale=scale)
+            self._cache[path] = template
+            return template
+
+    def preload(self, root: Optional[str] = None) -> int:
+        """Decodifica todos os templates sob `root` (padrão: IMAGES_DIR)."""
+        root = root or self.root
+        loaded = 0
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    self.get(os.path.join(dirpath, filename))
+                    loaded += 1
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'templates': len(self._cache),
+            'scale': self.scale,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'decode_time_s': round(self.decode_time, 4),
+        }
+
+
+registry = TemplateRegistry()
+
+
+def preload_templates(root: Optional[str] = None) -> int:
+    loaded = registry.preload(root)
+    print(f"[INFO] {loaded} templates carregados em memória "
+          f"({registry.stats()['decode_time_s']}s de decodificação)")
+    return loaded
+
+
+def template_cache_stats() -> Dict:
+    return registry.stats()
@@ -0,0 +1,142 @@
+"""
+Linha do tempo estruturada das ações de GUI.
+
+Cada ação das tools (clique, hover, espera, digitação, rajada de teclas,
+pausa fixa) vira uma linha JSON em logs/timeline_<worker>_<AAAAMMDD>.jsonl
+com o passo, o template, as tentativas, o tempo gasto no matching e o
+tempo ocioso (sleeps entre tentativas). Os eventos carregam a execução
+corrente (uma volta do loop de notas) e a chave da NF-e assim que ela é
+conhecida, para montar a cascata de cada nota.
+
+scripts/relatorio_timeline.py agrega os arquivos em p50/p95 por passo e
+na cascata por nota.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import TIMELINE_DIR, TIMELINE_ENABLED, WORKER_ID
+
+
+class Medicao:
+    """Contadores de uma ação em andamento; preenchidos pela ação e gravados ao sair."""
+
+    def __init__(self, acao: str, alvo: Optional[str]):
+        self.acao = acao
+        self.alvo = alvo
+        self.ok = False
+        self.tentativas = 0
+        self.match_s = 0.0
+        self.ocioso_s = 0.0
+        self.extra: Dict = {}
+
+    @contextmanager
+    def match(self):
+        """Cronometra um trecho de captura + matching."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.match_s += time.perf_counter() - inicio
+
+    def dormir(self, segundos: float):
+        """time.sleep contabilizado como tempo ocioso."""
+        if segundos > 0:
+            time.sleep(segundos)
+            self.ocioso_s += segundos
+
+
+class Timeline:
+    """Grava os eventos em JSON Lines; seguro entre threads, desligável por TIMELINE=0."""
+
+    def __init__(self, folder: str = TIMELINE_DIR, worker: str = WORKER_ID, enabled: bool = TIMELINE_ENABLED):
+        self.folder = folder
+        self.worker = worker
+        self.enabled = enabled
+        self.execucao: Optional[str] = None
+        self.nota: Optional[str] = None
+        self.ultimo_passo: Optional[str] = None
+        self._contador = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.folder, f"timeline_{self.worker}_{datetime.now().strftime('%Y%m%d')}.jsonl")
+
+    def nova_execucao(self, rotulo: str = 'nota') -> str:
+        """Inicia uma execução (ex.: uma volta do loop de notas); a nota ainda é desconhecida."""
+        self.execucao = f"{self.worker}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{next(self._contador)}-{rotulo}"
+        self.nota = None
+        self.ultimo_passo = None
+        return self.execucao
+
+    def identificar(self, nota: Optional[str]):
+        if nota:
+            self.nota = nota
+
+    def registrar(self, acao: str, alvo: Optional[str] = None, inicio: Optional[float] = None,
+                  duracao_s: float = 0.0, ok: bool = True, tentativas: int = 1,
+                  match_s: float = 0.0, ocioso_s: float = 0.0, **extra):
+        if not self.enabled:
+            return
+        passo = f"{acao}:{alvo}" if alvo else acao
+        evento = {
+            't': round(inicio if inicio is not None else time.time(), 3),
+            'worker': self.worker,
+            'execucao': self.execucao,
+            'nota': self.nota,
+            'passo': passo,
+            'acao': acao,
+            'alvo': alvo,
+            'ok': ok,
+            'tentativas': tentativas,
+            'duracao_ms': round(duracao_s * 1000, 1),
+            'match_ms': round(match_s * 1000, 1),
+            'ocioso_ms': round(ocioso_s * 1000, 1),
+        }
+        evento.update(extra)
+        linha = json.dumps(evento, ensure_ascii=False, default=str)
+        with self._lock:
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(linha + '\n')
+            except OSError as e:
+                print(f"[WARN] Falha ao gravar linha do tempo: {e}")
+
+    @contextmanager
+    def medir(self, acao: str, alvo: Optional[str] = None, ancora: Optional[bool] = None):
+        """
+        Mede uma ação: `with timeline.medir('click', imagem) as m:` e preencha `m`.
+
+        Ações que não são âncora (por padrão, as sem alvo: esperas de tela,
+        digitação) são nomeadas pela última âncora ('wait_stable:após
+        click:x.png', 'keys:tab após click:x.png'), para que cada ponto do
+        fluxo apareça separado no relatório. A ação só conta como ok se o
+        bloco marcar `m.ok = True`; uma exceção grava o evento como falha e
+        segue propagando.
+        """
+        if ancora is None:
+            ancora = alvo is not None
+        if ancora:
+            self.ultimo_passo = f"{acao}:{alvo}"
+        elif self.ultimo_passo:
+            alvo = f"{alvo} após {self.ultimo_passo}" if alvo else f"após {self.ultimo_passo}"
+        medicao = Medicao(acao, alvo)
+        inicio = time.time()
+        relogio = time.perf_counter()
+        try:
+            yield medicao
+        finally:
+            self.registrar(acao, alvo, inicio, time.perf_counter() - relogio, medicao.ok,
+                           medicao.tentativas, medicao.match_s, medicao.ocioso_s, **medicao.extra)
+
+
+timeline = Timeline()
+
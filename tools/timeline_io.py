@@ -0,0 +1,26 @@
+"""
+Leitura dos arquivos da linha do tempo (logs/timeline_*.jsonl).
+
+Só usa a biblioteca padrão: scripts/relatorio_timeline.py importa este
+módulo direto, sem passar por `tools` (que exige display por causa do
+pyautogui), para o relatório rodar em qualquer máquina.
+"""
+
+import glob
+import json
+from typing import Dict, Iterable, List
+
+
+def carregar_eventos(padroes: Iterable[str]) -> List[Dict]:
+    """Lê os eventos dos arquivos (globs aceitos), ordenados pelo início."""
+    eventos = []
+    for padrao in padroes:
+        for caminho in sorted(glob.glob(padrao)):
+            with open(caminho, encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        eventos.append(json.loads(linha))
+                    except json.JSONDecodeError:
+                        continue  # linha cortada por uma queda no meio da gravação
+    eventos.sort(key=lambda e: e.get('t', 0))
+    return eventos
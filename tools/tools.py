@@ -3,12 +3,23 @@ import time
 import os
 import cv2
 import numpy as np
-from PIL import ImageGrab
 import subprocess
 import shutil
 import webbrowser
-import pygetwindow as gw
 import platform, ctypes
+try:
+    import pygetwindow as gw
+except Exception:
+    # pygetwindow não suporta Linux (workers em Xvfb)
+    gw = None
+from concurrent.futures import ThreadPoolExecutor
+
+from .templates import registry
+from .hints import hints
+from . import matching
+from . import capture, calibration
+from .timeline import timeline
+from config import MATCH_WORKERS, CHROME_USER_DATA_DIR
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 IMAGES_DIR = os.path.join(BASE_DIR, "images")
@@ -21,6 +32,74 @@ def get_image_path(image_name):
     return os.path.join(IMAGES_DIR, image_name)
 
 
+def _grab_screen_gray(max_age_ms=None):
+    frame = capture.screen.grab(max_age_ms)
+    calibration.check_resolution(frame.shape)
+    calibration.calibrate_if_needed(frame)
+    return frame.gray
+
+
+def _click(click_function, x, y):
+    # (x, y) vem do frame: o monitor capturado pode não começar em (0, 0) da tela
+    left, top = capture.screen.origin
+    click_function(x + left, y + top)
+    # A tela muda depois do clique: o próximo lookup precisa de um frame novo
+    capture.screen.invalidate()
+
+
+def _match_template(screen, template, confidence):
+    if template.height > screen.shape[0] or template.width > screen.shape[1]:
+        return None
+
+    result = matching.match_template(screen, template.gray, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    if max_val < confidence:
+        return None
+    return (max_loc[0], max_loc[1], template.width, template.height)
+
+
+def _locate_in_frame(screen, template, confidence):
+    """
+    Procura o template (já decodificado) no frame; retorna (x, y, w, h) ou None.
+
+    Tenta primeiro a região em volta da última posição conhecida e só
+    varre o frame inteiro se a região não tiver o template.
+    """
+    start = time.perf_counter()
+
+    region = hints.region(template.path, screen.shape)
+    if region is not None:
+        rx, ry, rw, rh = region
+        box = _match_template(screen[ry:ry + rh, rx:rx + rw], template, confidence)
+        if box is not None:
+            box = (box[0] + rx, box[1] + ry, box[2], box[3])
+            hints.record(template.path, True, time.perf_counter() - start)
+            hints.update(template.path, box)
+            return box
+
+    box = _match_template(screen, template, confidence)
+    if box is not None:
+        hints.record(template.path, False, time.perf_counter() - start)
+        hints.update(template.path, box)
+    return box
+
+
+def _locate_on_screen(template, confidence):
+    return _locate_in_frame(_grab_screen_gray(), template, confidence)
+
+
+_match_pool = None
+
+
+def _get_match_pool():
+    # cv2.matchTemplate libera o GIL, então threads bastam para paralelizar
+    global _match_pool
+    if _match_pool is None:
+        _match_pool = ThreadPoolExecutor(max_workers=MATCH_WORKERS,
+                                         thread_name_prefix='match')
+    return _match_pool
+
+
 def click_on_image(image_name, confidence=0.8, timeout=10, click_type='single', offset_x=0, offset_y=0, continue_after_fail=False):
 
     image_path = get_image_path(image_name)
@@ -38,36 +117,42 @@ def click_on_image(image_name, confidence=0.8, timeout=10, click_type='single',
         'right': pyautogui.rightClick
     }
     
+    template = registry.get(image_path)
+    
     start_time = time.time()
     attempts = 0
     
-    while time.time() - start_time < timeout:
-        attempts += 1
-        try:
-            location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-            
-            if location is not None:
-                center_x, center_y = pyautogui.center(location)
-                click_x = center_x + offset_x
-                click_y = center_y + offset_y
-                
-                click_functions[click_type](click_x, click_y)
+    with timeline.medir('click', image_name) as medicao:
+        while time.time() - start_time < timeout:
+            attempts += 1
+            medicao.tentativas = attempts
+            try:
+                with medicao.match():
+                    location = _locate_on_screen(template, confidence)
                 
-                elapsed = round(time.time() - start_time, 2)
-                print(f"✓ Imagem '{image_name}' encontrada e clicada em ({click_x}, {click_y}) "
-                    f"[{attempts} tentativas, {elapsed}s]")
-                return True
-                
-        except pyautogui.ImageNotFoundException:
-            pass
-        except Exception as e:
-            if continue_after_fail:
-                print(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e} (continuando)")
-                return False
-            else:
-                raise Exception(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e}")
-        
-        time.sleep(0.3)
+                if location is not None:
+                    center_x, center_y = pyautogui.center(location)
+                    click_x = center_x + offset_x
+                    click_y = center_y + offset_y
+                    
+                    _click(click_functions[click_type], click_x, click_y)
+                    medicao.ok = True
+                    
+                    elapsed = round(time.time() - start_time, 2)
+                    print(f"✓ Imagem '{image_name}' encontrada e clicada em ({click_x}, {click_y}) "
+                        f"[{attempts} tentativas, {elapsed}s, captura {capture.screen.last_latency_ms:.0f}ms]")
+                    return True
+                    
+            except pyautogui.ImageNotFoundException:
+                pass
+            except Exception as e:
+                if continue_after_fail:
+                    print(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e} (continuando)")
+                    return False
+                else:
+                    raise Exception(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e}")
+            
+            medicao.dormir(0.3)
     
     if continue_after_fail:
         print(f"✗ Imagem '{image_name}' não encontrada após {timeout}s ({attempts} tentativas) (continuando)")
@@ -75,6 +160,59 @@ def click_on_image(image_name, confidence=0.8, timeout=10, click_type='single',
     else:
         raise Exception(f"✗ Imagem '{image_name}' não encontrada após {timeout}s ({attempts} tentativas)")
 
+def click_on_image_index(image_name, index, confidence=0.8, timeout=10, click_type='single', continue_after_fail=False):
+    """
+    Clica na ocorrência `index` (0 = mais acima) de um template que aparece várias vezes.
+
+    As ocorrências são ordenadas de cima para baixo e da esquerda para a
+    direita, como as linhas de uma lista.
+    """
+    image_path = get_image_path(image_name)
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Arquivo de imagem não encontrado: {image_path}")
+
+    click_functions = {
+        'single': pyautogui.click,
+        'double': pyautogui.doubleClick,
+        'right': pyautogui.rightClick
+    }
+    if click_type not in click_functions:
+        raise ValueError(f"Tipo de clique inválido: '{click_type}'. Use: {tuple(click_functions)}")
+
+    template = registry.get(image_path)
+    start_time = time.time()
+    found = 0
+
+    with timeline.medir('click_index', image_name) as medicao:
+        medicao.extra['indice'] = index
+        while time.time() - start_time < timeout:
+            medicao.tentativas += 1
+            with medicao.match():
+                matches = matching.non_max_suppression(
+                    matching.find_all(_grab_screen_gray(), template.gray, confidence=confidence))
+            matches.sort(key=lambda m: (m['position'][1], m['position'][0]))
+            found = len(matches)
+
+            if index < found:
+                match = matches[index]
+                x, y = match['position']
+                center_x, center_y = x + match['width'] // 2, y + match['height'] // 2
+                _click(click_functions[click_type], center_x, center_y)
+                medicao.ok = True
+                elapsed = round(time.time() - start_time, 2)
+                print(f"✓ Ocorrência {index} de '{image_name}' clicada em ({center_x}, {center_y}) "
+                      f"[{found} na tela, {elapsed}s]")
+                return True
+
+            medicao.dormir(0.3)
+
+    message = f"✗ Ocorrência {index} de '{image_name}' não encontrada após {timeout}s ({found} na tela)"
+    if continue_after_fail:
+        print(f"{message} (continuando)")
+        return False
+    raise Exception(message)
+
+
 def houver_on_image(image_name, confidence=0.8, timeout=10):
 
     image_path = get_image_path(image_name)
@@ -82,59 +220,177 @@ def houver_on_image(image_name, confidence=0.8, timeout=10):
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Arquivo de imagem não encontrado: {image_path}")
     
+    template = registry.get(image_path)
+    
     start_time = time.time()
     attempts = 0
     
-    while time.time() - start_time < timeout:
-        attempts += 1
-        try:
-            location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-            
-            if location is not None:
-                center_x, center_y = pyautogui.center(location)
-                
-                pyautogui.moveTo(center_x, center_y)
+    with timeline.medir('hover', image_name) as medicao:
+        while time.time() - start_time < timeout:
+            attempts += 1
+            medicao.tentativas = attempts
+            try:
+                with medicao.match():
+                    location = _locate_on_screen(template, confidence)
                 
-                elapsed = round(time.time() - start_time, 2)
-                print(f"✓ Imagem '{image_name}' encontrada e hover em ({center_x}, {center_y}) "
-                    f"[{attempts} tentativas, {elapsed}s]")
-                return True
-                
-        except pyautogui.ImageNotFoundException:
-            pass
-        except Exception as e:
-            raise Exception(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e}")
-        
-        time.sleep(0.3)
+                if location is not None:
+                    center_x, center_y = pyautogui.center(location)
+                    
+                    _click(pyautogui.moveTo, center_x, center_y)
+                    medicao.ok = True
+                    
+                    elapsed = round(time.time() - start_time, 2)
+                    print(f"✓ Imagem '{image_name}' encontrada e hover em ({center_x}, {center_y}) "
+                        f"[{attempts} tentativas, {elapsed}s, captura {capture.screen.last_latency_ms:.0f}ms]")
+                    return True
+                    
+            except pyautogui.ImageNotFoundException:
+                pass
+            except Exception as e:
+                raise Exception(f"⚠ Erro ao procurar imagem '{image_name}': {type(e).__name__}: {e}")
+            
+            medicao.dormir(0.3)
     
     Exception(f"✗ Imagem '{image_name}' não encontrada após {timeout}s ({attempts} tentativas)")
     return False
 
+def wait_for_any(image_names, confidence=0.8, timeout=10, click_type=None, offset_x=0, offset_y=0):
+    """
+    Espera até que qualquer uma das imagens apareça na tela.
+
+    A cada tentativa captura um único frame e procura todos os templates
+    nele em paralelo. Se mais de uma imagem estiver visível no mesmo frame,
+    vence a que vem primeiro em `image_names`. Com `click_type`
+    ('single', 'double' ou 'right') clica no centro da imagem encontrada.
+
+    Returns:
+        tuple: (image_name, (x, y, w, h)) da imagem encontrada ou (None, None)
+    """
+    valid_click_types = (None, 'single', 'double', 'right')
+    if click_type not in valid_click_types:
+        raise ValueError(f"Tipo de clique inválido: '{click_type}'. Use: {valid_click_types}")
+
+    templates = []
+    for image_name in image_names:
+        image_path = get_image_path(image_name)
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Arquivo de imagem não encontrado: {image_path}")
+        templates.append((image_name, registry.get(image_path)))
+
+    click_functions = {
+        'single': pyautogui.click,
+        'double': pyautogui.doubleClick,
+        'right': pyautogui.rightClick
+    }
+
+    pool = _get_match_pool()
+    start_time = time.time()
+    attempts = 0
+
+    with timeline.medir('wait' if click_type is None else 'click', '|'.join(image_names)) as medicao:
+        while time.time() - start_time < timeout:
+            attempts += 1
+            medicao.tentativas = attempts
+            with medicao.match():
+                frame_gray = _grab_screen_gray()
+                futures = [pool.submit(_locate_in_frame, frame_gray, template, confidence)
+                           for _, template in templates]
+                results = [future.result() for future in futures]
+
+            for (image_name, _), location in zip(templates, results):
+                if location is None:
+                    continue
+
+                medicao.ok = True
+                medicao.extra['encontrada'] = image_name
+                elapsed = round(time.time() - start_time, 2)
+                center_x, center_y = pyautogui.center(location)
+                if click_type is not None:
+                    click_x = center_x + offset_x
+                    click_y = center_y + offset_y
+                    _click(click_functions[click_type], click_x, click_y)
+                    print(f"✓ Imagem '{image_name}' encontrada e clicada em ({click_x}, {click_y}) "
+                          f"[{attempts} tentativas, {elapsed}s, captura {capture.screen.last_latency_ms:.0f}ms]")
+                else:
+                    print(f"✓ Imagem '{image_name}' encontrada em ({center_x}, {center_y}) "
+                          f"[{attempts} tentativas, {elapsed}s, captura {capture.screen.last_latency_ms:.0f}ms]")
+                return image_name, location
+
+            medicao.dormir(0.3)
+
+    names = ', '.join(f"'{n}'" for n in image_names)
+    print(f"✗ Nenhuma das imagens {names} encontrada após {timeout}s ({attempts} tentativas)")
+    return None, None
+
 def wait_and_click_image(image_name, confidence=0.8, timeout=30):
 
     return click_on_image(image_name, confidence, timeout, 'single')
 
+
+def press_key(key, presses=1, interval=0.0):
+    """pyautogui.press registrado na linha do tempo (uma rajada = um evento)."""
+    with timeline.medir('keys', key, ancora=False) as medicao:
+        medicao.tentativas = 1
+        medicao.extra['teclas'] = presses
+        pyautogui.press(key, presses=presses, interval=interval)
+        capture.screen.invalidate()
+        medicao.ocioso_s = interval * presses
+        medicao.ok = True
+
+
+def press_hotkey(*keys):
+    """pyautogui.hotkey registrado na linha do tempo (ex.: press_hotkey('ctrl', 'home'))."""
+    with timeline.medir('keys', '+'.join(keys), ancora=False) as medicao:
+        medicao.tentativas = 1
+        medicao.extra['teclas'] = 1
+        pyautogui.hotkey(*keys)
+        capture.screen.invalidate()
+        medicao.ok = True
+
+
+def type_text(text, interval=0.0):
+    """pyautogui.write registrado na linha do tempo; só o tamanho do texto é gravado (senhas)."""
+    with timeline.medir('type') as medicao:
+        medicao.tentativas = 1
+        medicao.extra['caracteres'] = len(text)
+        pyautogui.write(text, interval=interval)
+        capture.screen.invalidate()
+        medicao.ocioso_s = interval * len(text)
+        medicao.ok = True
+
+
+def pause(seconds, reason=None):
+    """Pausa fixa registrada na linha do tempo, para achar os sleeps que ainda sobram."""
+    with timeline.medir('sleep', reason) as medicao:
+        medicao.tentativas = 1
+        medicao.dormir(seconds)
+        medicao.ok = True
+
+
 def close_chrome():
     """
     Fecha todas as instâncias do Google Chrome em execução.
     """
     try:
         if platform.system() == "Windows":
-            subprocess.run(
-                ["taskkill", "/F", "/IM", "chrome.exe"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
+            comando = ["taskkill", "/F", "/IM", "chrome.exe"]
+            nenhum = 128    # taskkill: processo não encontrado
+        else:
+            # Com perfil próprio (multi-worker) fecha só o Chrome deste worker; o
+            # "--" impede o pkill de ler o padrão "--user-data-dir=..." como opção
+            padrao = f"--user-data-dir={CHROME_USER_DATA_DIR}" if CHROME_USER_DATA_DIR else "chrome"
+            comando = ["pkill", "-f", "--", padrao]
+            nenhum = 1      # pkill: nenhum processo casou com o padrão
+        retorno = subprocess.run(comando, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        if retorno == 0:
+            print("[INFO] Chrome fechado com sucesso.")
+        elif retorno == nenhum:
+            print("[INFO] Nenhum Chrome aberto para fechar.")
         else:
-            subprocess.run(
-                ["pkill", "-f", "chrome"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        print("[INFO] Chrome fechado com sucesso.")
+            print(f"[WARN] Falha ao fechar Chrome: {comando[0]} retornou {retorno}")
     except Exception as e:
         print(f"[WARN] Falha ao fechar Chrome: {e}")
-    time.sleep(2)
+    pause(2, 'close_chrome')
 
 
 def init_chrome(url, anonimo=True):
@@ -158,6 +414,8 @@ def init_chrome(url, anonimo=True):
             args = [chrome_path, "--new-window", url]
             if anonimo:
                 args.insert(1, "--incognito")
+            if CHROME_USER_DATA_DIR:
+                args.insert(1, f"--user-data-dir={CHROME_USER_DATA_DIR}")
             creation_flags = 0
             if platform.system() == "Windows":
                 creation_flags = (
@@ -178,7 +436,7 @@ def init_chrome(url, anonimo=True):
             pass
 
     # aguardar o processo/GUI aparecer
-    time.sleep(2)
+    pause(2, 'init_chrome')
 
     # tentar trazer a janela do Chrome ao topo
     gw_available = True
@@ -291,7 +549,7 @@ def click_on_all_images(image_name, target_color=None, color_tolerance=30,
                         offset_x=0, offset_y=0, color_region='center',
                         delay_between_clicks=0.5, max_clicks=None,
                         multi_scale=True, min_scale=0.5, max_scale=1.5,
-                        debug=False):
+                        method=cv2.TM_CCOEFF_NORMED, debug=False):
     
     image_path = get_image_path(image_name)
     
@@ -312,57 +570,25 @@ def click_on_all_images(image_name, target_color=None, color_tolerance=30,
         'right': pyautogui.rightClick
     }
     
-    template = cv2.imread(image_path)
-    if template is None:
-        raise ValueError(f"Não foi possível carregar a imagem: {image_path}")
+    template = registry.get(image_path)
     
-    screenshot = ImageGrab.grab()
-    screenshot_np = np.array(screenshot)
-    screenshot_bgr = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
+    frame = capture.screen.grab(max_age_ms=0)
+    calibration.check_resolution(frame.shape)
+    calibration.calibrate_if_needed(frame)
+    screenshot_bgr = frame.bgr
+    screenshot_gray = frame.gray
     
-    all_matches = []
-    
-    if multi_scale:
+    # Com a escala calibrada os templates já estão no tamanho da tela
+    if multi_scale and not calibration.is_calibrated():
         scales = np.linspace(min_scale, max_scale, 15)
     else:
         scales = [1.0]
     
     print(f"🔍 Procurando '{image_name}' com {len(scales)} escalas...")
     
-    for scale in scales:
-        resized_template = cv2.resize(template, None, fx=scale, fy=scale, 
-                                     interpolation=cv2.INTER_CUBIC)
-        
-        if resized_template.shape[0] > screenshot_bgr.shape[0] or \
-           resized_template.shape[1] > screenshot_bgr.shape[1]:
-            continue
-        
-        template_gray = cv2.cvtColor(resized_template, cv2.COLOR_BGR2GRAY)
-        screenshot_gray = cv2.cvtColor(screenshot_bgr, cv2.COLOR_BGR2GRAY)
-        w, h = template_gray.shape[::-1]
-        
-        methods = [
-            cv2.TM_CCOEFF_NORMED,
-            cv2.TM_CCORR_NORMED,
-            cv2.TM_SQDIFF_NORMED
-        ]
-        
-        for method in methods:
-            result = cv2.matchTemplate(screenshot_gray, template_gray, method)
-            
-            if method == cv2.TM_SQDIFF_NORMED:
-                locations = np.where(result <= (1 - confidence))
-            else:
-                locations = np.where(result >= confidence)
-            
-            for pt in zip(*locations[::-1]):
-                all_matches.append({
-                    'position': pt,
-                    'width': w,
-                    'height': h,
-                    'scale': scale,
-                    'method': method
-                })
+    all_matches = matching.find_all(screenshot_gray, template.gray,
+                                    confidence=confidence, scales=scales,
+                                    method=method)
     
     if not all_matches:
         print(f"✗ Nenhuma ocorrência da imagem '{image_name}' encontrada")
@@ -434,11 +660,12 @@ def click_on_all_images(image_name, target_color=None, color_tolerance=30,
         click_x = center_x + offset_x
         click_y = center_y + offset_y
         
-        click_functions[click_type](click_x, click_y)
+        _click(click_functions[click_type], click_x, click_y)
         clicked_count += 1
         
-        scale_info = f" [escala: {match['scale']:.2f}]" if multi_scale else ""
-        print(f"  [{clicked_count}] ✓ Clicado em ({click_x}, {click_y}){scale_info}")
+        scale_info = f" [escala: {match['scale']:.2f}]" if len(scales) > 1 else ""
+        print(f"  [{clicked_count}] ✓ Clicado em ({click_x}, {click_y}){scale_info} "
+              f"[score: {match['score']:.3f}]")
         
         if i < len(filtered_matches) - 1:
             time.sleep(delay_between_clicks)
@@ -457,46 +684,4 @@ def click_on_all_images(image_name, target_color=None, color_tolerance=30,
 
 
 def _remove_overlapping_matches_advanced(matches, overlap_threshold=0.3):
-    if not matches:
-        return []
-    
-    matches_with_score = []
-    for match in matches:
-        score = match.get('score', 1.0)
-        matches_with_score.append((match, score))
-    
-    matches_with_score.sort(key=lambda x: x[1], reverse=True)
-    
-    filtered = []
-    for match, score in matches_with_score:
-        is_overlapping = False
-        for existing in filtered:
-            overlap = _calculate_overlap_advanced(match, existing)
-            if overlap > overlap_threshold:
-                is_overlapping = True
-                break
-        
-        if not is_overlapping:
-            filtered.append(match)
-    
-    return filtered
-
-
-def _calculate_overlap_advanced(match1, match2):
-    x1_min, y1_min = match1['position']
-    w1, h1 = match1['width'], match1['height']
-    x1_max, y1_max = x1_min + w1, y1_min + h1
-    
-    x2_min, y2_min = match2['position']
-    w2, h2 = match2['width'], match2['height']
-    x2_max, y2_max = x2_min + w2, y2_min + h2
-    
-    x_overlap = max(0, min(x1_max, x2_max) - max(x1_min, x2_min))
-    y_overlap = max(0, min(y1_max, y2_max) - max(y1_min, y2_min))
-    
-    overlap_area = x_overlap * y_overlap
-    area1 = w1 * h1
-    area2 = w2 * h2
-    min_area = min(area1, area2)
-    
-    return overlap_area / min_area if min_area > 0 else 0
\ No newline at end of file
+    return matching.non_max_suppression(matches, overlap_threshold)
@@ -0,0 +1,153 @@
+"""
+Esperas orientadas a eventos para substituir time.sleep fixos nos fluxos.
+
+Cada espera retorna assim que a condição vale (tela estável, template
+visível, arquivo gravado) e usa o valor antigo do sleep apenas como
+limite máximo.
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from .timeline import timeline
+from .tools import _grab_screen_gray, wait_for_any
+
+# Fator de redução do frame usado na comparação de estabilidade
+STABLE_DOWNSCALE = 8
+# Diferença mínima de intensidade para um pixel (reduzido) contar como alterado
+STABLE_PIXEL_DELTA = 12
+# Fração máxima de pixels alterados para considerar a tela parada
+STABLE_CHANGED_RATIO = 0.002
+
+
+def _grab_thumbnail():
+    gray = _grab_screen_gray(max_age_ms=0)
+    factor = 1.0 / STABLE_DOWNSCALE
+    return cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+
+def _changed_ratio(previous, current):
+    if current.shape != previous.shape:
+        return 1.0
+    diff = cv2.absdiff(current, previous)
+    return np.count_nonzero(diff > STABLE_PIXEL_DELTA) / diff.size
+
+
+def screen_reference():
+    """Miniatura da tela atual; tire antes de uma ação e passe para wait_for_screen_change."""
+    return _grab_thumbnail()
+
+
+def wait_for_screen_change(reference=None, timeout=2, interval=0.02):
+    """
+    Espera a tela ficar diferente de `reference` (miniatura de screen_reference).
+
+    Returns:
+        float: Segundos até a mudança, ou None se atingiu o timeout
+    """
+    start_time = time.time()
+    with timeline.medir('wait_change') as medicao:
+        if reference is None:
+            with medicao.match():
+                reference = _grab_thumbnail()
+
+        while True:
+            medicao.tentativas += 1
+            with medicao.match():
+                changed = _changed_ratio(reference, _grab_thumbnail())
+            if changed > STABLE_CHANGED_RATIO:
+                medicao.ok = True
+                return time.time() - start_time
+            if time.time() - start_time >= timeout:
+                return None
+            medicao.dormir(interval)
+
+
+def wait_for_screen_stable(timeout=10, stable_for=0.5, min_wait=0.3, interval=0.15, stop=None):
+    """
+    Espera a tela parar de mudar por `stable_for` segundos.
+
+    Compara miniaturas consecutivas da tela (1/STABLE_DOWNSCALE) e considera
+    estável quando menos de STABLE_CHANGED_RATIO dos pixels mudou. Aguarda
+    sempre pelo menos `min_wait` para o ERP começar a reagir à última ação.
+    `stop` (threading.Event) encerra a espera antes, depois do `min_wait`
+    (ex.: o alvo do próximo passo já apareceu e parou).
+
+    Returns:
+        bool: True se estabilizou, False se atingiu o timeout
+    """
+    start_time = time.time()
+    with timeline.medir('wait_stable') as medicao:
+        medicao.dormir(min(min_wait, timeout))
+
+        with medicao.match():
+            previous = _grab_thumbnail()
+        stable_since = time.time()
+
+        while time.time() - start_time < timeout:
+            if stop is not None and stop.wait(interval):
+                medicao.ok = True
+                medicao.extra['antecipada'] = True
+                return True
+            if stop is not None:
+                medicao.ocioso_s += interval
+            else:
+                medicao.dormir(interval)
+            medicao.tentativas += 1
+            with medicao.match():
+                current = _grab_thumbnail()
+                changed = _changed_ratio(previous, current)
+            previous = current
+
+            if changed > STABLE_CHANGED_RATIO:
+                stable_since = time.time()
+            elif time.time() - stable_since >= stable_for:
+                medicao.ok = True
+                return True
+
+    return False
+
+
+def wait_for_image(image_name, confidence=0.8, timeout=10):
+    """Espera o template aparecer sem clicar; retorna (x, y, w, h) ou None."""
+    _, location = wait_for_any([image_name], confidence=confidence, timeout=timeout)
+    return location
+
+
+def wait_for_file(path, timeout=30, stable_for=0.5, interval=0.2):
+    """
+    Espera o arquivo existir e o tamanho parar de mudar por `stable_for` segundos.
+
+    Returns:
+        bool: True quando o arquivo está completo, False se atingiu o timeout
+    """
+    start_time = time.time()
+    last_size = None
+    stable_since = None
+
+    with timeline.medir('wait_file') as medicao:
+        medicao.extra['arquivo'] = os.path.basename(path)
+        while time.time() - start_time < timeout:
+            medicao.tentativas += 1
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+
+            if size is not None and size > 0 and size == last_size:
+                if time.time() - stable_since >= stable_for:
+                    medicao.ok = True
+                    elapsed = round(time.time() - start_time, 2)
+                    print(f"✓ Arquivo '{os.path.basename(path)}' pronto ({size} bytes) [{elapsed}s]")
+                    return True
+            else:
+                last_size = size
+                stable_since = time.time()
+
+            medicao.dormir(interval)
+
+    print(f"✗ Arquivo '{os.path.basename(path)}' não ficou pronto após {timeout}s")
+    return False